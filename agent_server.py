@@ -0,0 +1,349 @@
+"""
+Agent Server
+
+Serves many chat sessions from one process. Each session keeps its own message history and
+last-used file paths, LLM requests go through AsyncOpenAI with a cap on how many are in flight
+at once, and tool calls run on a thread pool so a slow tool never blocks the event loop.
+
+The sessions are exposed through a small local HTTP endpoint:
+    POST   /chat              {"session_id": optional, "message": "..."} -> {"session_id", "reply", "elapsed_s"}
+    GET    /health            -> {"status", "sessions", "evicted_sessions", "inflight", "endpoints", "tool_output"}
+    DELETE /sessions/<id>     -> {"deleted": true|false}
+
+Sessions nobody has written to for SESSION_IDLE_TIMEOUT seconds (--session-idle-timeout) are dropped,
+so a long-running server does not keep every conversation it has ever seen in memory.
+
+Start it with:
+    python agent_server.py --port 8080
+or load-test it against a stand-in server (see fake_openai_server.py):
+    python agent_server.py --base-url http://localhost:1235/v1 --load-test 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import llmchat
+from client_pool import AsyncClientPool, endpoints_from_env
+from context_manager import ContextManager
+from tools.formatting import tool_output
+
+SESSION_IDLE_TIMEOUT = 3600   # seconds without a turn before a session is dropped (0 keeps them all)
+SWEEP_INTERVAL = 60           # seconds between looks for idle sessions
+MAX_BODY_BYTES = 1024 * 1024  # largest request body accepted
+
+
+class AgentSession:
+    """The state of one conversation: message history, last-used files and token usage."""
+
+    def __init__(self, session_id, context_budget=0):
+        self.id = session_id
+        self.messages = [{"role": "system", "content": llmchat.SYSTEM_PROMPT}]
+        self.file_paths = dict(llmchat.last_file_paths)
+        self.context = ContextManager(context_budget, llmchat.registry.schemas_json()) if context_budget > 0 else None
+        self.lock = asyncio.Lock()
+        self.last_active = time.time()
+        self.usage = {"requests": 0, "tool_calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+
+class AsyncAgentEngine:
+    """
+    Runs the agent loop for many sessions concurrently on one event loop.
+
+    Args:
+        base_url (str): OpenAI-compatible endpoint, LM Studio by default.
+        endpoints (list): Several endpoints to spread requests over instead of base_url (see client_pool.py).
+        api_key (str): API key sent to the endpoint.
+        model (str): Model name used for completions.
+        max_inflight (int): Maximum number of LLM requests in flight at once across all sessions.
+        max_tool_workers (int): Size of the thread pool that runs tool calls.
+        max_steps (int): Maximum rounds of tool calls per user message.
+        context_budget (int): Estimated prompt size in tokens each session stays under (0 sends the full history).
+        session_idle_timeout (float): Seconds without a turn before a session is dropped (0 keeps every session).
+    """
+
+    def __init__(self, base_url=llmchat.BASE_URL, api_key=llmchat.API_KEY, model=llmchat.MODEL,
+                 max_inflight=4, max_tool_workers=8, max_steps=llmchat.MAX_TOOL_STEPS, context_budget=0,
+                 endpoints=None, session_idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.client = AsyncClientPool(endpoints or [base_url], api_key)
+        self.model = model
+        self.max_inflight = max_inflight
+        self.max_steps = max_steps
+        self.context_budget = context_budget
+        self.llm_slots = asyncio.Semaphore(max_inflight)
+        self.tool_pool = ThreadPoolExecutor(max_workers=max_tool_workers, thread_name_prefix="session-tool")
+        self.sessions = {}
+        self.session_idle_timeout = session_idle_timeout
+        self.evicted_sessions = 0
+        self._last_sweep = time.time()
+        self.inflight = 0
+        self.peak_inflight = 0
+
+    def get_session(self, session_id=None):
+        if time.time() - self._last_sweep >= SWEEP_INTERVAL:
+            self.sweep_idle()
+        session_id = session_id or uuid.uuid4().hex
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = AgentSession(session_id, self.context_budget)
+        return session
+
+    def drop_session(self, session_id):
+        return self.sessions.pop(session_id, None) is not None
+
+    def sweep_idle(self, now=None):
+        """Drops the sessions idle for longer than session_idle_timeout and returns how many were dropped.
+        A session with a turn in progress is never dropped, however long the turn takes."""
+        now = time.time() if now is None else now
+        self._last_sweep = now
+        if not self.session_idle_timeout:
+            return 0
+        idle = [session_id for session_id, session in self.sessions.items()
+                if now - session.last_active > self.session_idle_timeout and not session.lock.locked()]
+        for session_id in idle:
+            del self.sessions[session_id]
+        self.evicted_sessions += len(idle)
+        return len(idle)
+
+    async def complete(self, messages, session=None):
+        async with self.llm_slots:
+            self.inflight += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    tools=llmchat.registry.schemas(),
+                    temperature=llmchat.TEMPERATURE
+                )
+            finally:
+                self.inflight -= 1
+        if session is not None:
+            session.usage["requests"] += 1
+            if response.usage is not None:
+                session.usage["prompt_tokens"] += response.usage.prompt_tokens or 0
+                session.usage["completion_tokens"] += response.usage.completion_tokens or 0
+        return response.choices[0].message
+
+    async def run_tool_calls(self, session, tool_calls):
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*[
+            loop.run_in_executor(self.tool_pool, llmchat.run_tool_call, tool_call, session.file_paths)
+            for tool_call in tool_calls
+        ])
+
+    @staticmethod
+    def prompt(session):
+        return session.context.view(session.messages) if session.context else session.messages
+
+    async def chat(self, session_id, user_input):
+        """
+        Runs one user turn in a session, including any tool calls, and returns the final reply text.
+        Turns within the same session are serialized; different sessions run concurrently.
+        """
+        session = self.get_session(session_id)
+        async with session.lock:
+            session.last_active = time.time()
+            messages = session.messages
+            turn_start = len(messages)
+            try:
+                messages.append({"role": "user", "content": user_input})
+                assistant_message = await self.complete(self.prompt(session), session)
+
+                steps = 0
+                while assistant_message.tool_calls and steps < self.max_steps:
+                    messages.append(llmchat.assistant_history_entry(assistant_message))
+                    session.usage["tool_calls"] += len(assistant_message.tool_calls)
+                    tool_responses = await self.run_tool_calls(session, assistant_message.tool_calls)
+                    for tool_call, tool_response in zip(assistant_message.tool_calls, tool_responses):
+                        messages.append({"role": "tool", "tool_call_id": tool_call.id, "content": tool_response})
+                    steps += 1
+                    assistant_message = await self.complete(self.prompt(session), session)
+            except BaseException:
+                # Drop the unfinished turn, as the interactive chat does: a user message without a reply,
+                # or a tool call without its results, would break the session's next request
+                del messages[turn_start:]
+                raise
+
+            messages.append({"role": "assistant", "content": assistant_message.content})
+            session.last_active = time.time()
+            return assistant_message.content
+
+    async def close(self):
+        await self.client.close()
+        self.tool_pool.shutdown(wait=False)
+
+
+# Minimal HTTP/1.1 front end (keep-alive, JSON bodies only)
+HTTP_STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+async def write_json(writer, status, payload, keep_alive):
+    body = json.dumps(payload).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("ascii") + body)
+    await writer.drain()
+
+
+async def route(engine, method, path, body):
+    if method == "GET" and path == "/health":
+        return 200, {"status": "ok", "sessions": len(engine.sessions), "evicted_sessions": engine.evicted_sessions,
+                     "inflight": engine.inflight,
+                     "endpoints": engine.client.stats()["endpoints"], "tool_output": tool_output.stats()}
+    if method == "POST" and path == "/chat":
+        request = json.loads(body or b"{}")
+        message = request.get("message")
+        if not isinstance(message, str) or not message:
+            return 400, {"error": "'message' must be a non-empty string"}
+        session = engine.get_session(request.get("session_id"))
+        started = time.perf_counter()
+        reply = await engine.chat(session.id, message)
+        return 200, {"session_id": session.id, "reply": reply, "elapsed_s": round(time.perf_counter() - started, 4)}
+    if method == "DELETE" and path.startswith("/sessions/"):
+        return 200, {"deleted": engine.drop_session(path[len("/sessions/"):])}
+    return 404, {"error": f"No route for {method} {path}"}
+
+
+async def handle_connection(engine, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            try:
+                method, path, version = request_line.decode("latin-1").split()
+            except ValueError:
+                await write_json(writer, 400, {"error": "Malformed request line"}, keep_alive=False)
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            try:
+                length = int(headers.get("content-length", 0) or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                await write_json(writer, 400, {"error": "Invalid Content-Length"}, keep_alive=False)
+                break
+            if length > MAX_BODY_BYTES:
+                # The body is not read, so the connection cannot be reused
+                await write_json(writer, 413, {"error": f"Request body is larger than {MAX_BODY_BYTES} bytes"},
+                                 keep_alive=False)
+                break
+            body = await reader.readexactly(length)
+            keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+            try:
+                status, payload = await route(engine, method, path, body)
+            except json.JSONDecodeError as e:
+                status, payload = 400, {"error": f"Invalid JSON body: {str(e)}"}
+            except Exception as e:
+                status, payload = 500, {"error": str(e)}
+            await write_json(writer, status, payload, keep_alive)
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(engine, host="127.0.0.1", port=8080):
+    server = await asyncio.start_server(lambda r, w: handle_connection(engine, r, w), host, port)
+    print(f"Agent server listening on http://{host}:{port} (max {engine.max_inflight} LLM requests in flight)")
+    async with server:
+        await server.serve_forever()
+
+
+async def load_test(engine, sessions=20, turns=3):
+    """
+    Drives `sessions` concurrent conversations of `turns` messages each and returns latency figures.
+    Meant to run against fake_openai_server.py or a real LM Studio instance.
+    """
+    latencies = []
+
+    async def conversation(index):
+        session_id = f"load-{index}"
+        for turn in range(turns):
+            started = time.perf_counter()
+            await engine.chat(session_id, f"multiply {index} by {turn + 1}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[conversation(i) for i in range(sessions)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_s": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_s": round(latencies[len(latencies) // 2], 4) if latencies else None,
+        "p95_s": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 4) if latencies else None,
+        "peak_inflight": engine.peak_inflight,
+    }
+
+
+def add_endpoint_arguments(parser):
+    """The --base-url and --endpoints options shared by the server and the batch runner."""
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint of the model server (default: LMSTUDIO_ENDPOINTS "
+                                           f"or {llmchat.BASE_URL})")
+    parser.add_argument("--endpoints", help="Comma-separated base URLs of several servers to spread requests over")
+
+
+def endpoint_list(args):
+    if args.endpoints:
+        return [url.strip() for url in args.endpoints.split(",") if url.strip()]
+    return [args.base_url] if args.base_url else endpoints_from_env(llmchat.BASE_URL)
+
+
+async def run(args):
+    engine = AsyncAgentEngine(max_inflight=args.max_inflight, max_tool_workers=args.tool_workers,
+                              max_steps=args.max_steps, context_budget=args.context_budget,
+                              endpoints=endpoint_list(args), session_idle_timeout=args.session_idle_timeout)
+    engine.client.start_health_checks()
+    try:
+        if args.load_test:
+            print(json.dumps(await load_test(engine, sessions=args.load_test, turns=args.turns), indent=2))
+        else:
+            await serve(engine, args.host, args.port)
+    finally:
+        await engine.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve many concurrent agent chat sessions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    add_endpoint_arguments(parser)
+    parser.add_argument("--max-inflight", type=int, default=4, help="Maximum concurrent LLM requests")
+    parser.add_argument("--tool-workers", type=int, default=8, help="Threads available for tool execution")
+    parser.add_argument("--max-steps", type=int, default=llmchat.MAX_TOOL_STEPS,
+                        help="Maximum rounds of tool calls per user message")
+    parser.add_argument("--context-budget", type=int, default=llmchat.DEFAULT_CONTEXT_BUDGET,
+                        help="Estimated prompt size in tokens each session stays under (0 sends the full history)")
+    parser.add_argument("--session-idle-timeout", type=float, default=SESSION_IDLE_TIMEOUT,
+                        help="Seconds without a turn before a session is dropped (0 keeps every session)")
+    parser.add_argument("--load-test", type=int, metavar="SESSIONS", default=0,
+                        help="Instead of serving, run this many concurrent scripted sessions and print latency figures")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per session in --load-test mode")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Batch Runner
+
+Runs a JSONL file of prompts through the agent without anyone typing. Every line is an
+independent conversation that goes through the same tool loop as the chat (see agent_server.py),
+and several conversations run at once so the model server always has work queued.
+
+Input: one JSON object per line. The prompt is taken from the first of the fields "prompt",
+"message", "content" or "body" (or the whole line, if it is a JSON string), and the item id from
+"id" or "request_id" (default: the line number).
+
+Output: one JSON object per finished item, appended to the output file and flushed to disk
+before the next one is written:
+    {"id", "status": "ok"|"error", "reply" or "error", "elapsed_s", "usage": {requests, tool_calls,
+     prompt_tokens, completion_tokens}}
+
+Running the same command again after a crash or Ctrl-C skips the items that already have an "ok"
+line in the output file and retries the rest.
+
+    python batch_runner.py prompts.jsonl results.jsonl --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+
+import llmchat
+from agent_server import AsyncAgentEngine, add_endpoint_arguments, endpoint_list
+
+PROMPT_FIELDS = ("prompt", "message", "content", "body")
+ID_FIELDS = ("id", "request_id")
+DEFAULT_CONCURRENCY = 4
+
+
+def read_items(path):
+    """
+    Reads the prompts of a batch file.
+
+    Returns:
+        list: (id, prompt) pairs in file order.
+
+    Raises:
+        ValueError: For a line that is not JSON, has no prompt, or repeats an id.
+    """
+    items = []
+    seen = set()
+    with open(path, "r", encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{number}: not valid JSON ({e.msg})")
+            if isinstance(record, str):
+                record = {"prompt": record}
+            prompt = next((record[field] for field in PROMPT_FIELDS if isinstance(record.get(field), str)), None)
+            if not prompt:
+                raise ValueError(f"{path}:{number}: no prompt (expected one of {', '.join(PROMPT_FIELDS)})")
+            item_id = str(next((record[field] for field in ID_FIELDS if record.get(field) is not None), number))
+            if item_id in seen:
+                raise ValueError(f"{path}:{number}: duplicate id '{item_id}'")
+            seen.add(item_id)
+            items.append((item_id, prompt))
+    return items
+
+
+def completed_ids(path):
+    """Ids that already have an "ok" result in an output file. A line cut off by a crash is ignored."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and record.get("status") == "ok":
+                done.add(str(record.get("id")))
+    return done
+
+
+class ResultWriter:
+    """Appends result lines to a JSONL file, each one flushed and fsynced before the call returns.
+    Safe to call from several threads at once; run_batch calls it off the event loop."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self.file = open(path, "a+b")
+        self.file.seek(0, os.SEEK_END)
+        if self.file.tell():
+            self.file.seek(-1, os.SEEK_END)
+            if self.file.read(1) != b"\n":
+                self.file.write(b"\n")  # finish a line cut off by a crash so the next one starts clean
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._lock:
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+async def run_batch(engine, items, writer, concurrency=DEFAULT_CONCURRENCY, progress=None):
+    """
+    Runs every item as its own conversation, at most `concurrency` at a time.
+
+    Args:
+        engine (AsyncAgentEngine): Runs the conversations.
+        items (list): (id, prompt) pairs still to do.
+        writer (ResultWriter): Receives one record per item, in the order the items finish.
+        concurrency (int): Conversations in progress at once.
+        progress (callable): Called with each record after it is written.
+
+    Returns:
+        dict: Counts, total time and token usage of the run.
+    """
+    queue = asyncio.Queue()
+    for item in items:
+        queue.put_nowait(item)
+    summary = {"items": len(items), "ok": 0, "error": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    async def worker():
+        while True:
+            try:
+                item_id, prompt = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            session = engine.get_session(f"batch-{item_id}")
+            started = time.perf_counter()
+            record = {"id": item_id}
+            try:
+                record.update(status="ok", reply=await engine.chat(session.id, prompt))
+            except Exception as e:
+                record.update(status="error", error=f"{type(e).__name__}: {e}")
+            record["elapsed_s"] = round(time.perf_counter() - started, 4)
+            record["usage"] = dict(session.usage)
+            engine.drop_session(session.id)
+            # fsync can take milliseconds; the other conversations keep running meanwhile
+            await asyncio.get_running_loop().run_in_executor(None, writer.write, record)
+            summary[record["status"]] += 1
+            summary["prompt_tokens"] += session.usage["prompt_tokens"]
+            summary["completion_tokens"] += session.usage["completion_tokens"]
+            if progress:
+                progress(record)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(max(1, min(concurrency, len(items))))])
+    summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+    summary["items_per_s"] = round(len(items) / summary["elapsed_s"], 2) if summary["elapsed_s"] else None
+    return summary
+
+
+async def run(args):
+    items = read_items(args.input)
+    done = completed_ids(args.output)
+    todo = [item for item in items if item[0] not in done]
+    print(f"{len(items)} prompts, {len(items) - len(todo)} already done, {len(todo)} to run")
+    engine = AsyncAgentEngine(max_inflight=args.concurrency, max_tool_workers=args.tool_workers,
+                              max_steps=args.max_steps, context_budget=args.context_budget,
+                              endpoints=endpoint_list(args))
+    engine.client.start_health_checks()
+    writer = ResultWriter(args.output)
+
+    def progress(record):
+        print(f"[{record['status']}] {record['id']} ({record['elapsed_s']:.2f}s)")
+
+    try:
+        return await run_batch(engine, todo, writer, args.concurrency, progress)
+    finally:
+        writer.close()
+        await engine.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through the agent, several at a time.")
+    parser.add_argument("input", help="JSONL file with one prompt per line")
+    parser.add_argument("output", help="JSONL file the results are appended to; rerun to resume")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Conversations (and LLM requests) in progress at once")
+    add_endpoint_arguments(parser)
+    parser.add_argument("--tool-workers", type=int, default=8, help="Threads available for tool execution")
+    parser.add_argument("--max-steps", type=int, default=llmchat.MAX_TOOL_STEPS,
+                        help="Maximum rounds of tool calls per prompt")
+    parser.add_argument("--context-budget", type=int, default=llmchat.DEFAULT_CONTEXT_BUDGET,
+                        help="Estimated prompt size in tokens each conversation stays under (0 sends the full history)")
+    args = parser.parse_args(argv)
+    try:
+        summary = asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to continue.")
+        return
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
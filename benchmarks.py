@@ -0,0 +1,370 @@
+"""
+Benchmarks
+
+Measures how fast the agent is, without a model server, so a change to llmchat or to the tools
+package can be checked for speed before it is merged:
+
+- startup:  importing llmchat in a fresh interpreter, and tool discovery
+- dispatch: the cost of the registry and the tool-call path around a trivial tool
+- sqlite:   the sales tools against generated databases of increasing size
+- json:     the JSON and accounting tools against sample.json scaled up, called directly with a cold
+            and a warm cache, and through the tool executor with the isolation each tool asks for
+- turns:    whole chat turns (plain answer, one tool call, parallel tool calls) against
+            fake_openai_server.py with simulated model latency, blocking and streamed; the tool
+            result cache is emptied before every turn, and the tool turns are timed again with
+            it warm (.cached)
+
+Every benchmark reports seconds: mean, p50, p95 and min over its samples. The report is JSON and
+records the git commit, so two runs can be compared:
+
+    python benchmarks.py --output before.json
+    ... change something ...
+    python benchmarks.py --output after.json --baseline before.json
+    python benchmarks.py --compare before.json after.json
+
+--quick runs fewer samples on smaller data (used by the tests); --only picks benchmark groups.
+"""
+
+import argparse
+import contextlib
+import copy
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GROUPS = ("startup", "dispatch", "sqlite", "json", "turns")
+SAMPLE_JSON = os.path.join(BASE_DIR, "examples", "sample.json")
+REGRESSION_THRESHOLD = 0.10  # p50 changes smaller than this are reported as unchanged
+
+
+def summarize(samples):
+    """Mean, median, 95th percentile and minimum of a list of timings in seconds."""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean": round(statistics.fmean(ordered), 9),
+        "p50": round(ordered[len(ordered) // 2], 9),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 9),
+        "min": round(ordered[0], 9),
+    }
+
+
+def measure(function, repeat, warmup=1, inner=1, setup=None):
+    """
+    Times `function` `repeat` times after `warmup` untimed calls.
+
+    Args:
+        inner (int): Calls per sample; the sample is the average, for functions too fast to time alone.
+        setup (callable): Runs untimed before every sample (e.g. to empty a cache).
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        function()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        started = time.perf_counter()
+        for _ in range(inner):
+            function()
+        samples.append((time.perf_counter() - started) / inner)
+        if gc_enabled:
+            gc.enable()
+    return summarize(samples)
+
+
+def bench_startup(quick):
+    results = {}
+    samples = []
+    for _ in range(3 if quick else 10):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import llmchat"], cwd=BASE_DIR, check=True,
+                       stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - started)
+    results["startup.import_llmchat"] = summarize(samples)
+
+    from tools.registry import ToolRegistry, TOOL_PACKAGE_DIR
+
+    def discover():
+        ToolRegistry(package="benchmark_tools", package_dir=TOOL_PACKAGE_DIR).discover()
+
+    results["startup.discover_tools"] = measure(discover, 5 if quick else 30)
+    return results
+
+
+def bench_dispatch(quick):
+    import llmchat
+    from tools.executor import ToolExecutor
+    from tools.math_operations import multiply_numbers
+    from tools.registry import registry
+    from types import SimpleNamespace
+
+    inner = 200 if quick else 2000
+    repeat = 5 if quick else 20
+    arguments = {"a": 6, "b": 7}
+    tool_call = SimpleNamespace(id="call", function=SimpleNamespace(name="multiply_numbers", arguments=json.dumps(arguments)))
+    registry.load("multiply_numbers")
+    spec = registry.get("multiply_numbers")
+    executor = ToolExecutor()
+    try:
+        return {
+            "dispatch.direct_call": measure(lambda: multiply_numbers(6, 7), repeat, inner=inner),
+            "dispatch.registry": measure(lambda: registry.dispatch("multiply_numbers", arguments), repeat, inner=inner),
+            "dispatch.handle_tool_call": measure(lambda: llmchat.handle_tool_call(tool_call), repeat, inner=inner),
+            # Cost of isolation per call (the worker process is started during warmup)
+            "dispatch.executor_thread": measure(lambda: executor.run(spec, arguments, isolation="thread"),
+                                                repeat, inner=inner // 10),
+            "dispatch.executor_process": measure(lambda: executor.run(spec, arguments, isolation="process"),
+                                                 repeat, inner=inner // 10),
+        }
+    finally:
+        executor.shutdown()
+
+
+def bench_sqlite(quick, workdir):
+    from datetime import datetime as date
+    from create_sales_database import load_sales
+    from tools import db_connection
+    from tools.registry import registry
+
+    results = {}
+    repeat = 5 if quick else 30
+    for rows in ((2000,) if quick else (10_000, 100_000, 1_000_000)):
+        path = os.path.join(workdir, f"sales_{rows}.db")
+        load_sales(path, rows=rows, days=730, end_date=date(2025, 6, 30), seed=1)
+        db_connection.configure(path)
+        try:
+            for name, arguments in (("get_sales_by_month", {"month": "2025-03"}),
+                                    ("list_all_sold_products", {}),
+                                    ("get_top_expensive_products", {"limit": 5})):
+                registry.load(name)
+                results[f"sqlite.{name}.{rows}_rows"] = measure(lambda: registry.dispatch(name, arguments), repeat)
+        finally:
+            db_connection.configure(db_connection.DEFAULT_DB_PATH)
+    return results
+
+
+def scaled_sample(factor, path):
+    """Writes sample.json with its balance history repeated `factor` times (as later years)."""
+    with open(SAMPLE_JSON, "r", encoding="utf-8") as file:
+        document = json.load(file)
+    history = document["history"]["balance_history"]
+    years = sorted(int(entry["year_label"]) for entry in history.values())
+    span = years[-1] - years[0] + 1
+    scaled = {}
+    for copy_index in range(factor):
+        for label, entry in history.items():
+            year = int(entry["year_label"]) + copy_index * span
+            entry = copy.deepcopy(entry) if copy_index else entry
+            entry["year_label"] = str(year)
+            scaled[str(year)] = entry
+    document["history"]["balance_history"] = scaled
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(document, file)
+    return years[0]
+
+
+def bench_json(quick, workdir):
+    from tools.document_cache import documents
+    from tools.executor import ToolExecutor
+    from tools.registry import registry
+
+    results = {}
+    repeat = 3 if quick else 15
+    executor = ToolExecutor()
+    try:
+        for factor in ((1, 4) if quick else (1, 10, 50)):
+            path = os.path.join(workdir, f"sample_x{factor}.json")
+            first_year = scaled_sample(factor, path)
+            size = f"{os.path.getsize(path) // 1024}kb"
+            calls = (
+                ("read_json_file", {"path": path}),
+                ("query_json_file", {"path": path, "selector": f"history.balance_history.{first_year}.closing_balances.total_assets"}),
+                ("get_account_history", {"path": path, "account": "1930"}),
+                ("get_top_movers", {"path": path, "year": first_year + 1}),
+            )
+            for name, arguments in calls:
+                registry.load(name)
+                spec = registry.get(name)
+                call = lambda: registry.dispatch(name, arguments)
+                results[f"json.{name}.{size}.cold"] = measure(call, repeat, setup=documents.invalidate)
+                results[f"json.{name}.{size}.warm"] = measure(call, repeat)
+                # What the chat pays on top: the tool's isolation (a worker process for the accounting
+                # tools, which keeps its own document cache warm) and handing the result back
+                results[f"json.{name}.{size}.executor"] = measure(lambda: executor.run(spec, arguments), repeat)
+    finally:
+        executor.shutdown()
+    return results
+
+
+def bench_turns(quick, latency=0.02, token_latency=0.001):
+    from openai import OpenAI
+
+    import llmchat
+    from fake_openai_server import start_fake_server
+    from tools.memoize import tool_results
+
+    server = start_fake_server(latency=latency, token_latency=token_latency)
+    saved_client, saved_cache = llmchat.client, llmchat.completion_cache
+    llmchat.client = OpenAI(base_url=server.base_url, api_key="benchmark")
+    llmchat.completion_cache = None
+    prompts = {
+        "plain": "Say hello to the benchmark",
+        "one_tool": "multiply 6 by 7",
+        "parallel_tools": 'tool:multiply_numbers {"a": 2, "b": 3} tool:get_top_movers {"year": 2015} '
+                          'tool:get_sales_by_month {"month": "2025-01"}',
+    }
+    results = {}
+    try:
+        for stream in (False, True):
+            for name, prompt in prompts.items():
+                def turn():
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        llmchat.run_turn([{"role": "system", "content": llmchat.SYSTEM_PROMPT}], prompt, stream=stream)
+                key = f"turns.{name}.{'stream' if stream else 'blocking'}"
+                # Every tool really runs, as on the first time a question is asked...
+                results[key] = measure(turn, 3 if quick else 20, setup=tool_results.clear)
+                if name != "plain":
+                    # ...and the same turn again with the results of the cacheable tools remembered
+                    results[key + ".cached"] = measure(turn, 3 if quick else 20)
+    finally:
+        llmchat.client, llmchat.completion_cache = saved_client, saved_cache
+        server.shutdown()
+    results["turns.simulated_model_latency"] = {"n": 1, "mean": latency, "p50": latency, "p95": latency, "min": latency}
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(groups=GROUPS, quick=False, progress=None):
+    """
+    Runs the selected benchmark groups.
+
+    Returns:
+        dict: The report: {"meta": {...}, "results": {benchmark name: summary}}.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="lmstudio-bench-") as workdir:
+        for group in groups:
+            if progress:
+                progress(group)
+            if group == "startup":
+                results.update(bench_startup(quick))
+            elif group == "dispatch":
+                results.update(bench_dispatch(quick))
+            elif group == "sqlite":
+                results.update(bench_sqlite(quick, workdir))
+            elif group == "json":
+                results.update(bench_json(quick, workdir))
+            elif group == "turns":
+                results.update(bench_turns(quick))
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": quick,
+            "groups": list(groups),
+        },
+        "results": results,
+    }
+
+
+def _format_seconds(value):
+    if value >= 1:
+        return f"{value:.3f}s"
+    if value >= 0.001:
+        return f"{value * 1000:.2f}ms"
+    return f"{value * 1_000_000:.1f}us"
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Compares the p50 of every benchmark present in both reports.
+
+    Returns:
+        list: (name, baseline p50, current p50, relative change, verdict) rows; verdict is
+        "slower", "faster" or "same".
+    """
+    rows = []
+    for name, summary in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or not before["p50"]:
+            continue
+        change = summary["p50"] / before["p50"] - 1
+        verdict = "slower" if change > threshold else "faster" if change < -threshold else "same"
+        rows.append((name, before["p50"], summary["p50"], change, verdict))
+    return rows
+
+
+def print_report(report):
+    meta = report["meta"]
+    print(f"Benchmarks at {meta['commit'] or 'unknown commit'} (Python {meta['python']}{', quick' if meta['quick'] else ''})")
+    for name, summary in report["results"].items():
+        print(f"  {name:<52} p50 {_format_seconds(summary['p50']):>10}  p95 {_format_seconds(summary['p95']):>10}")
+
+
+def print_comparison(rows, baseline, current):
+    print(f"p50 {baseline['meta']['commit'] or 'baseline'} -> {current['meta']['commit'] or 'current'}")
+    for name, before, after, change, verdict in rows:
+        print(f"  {name:<52} {_format_seconds(before):>10} -> {_format_seconds(after):>10}  {change:+7.1%}  {verdict}")
+    slower = sum(1 for row in rows if row[4] == "slower")
+    print(f"{slower} of {len(rows)} benchmarks slower by more than {REGRESSION_THRESHOLD:.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the agent against a local fake model server.")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--only", help=f"Comma-separated groups to run ({', '.join(GROUPS)})")
+    parser.add_argument("--quick", action="store_true", help="Fewer samples and smaller data")
+    parser.add_argument("--baseline", help="Compare this run against an earlier report")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Compare two existing reports without running anything")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        with open(args.compare[1], "r", encoding="utf-8") as file:
+            current = json.load(file)
+        print_comparison(compare(baseline, current), baseline, current)
+        return
+
+    groups = [group.strip() for group in args.only.split(",")] if args.only else list(GROUPS)
+    unknown = [group for group in groups if group not in GROUPS]
+    if unknown:
+        parser.error(f"unknown benchmark group(s): {', '.join(unknown)}")
+    report = run_benchmarks(groups, args.quick, progress=lambda group: print(f"Running {group} benchmarks...",
+                                                                            file=sys.stderr))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Report written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        print_comparison(compare(baseline, report), baseline, report)
+
+
+if __name__ == "__main__":
+    main()
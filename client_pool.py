@@ -0,0 +1,336 @@
+"""
+Client Pool
+
+Spreads chat completion requests over several OpenAI-compatible endpoints (LM Studio instances on
+different machines or ports), so one model server does not cap the throughput of everyone.
+
+- Routing: a request goes to the healthy endpoint with the fewest requests in flight, ties broken
+  by recent latency.
+- Stickiness: the endpoint chosen for a conversation is remembered under a hash of the start of
+  its prompt (system prompt and first user message), and later requests of that conversation go to
+  the same endpoint while it is healthy, so its prompt cache (KV cache) can be reused.
+- Failover: connection errors, timeouts, 429 and 5xx answers mark the endpoint down for a cooldown
+  and the request is retried on another endpoint, with exponential backoff and jitter between
+  attempts. Streams are retried only if they fail before the first chunk arrives.
+- Health checks: GET <endpoint>/models on a background thread brings endpoints back up (or takes
+  them down) between requests.
+- stats() reports requests in flight, request and error counts and p50/p95 latency per endpoint.
+
+ClientPool and AsyncClientPool have the same `chat.completions.create(...)` interface as the
+OpenAI clients they wrap, so they can be used wherever a client is expected. The endpoint list
+comes from --endpoints or LMSTUDIO_ENDPOINTS (comma-separated base URLs).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from collections import OrderedDict, deque
+from types import SimpleNamespace
+
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.25        # seconds before the second attempt, doubled for every further one
+BACKOFF_MAX = 4.0
+COOLDOWN = 10.0            # seconds an endpoint stays down after a failure (unless a health check passes)
+HEALTH_INTERVAL = 15.0
+HEALTH_TIMEOUT = 2.0
+MAX_STICKY = 10000         # conversations remembered
+LATENCY_WINDOW = 200       # recent request latencies kept per endpoint
+
+RETRYABLE = (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError, openai.InternalServerError)
+
+
+def endpoints_from_env(default):
+    """The endpoint list from LMSTUDIO_ENDPOINTS, or [default]."""
+    value = os.environ.get("LMSTUDIO_ENDPOINTS", "")
+    return [url.strip() for url in value.split(",") if url.strip()] or [default]
+
+
+def conversation_key(messages):
+    """Identifies a conversation by the start of its prompt: every message up to the first user message."""
+    prefix = []
+    for message in messages:
+        prefix.append({"role": message.get("role"), "content": message.get("content")}
+                      if isinstance(message, dict) else {"role": getattr(message, "role", None),
+                                                         "content": getattr(message, "content", None)})
+        if prefix[-1]["role"] == "user":
+            break
+    encoded = json.dumps(prefix, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+class Endpoint:
+    """One model server and its load and health figures."""
+
+    def __init__(self, url, client):
+        self.url = url.rstrip("/")
+        self.client = client
+        self.inflight = 0
+        self.requests = 0
+        self.errors = 0
+        self.healthy = True
+        self.down_until = 0.0
+        self.last_error = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.ewma = 0.0
+
+    def stats(self):
+        ordered = sorted(self.latencies)
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "inflight": self.inflight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "p50_s": round(ordered[len(ordered) // 2], 4) if ordered else None,
+            "p95_s": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4) if ordered else None,
+            "last_error": self.last_error,
+        }
+
+
+class EndpointPool:
+    """
+    Routing, stickiness and health bookkeeping shared by the sync and async pools.
+
+    Args:
+        urls (list): Base URLs of the endpoints, e.g. ["http://host-a:1234/v1", "http://host-b:1234/v1"].
+        make_client (callable): Builds the client for one base URL.
+        max_attempts (int): Tries per request, across endpoints.
+        cooldown (float): Seconds a failed endpoint is skipped.
+    """
+
+    def __init__(self, urls, make_client, max_attempts=MAX_ATTEMPTS, cooldown=COOLDOWN):
+        if not urls:
+            raise ValueError("At least one endpoint is required")
+        self.endpoints = [Endpoint(url, make_client(url)) for url in urls]
+        self.max_attempts = max_attempts
+        self.cooldown = cooldown
+        self.counters = {"requests": 0, "retries": 0, "failovers": 0, "sticky_hits": 0}
+        self._sticky = OrderedDict()
+        self._lock = threading.Lock()
+        self._health_thread = None
+        self._stop = threading.Event()
+
+    def acquire(self, key, exclude=()):
+        """Picks the endpoint for a request and counts it as in flight."""
+        now = time.monotonic()
+        with self._lock:
+            for endpoint in self.endpoints:
+                if not endpoint.healthy and endpoint.down_until <= now:
+                    endpoint.healthy = True  # cooldown over: give it another chance
+            candidates = [e for e in self.endpoints if e.healthy and e not in exclude]
+            chosen = self.endpoints[self._sticky[key]] if key in self._sticky else None
+            if chosen is not None and chosen in candidates:
+                self._sticky.move_to_end(key)
+                self.counters["sticky_hits"] += 1
+            else:
+                if not candidates:
+                    # Everything is down: try the endpoint that comes back soonest rather than failing outright
+                    remaining = [e for e in self.endpoints if e not in exclude] or self.endpoints
+                    candidates = [min(remaining, key=lambda e: e.down_until)]
+                chosen = min(candidates, key=lambda e: (e.inflight, e.ewma))
+                if key is not None:
+                    self._sticky[key] = self.endpoints.index(chosen)
+                    self._sticky.move_to_end(key)
+                    while len(self._sticky) > MAX_STICKY:
+                        self._sticky.popitem(last=False)
+            chosen.inflight += 1
+            chosen.requests += 1
+            self.counters["requests"] += 1
+            return chosen
+
+    def release(self, endpoint, elapsed=None, error=None):
+        """Ends a request; a retryable error marks the endpoint down for the cooldown."""
+        with self._lock:
+            endpoint.inflight -= 1
+            if error is not None:
+                endpoint.errors += 1
+                endpoint.last_error = f"{type(error).__name__}: {error}"
+                if isinstance(error, RETRYABLE):
+                    endpoint.healthy = False
+                    endpoint.down_until = time.monotonic() + self.cooldown
+            elif elapsed is not None:
+                endpoint.latencies.append(elapsed)
+                endpoint.ewma = elapsed if not endpoint.ewma else 0.8 * endpoint.ewma + 0.2 * elapsed
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number `attempt` (1 for the first retry)."""
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def note_retry(self, failed_endpoint, key):
+        with self._lock:
+            self.counters["retries"] += 1
+            if len(self.endpoints) > 1:
+                self.counters["failovers"] += 1
+            if key is not None and self._sticky.get(key) == self.endpoints.index(failed_endpoint):
+                del self._sticky[key]
+
+    def check_health(self, timeout=HEALTH_TIMEOUT):
+        """Probes every endpoint with GET /models and updates its health. Returns {url: healthy}."""
+        results = {}
+        for endpoint in self.endpoints:
+            try:
+                with urllib.request.urlopen(endpoint.url + "/models", timeout=timeout) as response:
+                    ok = 200 <= response.status < 300
+            except Exception as e:
+                ok = False
+                endpoint.last_error = f"health check: {type(e).__name__}: {e}"
+            with self._lock:
+                endpoint.healthy = ok
+                endpoint.down_until = 0.0 if ok else time.monotonic() + self.cooldown
+            results[endpoint.url] = ok
+        return results
+
+    def start_health_checks(self, interval=HEALTH_INTERVAL):
+        """Runs check_health() every `interval` seconds on a daemon thread."""
+        if self._health_thread is not None or len(self.endpoints) < 2:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=loop, name="endpoint-health", daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, endpoints=[endpoint.stats() for endpoint in self.endpoints])
+
+    def describe(self):
+        lines = []
+        for stats in self.stats()["endpoints"]:
+            latency = f"p50 {stats['p50_s']:.2f}s p95 {stats['p95_s']:.2f}s" if stats["p50_s"] is not None else "no requests"
+            state = "up" if stats["healthy"] else "down"
+            lines.append(f"{stats['url']} ({state}): {stats['requests']} requests, {stats['errors']} errors, "
+                         f"{stats['inflight']} in flight, {latency}")
+        return "\n".join(lines)
+
+
+class _TrackedStream:
+    """Wraps a streamed response so the endpoint stays 'in flight' until the stream is consumed."""
+
+    def __init__(self, stream, pool, endpoint, started):
+        self._stream = stream
+        self._pool = pool
+        self._endpoint = endpoint
+        self._started = started
+        self._done = False
+
+    def _finish(self, error=None):
+        if not self._done:
+            self._done = True
+            self._pool.release(self._endpoint, time.perf_counter() - self._started, error)
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                yield chunk
+        except Exception as e:
+            self._finish(e)
+            raise
+        finally:
+            self._finish()
+
+    def __aiter__(self):
+        return self._aiter()
+
+    async def _aiter(self):
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        except Exception as e:
+            self._finish(e)
+            raise
+        finally:
+            self._finish()
+
+
+class ClientPool(EndpointPool):
+    """
+    Drop-in replacement for an OpenAI client that spreads requests over several endpoints.
+
+    Args:
+        urls (list): Base URLs of the endpoints.
+        api_key (str): API key sent to every endpoint.
+        timeout (float): Request timeout in seconds.
+    """
+
+    def __init__(self, urls, api_key="lm-studio", timeout=600.0, **options):
+        super().__init__(urls, lambda url: OpenAI(base_url=url, api_key=api_key, max_retries=0, timeout=timeout),
+                         **options)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        """Same arguments as client.chat.completions.create; retried on another endpoint if one fails."""
+        key = conversation_key(kwargs.get("messages") or [])
+        tried = []
+        for attempt in range(1, self.max_attempts + 1):
+            endpoint = self.acquire(key, exclude=tried)
+            started = time.perf_counter()
+            try:
+                response = endpoint.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                self.release(endpoint, error=e)
+                if not isinstance(e, RETRYABLE) or attempt == self.max_attempts:
+                    raise
+                tried.append(endpoint)
+                self.note_retry(endpoint, key)
+                time.sleep(self.backoff(attempt))
+                continue
+            if kwargs.get("stream"):
+                return _TrackedStream(response, self, endpoint, started)
+            self.release(endpoint, time.perf_counter() - started)
+            return response
+
+    def close(self):
+        self.stop_health_checks()
+        for endpoint in self.endpoints:
+            endpoint.client.close()
+
+
+class AsyncClientPool(EndpointPool):
+    """The same pool for AsyncOpenAI (used by agent_server.py and batch_runner.py)."""
+
+    def __init__(self, urls, api_key="lm-studio", timeout=600.0, **options):
+        super().__init__(urls, lambda url: AsyncOpenAI(base_url=url, api_key=api_key, max_retries=0, timeout=timeout),
+                         **options)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        """Same arguments as client.chat.completions.create; retried on another endpoint if one fails."""
+        key = conversation_key(kwargs.get("messages") or [])
+        tried = []
+        for attempt in range(1, self.max_attempts + 1):
+            endpoint = self.acquire(key, exclude=tried)
+            started = time.perf_counter()
+            try:
+                response = await endpoint.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                self.release(endpoint, error=e)
+                if not isinstance(e, RETRYABLE) or attempt == self.max_attempts:
+                    raise
+                tried.append(endpoint)
+                self.note_retry(endpoint, key)
+                await asyncio.sleep(self.backoff(attempt))
+                continue
+            if kwargs.get("stream"):
+                return _TrackedStream(response, self, endpoint, started)
+            self.release(endpoint, time.perf_counter() - started)
+            return response
+
+    async def close(self):
+        self.stop_health_checks()
+        for endpoint in self.endpoints:
+            await endpoint.client.close()
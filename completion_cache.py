@@ -0,0 +1,227 @@
+"""
+Completion Cache
+
+A disk-backed cache of chat completions, so re-running the same scripted conversation (in tests,
+demos or benchmarks) does not ask the model for answers it has already given.
+
+- Entries are keyed on a SHA-256 hash of the model name, the messages, the tool schemas and the
+  sampling parameters, serialized with sorted keys. Any change to the prompt is a different entry.
+- Only the assistant message is stored (content and tool calls), as JSON in a SQLite file
+  (.cache/completions.sqlite3 by default). The file is bounded by COMPLETION_CACHE_MB and an entry
+  count; the least recently used entries are evicted first.
+
+Modes:
+    cache    answer from the cache when possible, otherwise ask the model and store the answer
+    record   always ask the model and store (or overwrite) the answer
+    replay   answer only from the cache and never contact the model; a request that was not
+             recorded raises CompletionNotRecorded
+
+A conversation recorded with `record` runs again offline and gives the same answers with `replay`,
+as long as the tools return the same results (the tool outputs are part of the later prompts).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.path.join(PROJECT_DIR, ".cache", "completions.sqlite3")
+MAX_CACHE_BYTES = int(float(os.environ.get("COMPLETION_CACHE_MB", "256")) * 1024 * 1024)
+MAX_ENTRIES = 20000
+MODES = ("cache", "record", "replay")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL
+)
+"""
+
+
+class CompletionNotRecorded(LookupError):
+    """Raised in replay mode for a request that is not in the cache."""
+
+
+def _plain(value):
+    """Converts messages that may hold SDK objects or SimpleNamespaces into plain JSON data."""
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True)
+    if isinstance(value, SimpleNamespace):
+        return _plain(vars(value))
+    return value
+
+
+def request_key(model, messages, tools=None, params=None):
+    """The cache key for one completion request: a hex SHA-256 of its canonical JSON form."""
+    request = {"model": model, "messages": _plain(messages), "tools": _plain(tools or []),
+               "params": _plain(params or {})}
+    encoded = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def message_to_dict(message):
+    """The parts of an assistant message that are stored: content and tool calls."""
+    entry = {"role": "assistant", "content": message.content}
+    if message.tool_calls:
+        entry["tool_calls"] = [
+            {"id": tool_call.id, "type": "function",
+             "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments}}
+            for tool_call in message.tool_calls
+        ]
+    return entry
+
+
+def message_from_dict(entry):
+    """Rebuilds a stored message with the same attributes as a message from the OpenAI client."""
+    tool_calls = [
+        SimpleNamespace(id=call["id"], type=call.get("type", "function"),
+                        function=SimpleNamespace(name=call["function"]["name"],
+                                                 arguments=call["function"]["arguments"]))
+        for call in entry.get("tool_calls") or []
+    ]
+    return SimpleNamespace(role="assistant", content=entry.get("content"), tool_calls=tool_calls or None)
+
+
+class CompletionCache:
+    """
+    SQLite-backed store of assistant messages keyed by request hash, with LRU eviction.
+
+    Args:
+        path (str): Cache database file (the "cassette" in record/replay mode).
+        mode (str): "cache", "record" or "replay".
+        max_bytes (int): Upper bound for the total size of stored messages.
+        max_entries (int): Upper bound for the number of stored messages.
+    """
+
+    def __init__(self, path=None, mode="cache", max_bytes=MAX_CACHE_BYTES, max_entries=MAX_ENTRIES):
+        if mode not in MODES:
+            raise ValueError(f"Unknown completion cache mode '{mode}', expected one of {', '.join(MODES)}")
+        self.path = path or DEFAULT_CACHE_PATH
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.counters = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+        self._conn = None
+        self._total_bytes = 0
+        self._entries = 0
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            if self.mode == "replay" and not os.path.exists(self.path):
+                raise FileNotFoundError(f"No recorded completions at '{self.path}'")
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_last_access ON completions (last_access)")
+            self._entries, self._total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, key):
+        """Returns the stored message for a key, or None, and marks it as recently used."""
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT message FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.counters["hits"] += 1
+        return message_from_dict(json.loads(row[0]))
+
+    def store(self, key, model, message):
+        """Stores an assistant message under a request key."""
+        encoded = json.dumps(message_to_dict(message), ensure_ascii=False)
+        size = len(encoded.encode("utf-8"))
+        if size > self.max_bytes:
+            return False
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            previous = conn.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, model, message, created, last_access, size) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (key, model, encoded, now, now, size))
+            if previous:
+                self._total_bytes -= previous[0]
+            else:
+                self._entries += 1
+            self._total_bytes += size
+            self.counters["stored"] += 1
+            self._evict(conn)
+        return True
+
+    def _evict(self, conn):
+        while self._entries > 0 and (self._total_bytes > self.max_bytes or self._entries > self.max_entries):
+            row = conn.execute("SELECT key, size FROM completions ORDER BY last_access LIMIT 1").fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM completions WHERE key = ?", (row[0],))
+            self._entries -= 1
+            self._total_bytes -= row[1]
+            self.counters["evicted"] += 1
+
+    def complete(self, model, messages, tools, params, request):
+        """
+        Returns the assistant message for a request, from the cache or from `request()` depending on the mode.
+
+        Args:
+            model (str): Model name.
+            messages (list): The messages that will be sent.
+            tools (list): The tool schemas that will be sent.
+            params (dict): Sampling parameters (temperature, ...).
+            request (callable): Asks the model and returns its message.
+
+        Returns:
+            tuple: (message, cached) where cached tells whether the message came from the cache.
+
+        Raises:
+            CompletionNotRecorded: In replay mode, when the request was never recorded.
+        """
+        key = request_key(model, messages, tools, params)
+        if self.mode != "record":
+            message = self.lookup(key)
+            if message is not None:
+                return message, True
+            if self.mode == "replay":
+                raise CompletionNotRecorded(
+                    f"No recorded completion for this request (key {key[:12]}) in '{self.path}'")
+        message = request()
+        self.store(key, model, message)
+        return message, False
+
+    def clear(self):
+        with self._lock:
+            self._connection().execute("DELETE FROM completions")
+            self._entries = 0
+            self._total_bytes = 0
+
+    def stats(self):
+        """Counters plus the current size of the cache."""
+        with self._lock:
+            self._connection()
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, mode=self.mode, entries=self._entries, bytes=self._total_bytes,
+                        hit_rate=round(self.counters["hits"] / lookups, 3) if lookups else None)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,144 @@
+"""
+Context Manager
+
+Keeps the prompt sent to the model within a token budget. The conversation history itself is never
+changed (messages are only ever appended to it); instead every request is built from a view of the
+history in which old material has been shortened:
+
+1. Tool outputs from earlier turns are replaced by a one-line stub that keeps the start of the output.
+2. If that is not enough, the oldest whole turns (user message, tool calls, answer) are left out.
+
+The system prompt and the tool list are never touched, and every replacement is sticky: once a
+message has been shortened it stays shortened in all later views. The start of the prompt therefore
+stays byte-for-byte the same from one request to the next, so LM Studio can reuse its prompt cache.
+Trimming goes down to LOW_WATER of the budget at a time, so it happens once every few turns rather
+than on every request.
+
+Token counts are estimates (about four characters per token), which is close enough for budgeting
+and needs no tokenizer. The estimate is shared with the tools (see tools/formatting.py), which use it
+to cap and report the size of their results.
+"""
+
+from tools.formatting import estimate_tokens
+
+MESSAGE_OVERHEAD_TOKENS = 4       # role markers and separators per message
+DEFAULT_CONTEXT_BUDGET = 8192     # tokens, including the tool list
+LOW_WATER = 0.75                  # trim down to this fraction of the budget
+STUB_PREVIEW_CHARS = 160
+
+
+def message_tokens(message):
+    """Estimated tokens one chat message adds to the prompt, tool call arguments included."""
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.get("content") or "")
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call["function"]
+        tokens += MESSAGE_OVERHEAD_TOKENS + estimate_tokens(function["name"]) + estimate_tokens(function["arguments"])
+    return tokens
+
+
+class ContextManager:
+    """
+    Builds token-budgeted views of one conversation's message list.
+
+    Args:
+        budget (int): Maximum estimated prompt size in tokens, including the tool list.
+        tools_json (str): The serialized tool list sent with every request (counted against the budget).
+    """
+
+    def __init__(self, budget=DEFAULT_CONTEXT_BUDGET, tools_json=""):
+        self.budget = budget
+        self.tools_tokens = estimate_tokens(tools_json)
+        self.last_report = None
+        self._tokens = []
+        self._stubs = {}
+        self._first_kept = 1
+
+    def _stub(self, index, message):
+        stub = self._stubs.get(index)
+        if stub is None:
+            content = message.get("content") or ""
+            preview = " ".join(content[:STUB_PREVIEW_CHARS].split())
+            stub = {
+                "role": "tool",
+                "tool_call_id": message.get("tool_call_id"),
+                "content": f"[Earlier tool output removed to save context ({self._tokens[index]} tokens). "
+                           f"It began: {preview}...]"
+            }
+            self._stubs[index] = stub
+        return stub
+
+    def _sync(self, messages):
+        if len(messages) < len(self._tokens):
+            # A different (or reset) conversation: start over
+            self._tokens, self._stubs, self._first_kept = [], {}, 1
+        for message in messages[len(self._tokens):]:
+            self._tokens.append(message_tokens(message))
+
+    def _cost(self, index):
+        stub = self._stubs.get(index)
+        return message_tokens(stub) if stub is not None else self._tokens[index]
+
+    def view(self, messages):
+        """
+        Returns the messages to send for the next request.
+
+        Args:
+            messages (list): The full conversation; messages[0] is the system prompt.
+
+        Returns:
+            list: The system prompt followed by the kept messages, with elided tool outputs replaced by stubs.
+        """
+        self._sync(messages)
+        current_turn = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=len(messages))
+        start = min(self._first_kept, current_turn)
+        total = self.tools_tokens + self._tokens[0] + sum(self._cost(i) for i in range(start, len(messages)))
+        elided_now = 0
+
+        if total > self.budget:
+            target = int(self.budget * LOW_WATER)
+            # 1. Replace tool outputs from earlier turns, oldest first
+            for index in range(start, current_turn):
+                if total <= target:
+                    break
+                message = messages[index]
+                if message.get("role") != "tool" or index in self._stubs:
+                    continue
+                saved = self._tokens[index] - message_tokens(self._stub(index, message))
+                if saved <= 0:
+                    del self._stubs[index]
+                    continue
+                total -= saved
+                elided_now += 1
+            # 2. Leave out whole turns, oldest first, never the current one
+            while total > target and start < current_turn:
+                next_turn = next((i for i in range(start + 1, current_turn + 1)
+                                  if messages[i].get("role") == "user"), current_turn)
+                total -= sum(self._cost(i) for i in range(start, next_turn))
+                start = next_turn
+            self._first_kept = start
+
+        view = [messages[0]] + [self._stubs.get(i, messages[i]) for i in range(start, len(messages))]
+        self.last_report = {
+            "prompt_tokens": total,
+            "budget": self.budget,
+            "messages": len(view),
+            "elided_tool_outputs": len(self._stubs),
+            "elided_now": elided_now,
+            "dropped_messages": start - 1,
+            "over_budget": total > self.budget,
+        }
+        return view
+
+    def describe(self):
+        """One-line summary of the last view, printed with each request."""
+        report = self.last_report
+        if report is None:
+            return ""
+        text = f"prompt ~{report['prompt_tokens']}/{report['budget']} tokens, {report['messages']} messages"
+        if report["elided_tool_outputs"]:
+            text += f", {report['elided_tool_outputs']} old tool outputs shortened"
+        if report["dropped_messages"]:
+            text += f", {report['dropped_messages']} old messages left out"
+        if report["over_budget"]:
+            text += " (current turn alone exceeds the budget)"
+        return text
@@ -1,7 +1,11 @@
+import argparse
 import sqlite3
 import random
+import time
 from datetime import datetime, timedelta
 
+from tools.db_connection import DEFAULT_DB_PATH
+
 # List of product names for variety
 products = [
     'Laptop', 'Smartphone', 'Tablet', 'Headphones', 'Mouse', 'Keyboard', 
@@ -9,21 +13,152 @@ products = [
     'USB Drive', 'Router', 'Webcam', 'Microphone', 'Projector', 'Smartwatch'
 ]
 
-def random_date(start_date, end_date):
-    """Generate a random date between start_date and end_date."""
-    time_between = end_date - start_date
-    days_between = time_between.days
-    random_number_of_days = random.randrange(days_between)
-    return start_date + timedelta(days=random_number_of_days)
-
-def create_sales_data():
-    """Create a SQLite database with 50 random sales records over the past 3 months."""
-    # Connect to SQLite database (creates a new database if it doesn't exist)
-    conn = sqlite3.connect('product_sales.db')
-    cursor = conn.cursor()
-    
-    # Create sales table
-    cursor.execute("""
+# Defaults for the bulk generator; the demo database is 50 rows over the past 3 months
+DEFAULT_ROWS = 50
+DEFAULT_DAYS = 90
+DEFAULT_BATCH_SIZE = 50_000
+# An append drops and rebuilds the indexes only when it adds more than this fraction of the rows already there
+INDEX_REBUILD_FRACTION = 0.5
+
+def product_catalog(count):
+    """Return `count` product names: the base list, then numbered variants ('Laptop 2', ...) for larger catalogs."""
+    names = []
+    generation = 1
+    while len(names) < count:
+        for base in products:
+            names.append(base if generation == 1 else f"{base} {generation}")
+            if len(names) == count:
+                break
+        generation += 1
+    return names
+
+def generate_sales(rows, days=DEFAULT_DAYS, end_date=None, product_count=len(products), seed=None,
+                   batch_size=DEFAULT_BATCH_SIZE):
+    """Yield batches of (product_name, date_sold, price) tuples.
+
+    Dates are spread uniformly over the `days` days ending with `end_date`, products uniformly over a catalog of
+    `product_count` names and prices between $10 and $1500. The same seed always produces the same rows."""
+    rng = random.Random(seed)
+    end_date = end_date or datetime.now()
+    days = max(days, 1)
+    start_date = end_date - timedelta(days=days - 1)
+    dates = [(start_date + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days)]
+    catalog = product_catalog(product_count)
+    choices = rng.choices
+    uniform = rng.random
+
+    remaining = rows
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        names = choices(catalog, k=size)
+        sold = choices(dates, k=size)
+        prices = [round(10.0 + uniform() * 1490.0, 2) for _ in range(size)]
+        yield list(zip(names, sold, prices))
+        remaining -= size
+
+# Indexes used by the sales tools:
+# - idx_sales_date_price covers the month range query (date_sold range, SUM(price)) without touching the table
+# - idx_sales_price lets ORDER BY price DESC LIMIT n read the n most expensive rows straight from the index
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_sales_date_price ON sales (date_sold, price)",
+    "CREATE INDEX IF NOT EXISTS idx_sales_price ON sales (price)",
+]
+
+def create_indexes(conn, analyze=True):
+    """Create the indexes the sales tools rely on (safe to run on an existing database)."""
+    for statement in INDEXES:
+        conn.execute(statement)
+    if analyze:
+        conn.execute("ANALYZE")
+
+# Rollup tables: per-product and per-month totals, so the read tools cost O(products) or O(1)
+# instead of scanning the whole sales history. Kept current by the triggers below.
+ROLLUP_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS product_sales_summary (
+        product_name TEXT PRIMARY KEY,
+        quantity_sold INTEGER NOT NULL,
+        total_revenue REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS monthly_sales_summary (
+        month TEXT PRIMARY KEY,  -- 'YYYY-MM', the first 7 characters of date_sold
+        item_count INTEGER NOT NULL,
+        total_revenue REAL NOT NULL
+    )
+    """,
+]
+
+# Each trigger adjusts only the summary rows the changed sale belongs to.
+# Summary rows whose count drops to zero are removed so they never show up as 'sold'.
+_ADD_SALE = """
+    INSERT INTO product_sales_summary (product_name, quantity_sold, total_revenue)
+    VALUES (NEW.product_name, 1, NEW.price)
+    ON CONFLICT (product_name) DO UPDATE SET
+        quantity_sold = quantity_sold + 1,
+        total_revenue = total_revenue + excluded.total_revenue;
+    INSERT INTO monthly_sales_summary (month, item_count, total_revenue)
+    VALUES (substr(NEW.date_sold, 1, 7), 1, NEW.price)
+    ON CONFLICT (month) DO UPDATE SET
+        item_count = item_count + 1,
+        total_revenue = total_revenue + excluded.total_revenue;
+"""
+_REMOVE_SALE = """
+    UPDATE product_sales_summary
+    SET quantity_sold = quantity_sold - 1, total_revenue = total_revenue - OLD.price
+    WHERE product_name = OLD.product_name;
+    DELETE FROM product_sales_summary WHERE product_name = OLD.product_name AND quantity_sold <= 0;
+    UPDATE monthly_sales_summary
+    SET item_count = item_count - 1, total_revenue = total_revenue - OLD.price
+    WHERE month = substr(OLD.date_sold, 1, 7);
+    DELETE FROM monthly_sales_summary WHERE month = substr(OLD.date_sold, 1, 7) AND item_count <= 0;
+"""
+ROLLUP_TRIGGERS = {
+    "sales_rollup_insert": f"CREATE TRIGGER IF NOT EXISTS sales_rollup_insert AFTER INSERT ON sales BEGIN {_ADD_SALE} END",
+    "sales_rollup_delete": f"CREATE TRIGGER IF NOT EXISTS sales_rollup_delete AFTER DELETE ON sales BEGIN {_REMOVE_SALE} END",
+    "sales_rollup_update": (
+        "CREATE TRIGGER IF NOT EXISTS sales_rollup_update AFTER UPDATE OF product_name, date_sold, price ON sales "
+        f"BEGIN {_REMOVE_SALE} {_ADD_SALE} END"
+    ),
+}
+
+def create_rollups(conn):
+    """Create the rollup tables and the triggers that keep them current."""
+    for statement in ROLLUP_TABLES:
+        conn.execute(statement)
+    for statement in ROLLUP_TRIGGERS.values():
+        conn.execute(statement)
+
+def drop_rollup_triggers(conn):
+    """Drop the rollup triggers, e.g. before a bulk load that rebuilds the rollups afterwards."""
+    for name in ROLLUP_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+def rebuild_rollups(conn):
+    """Recompute both rollup tables from the sales table (after bulk loads or if they ever drift)."""
+    for statement in ROLLUP_TABLES:
+        conn.execute(statement)
+    conn.execute("DELETE FROM product_sales_summary")
+    conn.execute("""
+        INSERT INTO product_sales_summary (product_name, quantity_sold, total_revenue)
+        SELECT product_name, COUNT(*), SUM(price) FROM sales GROUP BY product_name
+    """)
+    rebuild_monthly_rollup(conn)
+
+def rebuild_monthly_rollup(conn):
+    """Recompute the monthly rollup. Grouping by day first walks idx_sales_date_price in order
+    without a sort; only the few thousand daily rows are then grouped into months."""
+    conn.execute("DELETE FROM monthly_sales_summary")
+    conn.execute("""
+        INSERT INTO monthly_sales_summary (month, item_count, total_revenue)
+        SELECT substr(day, 1, 7), SUM(item_count), SUM(revenue)
+        FROM (SELECT date_sold AS day, COUNT(*) AS item_count, SUM(price) AS revenue FROM sales GROUP BY date_sold)
+        GROUP BY substr(day, 1, 7)
+    """)
+
+def create_sales_table(conn):
+    conn.execute("""
     CREATE TABLE IF NOT EXISTS sales (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         product_name TEXT NOT NULL,
@@ -31,25 +166,129 @@ def create_sales_data():
         price REAL NOT NULL
     )
     """)
-    
-    # Clear any existing data
-    cursor.execute("DELETE FROM sales")
-    
-    # Set date range for the past 3 months
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=90)  # Approximately 3 months
-    
-    # Generate 50 random sales records
-    for _ in range(50):
-        product = random.choice(products)
-        sale_date = random_date(start_date, end_date).strftime('%Y-%m-%d')
-        price = round(random.uniform(10.0, 1500.0), 2)  # Random price between $10 and $1500
-        cursor.execute("INSERT INTO sales (product_name, date_sold, price) VALUES (?, ?, ?)", 
-                      (product, sale_date, price))
-    
-    conn.commit()
+
+def load_sales(db_path=DEFAULT_DB_PATH, rows=DEFAULT_ROWS, days=DEFAULT_DAYS, end_date=None,
+               product_count=len(products), seed=None, batch_size=DEFAULT_BATCH_SIZE, append=False):
+    """Fill the sales table with generated rows as fast as SQLite allows and return the number of rows written.
+
+    The whole load is one transaction with synchronous writes off. Triggers are dropped first and recreated
+    afterwards, and the rollups get the batch's per-product and per-month totals once at the end. The indexes
+    are dropped too and rebuilt afterwards, unless rows are appended to a table much larger than the batch:
+    then updating them row by row is cheaper than rebuilding them over the whole table."""
+    conn = sqlite3.connect(db_path, isolation_level=None)  # transactions are managed explicitly below
+    # A rollback journal only has to save the few pages that existed before the load, while WAL would
+    # write every new page twice (once to the log, once at checkpoint), so WAL is switched on afterwards
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    create_sales_table(conn)
+
+    conn.execute("BEGIN")
+    try:
+        drop_rollup_triggers(conn)
+        # The largest id is a cheap upper bound on the row count (it does not scan the table)
+        existing = conn.execute("SELECT COALESCE(MAX(id), 0) FROM sales").fetchone()[0] if append else 0
+        rebuild_indexes = rows > existing * INDEX_REBUILD_FRACTION
+        if rebuild_indexes:
+            for statement in INDEXES:
+                name = statement.split(" ON ")[0].split()[-1]
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+        if not append:
+            conn.execute("DELETE FROM sales")  # no triggers left, so SQLite can truncate in one step
+        had_rollups = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'product_sales_summary'"
+        ).fetchone()[0] == 1
+        for statement in ROLLUP_TABLES:
+            conn.execute(statement)
+        if not append:
+            conn.execute("DELETE FROM product_sales_summary")
+            conn.execute("DELETE FROM monthly_sales_summary")
+
+        # Per-product and per-month totals are added up while the rows go by; grouping the finished
+        # table would need a full sort (by product) or a pass over the whole history (by month)
+        product_totals = {}
+        month_totals = {}
+        written = 0
+        for batch in generate_sales(rows, days, end_date, product_count, seed, batch_size):
+            conn.executemany("INSERT INTO sales (product_name, date_sold, price) VALUES (?, ?, ?)", batch)
+            written += len(batch)
+            for name, sold, price in batch:
+                for totals, key in ((product_totals, name), (month_totals, sold[:7])):
+                    entry = totals.get(key)
+                    if entry is None:
+                        totals[key] = [1, price]
+                    else:
+                        entry[0] += 1
+                        entry[1] += price
+
+        # Kept indexes are already current, and the statistics of a table this much larger than the batch barely move
+        create_indexes(conn, analyze=rebuild_indexes)
+        if append and not had_rollups:
+            rebuild_rollups(conn)
+        else:
+            conn.executemany("""
+                INSERT INTO product_sales_summary (product_name, quantity_sold, total_revenue) VALUES (?, ?, ?)
+                ON CONFLICT (product_name) DO UPDATE SET
+                    quantity_sold = quantity_sold + excluded.quantity_sold,
+                    total_revenue = total_revenue + excluded.total_revenue
+            """, [(name, count, revenue) for name, (count, revenue) in product_totals.items()])
+            conn.executemany("""
+                INSERT INTO monthly_sales_summary (month, item_count, total_revenue) VALUES (?, ?, ?)
+                ON CONFLICT (month) DO UPDATE SET
+                    item_count = item_count + excluded.item_count,
+                    total_revenue = total_revenue + excluded.total_revenue
+            """, [(month, count, revenue) for month, (count, revenue) in month_totals.items()])
+        create_rollups(conn)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        # WAL lets the read-only tool connections keep reading while the database is being written
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.close()
+    return written
+
+def create_sales_data(db_path=DEFAULT_DB_PATH):
+    """Create a SQLite database with 50 random sales records over the past 3 months.
+    The database goes to product_sales.db in the project directory unless SALES_DB_PATH says otherwise."""
+    load_sales(db_path, rows=DEFAULT_ROWS, days=DEFAULT_DAYS)
+    print(f"Database created with {DEFAULT_ROWS} sales records at {db_path}.")
+
+def rebuild_rollups_in(db_path):
+    """Add the rollup tables and triggers to an existing database and fill them from its sales."""
+    conn = sqlite3.connect(db_path)
+    with conn:
+        rebuild_rollups(conn)
+        create_rollups(conn)
     conn.close()
-    print("Database created with 50 sales records.")
+    print(f"Rollup tables rebuilt in {db_path}.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create the sample sales database used by the database tools.")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Database file to write")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Number of sales rows to generate")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="Number of days the sales are spread over")
+    parser.add_argument("--end-date", type=lambda value: datetime.strptime(value, "%Y-%m-%d"),
+                        help="Last day of the date span, YYYY-MM-DD (default: today)")
+    parser.add_argument("--products", type=int, default=len(products), help="Number of distinct products")
+    parser.add_argument("--seed", type=int, help="Random seed, for reproducible databases")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per executemany batch")
+    parser.add_argument("--append", action="store_true", help="Add rows instead of replacing the existing sales")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="Only (re)build the rollup tables and triggers of an existing database")
+    args = parser.parse_args(argv)
+    if args.rebuild_rollups:
+        rebuild_rollups_in(args.db)
+        return
+    started = time.perf_counter()
+    written = load_sales(args.db, rows=args.rows, days=args.days, end_date=args.end_date,
+                         product_count=args.products, seed=args.seed, batch_size=args.batch_size, append=args.append)
+    elapsed = time.perf_counter() - started
+    rate = written / elapsed if elapsed else 0
+    print(f"Database created with {written} sales records at {args.db} in {elapsed:.1f}s ({rate:,.0f} rows/s).")
 
 if __name__ == "__main__":
-    create_sales_data()
+    main()
@@ -0,0 +1,250 @@
+"""
+Fake OpenAI-compatible Server
+
+A small local stand-in for the LM Studio server, used to load-test the agent without a model.
+It answers POST /v1/chat/completions with canned replies after an optional delay:
+
+- a user message like "multiply 6 by 7" gets a multiply_numbers tool call back,
+- a user message like 'tool:get_top_movers {"year": 2015}' calls that tool with those arguments
+  (several "tool:" directives in one message give parallel tool calls),
+- a message following tool results gets a reply that quotes the last tool output,
+- anything else is echoed.
+
+Requests with "stream": true are answered as server-sent events the way the OpenAI API streams:
+content arrives a word at a time and tool calls in fragments (id and name first, then the
+arguments in pieces), with an optional delay per chunk to simulate token generation.
+
+Run it on its own with:
+    python fake_openai_server.py --port 1235 --latency 0.2 --token-latency 0.01
+and point the agent at http://localhost:1235/v1.
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MULTIPLY_PATTERN = re.compile(r"multiply\s+(-?\d+(?:\.\d+)?)\s+(?:and|by|with)\s+(-?\d+(?:\.\d+)?)", re.IGNORECASE)
+TOOL_PATTERN = re.compile(r"tool:(\w+)\s*(\{[^{}]*\})?")
+
+
+def scripted_reply(messages):
+    """
+    Decides what the fake model answers for a conversation.
+
+    Args:
+        messages (list): The chat messages from the request body.
+
+    Returns:
+        dict: An assistant message with either 'content' or 'tool_calls'.
+    """
+    last = messages[-1] if messages else {"role": "user", "content": ""}
+    if last.get("role") == "tool":
+        return {"role": "assistant", "content": f"The tool returned: {last.get('content', '')}"}
+    text = last.get("content") or ""
+    directives = TOOL_PATTERN.findall(text)
+    if directives:
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [tool_call(name, arguments or "{}") for name, arguments in directives]
+        }
+    match = MULTIPLY_PATTERN.search(text)
+    if match:
+        arguments = json.dumps({"a": float(match.group(1)), "b": float(match.group(2))})
+        return {"role": "assistant", "content": None, "tool_calls": [tool_call("multiply_numbers", arguments)]}
+    return {"role": "assistant", "content": f"Echo: {text}"}
+
+
+def tool_call(name, arguments):
+    return {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function", "function": {"name": name, "arguments": arguments}}
+
+
+def stream_deltas(message):
+    """
+    Splits an assistant message into the deltas of a streamed response.
+
+    Returns:
+        list: Delta dicts; content a word at a time, each tool call as a header plus argument pieces.
+    """
+    deltas = [{"role": "assistant"}]
+    for word in re.findall(r"\S+\s*", message.get("content") or ""):
+        deltas.append({"content": word})
+    for index, call in enumerate(message.get("tool_calls") or []):
+        deltas.append({"tool_calls": [{"index": index, "id": call["id"], "type": "function",
+                                       "function": {"name": call["function"]["name"], "arguments": ""}}]})
+        arguments = call["function"]["arguments"]
+        middle = len(arguments) // 2
+        for piece in (arguments[:middle], arguments[middle:]):
+            if piece:
+                deltas.append({"tool_calls": [{"index": index, "function": {"arguments": piece}}]})
+    return deltas
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """Threaded HTTP server that keeps simple counters for load tests."""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, token_latency=0.0):
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency = latency
+        self.token_latency = token_latency
+        self.request_count = 0
+        self.active_requests = 0
+        self.peak_active_requests = 0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def enter_request(self):
+        with self._stats_lock:
+            self.request_count += 1
+            self.active_requests += 1
+            self.peak_active_requests = max(self.peak_active_requests, self.active_requests)
+
+    def leave_request(self):
+        with self._stats_lock:
+            self.active_requests -= 1
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY the body of a keep-alive
+    # response can wait for a delayed ACK and add ~40 ms that a real server would not.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self, request, message, usage):
+        """Writes a message as server-sent events, one chunk per delta, and closes the connection.
+        With stream_options {"include_usage": true} a last chunk without choices carries the usage."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        deltas = stream_deltas(message)
+        finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+        for position, delta in enumerate(deltas):
+            if position and self.server.token_latency:
+                time.sleep(self.server.token_latency)
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "fake-model"),
+                "choices": [{
+                    "index": 0,
+                    "delta": delta,
+                    "finish_reason": finish_reason if position == len(deltas) - 1 else None
+                }]
+            }
+            self.wfile.write(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+            self.wfile.flush()
+        if (request.get("stream_options") or {}).get("include_usage"):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": request.get("model", "fake-model"), "choices": [], "usage": usage}
+            self.wfile.write(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self.send_json(200, {"object": "list", "data": [{"id": "fake-model", "object": "model"}]})
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.enter_request()
+        try:
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            message = scripted_reply(request.get("messages", []))
+        finally:
+            self.server.leave_request()
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in request.get("messages", [])) // 4
+        completion_tokens = len(message.get("content") or "") // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        if request.get("stream"):
+            self.send_stream(request, message, usage)
+            return
+        self.send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake-model"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"
+            }],
+            "usage": usage
+        })
+
+
+def start_fake_server(host="127.0.0.1", port=0, latency=0.0, token_latency=0.0):
+    """
+    Starts a fake server on a background thread.
+
+    Args:
+        host (str): Interface to bind to.
+        port (int): Port to listen on; 0 picks a free port.
+        latency (float): Seconds to wait before answering each completion request.
+        token_latency (float): Seconds between the chunks of a streamed response.
+
+    Returns:
+        FakeOpenAIServer: The running server; call shutdown() when done.
+    """
+    server = FakeOpenAIServer((host, port), latency=latency, token_latency=token_latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI-compatible chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1235)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of simulated model latency per request")
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="Seconds between the chunks of a streamed response")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer((args.host, args.port), latency=args.latency, token_latency=args.token_latency)
+    print(f"Fake OpenAI server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,156 +1,39 @@
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import argparse
+import threading
 import json
 import os
+import sys
+import time
 
-# Initialize the OpenAI client for LM Studio
-client = OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
+# Initialize the client for LM Studio. It works like an OpenAI client but can spread requests over several
+# LM Studio servers (LMSTUDIO_ENDPOINTS or --endpoints, comma-separated); see client_pool.py
+from client_pool import ClientPool, endpoints_from_env
+BASE_URL = "http://localhost:1234/v1"
+API_KEY = "lm-studio"
+client = ClientPool(endpoints_from_env(BASE_URL), API_KEY)
 
-# Import tool functions from separate modules
-from tools.math_operations import multiply_numbers
-from tools.web_requests import make_http_request
-from tools.database_operations import get_sales_by_month, list_all_sold_products, get_top_expensive_products
-from tools.file_operations import read_file_content
-from tools.json_operations import read_json_file
+from completion_cache import CompletionCache, CompletionNotRecorded, MODES as COMPLETION_CACHE_MODES
+from context_manager import ContextManager, DEFAULT_CONTEXT_BUDGET
+from tool_selection import ToolSelector, DEFAULT_TOP_K
+from tracing import tracer, current_span, run_in_context, Profiler
+from session_log import SessionLog, SessionNotFound, list_sessions, describe_sessions
+from contextlib import nullcontext
 
-# Define the tools for the LLM
-# TOOL_METADATA: This 'tools' list is critical for tool calling. Each dictionary here represents metadata that the LLM uses to decide which tool to invoke based on user queries.
-# The 'name' field identifies the tool uniquely; it must match exactly what the LLM calls.
-# The 'description' field is vital - it explains the tool's purpose to the LLM, guiding it to match user intent (e.g., 'multiply numbers' for math queries).
-# The 'parameters' define what inputs the tool expects, helping the LLM extract correct arguments from user input.
-# Clear, specific metadata ensures the LLM selects the right tool; vague or overlapping descriptions can lead to incorrect decisions.
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "multiply_numbers",
-            "description": "Multiply two numbers and return the result.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "a": {
-                        "type": "number",
-                        "description": "The first number"
-                    },
-                    "b": {
-                        "type": "number",
-                        "description": "The second number"
-                    }
-                },
-                "required": ["a", "b"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "make_http_request",
-            "description": "Make an HTTP GET request to a specified URL and return the response.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "url": {
-                        "type": "string",
-                        "description": "The URL to make the GET request to"
-                    }
-                },
-                "required": ["url"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_sales_by_month",
-            "description": "Get total sales for a specific month from the database. Use YYYY-MM format.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "month": {
-                        "type": "string",
-                        "description": "The month in YYYY-MM format"
-                    }
-                },
-                "required": ["month"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "list_all_sold_products",
-            "description": "List all sold products from the database.",
-            "parameters": {
-                "type": "object",
-                "properties": {}
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_top_expensive_products",
-            "description": "Get the top most expensive sold products from the database.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "limit": {
-                        "type": "integer",
-                        "description": "Number of top products to return, default is 5"
-                    }
-                }
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "read_file_content",
-            "description": "Read and return content from a local text file for discussion or analysis.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "path": {
-                        "type": "string",
-                        "description": "Path to the text file, relative to project directory"
-                    }
-                }
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "read_json_file",
-            "description": "Read and return content from a JSON file for analysis, such as accounting data.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "path": {
-                        "type": "string",
-                        "description": "Path to the JSON file, relative to project directory"
-                    }
-                }
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "list_available_tools",
-            "description": "List all available tools and their functions to the user.",
-            "parameters": {
-                "type": "object",
-                "properties": {}
-            }
-        }
-    }
-]
+# Tools are discovered from the tools/ package by the registry; a tool module is only imported when one of its tools is first called
+from tools.registry import registry, tool
+from tools.memoize import tool_results
+from tools.formatting import tool_output
+from tools.executor import tool_executor
 
 # Global variables to track the last-used files for relevant tools
+# (the interactive loop uses these; server sessions keep their own copy, see agent_server.py)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Keys match the 'remember_path' option of the tools, so every tool that reads the same kind of file shares the last path
 last_file_paths = {
-    "read_file_content": os.path.join(BASE_DIR, "examples", "sample_text.txt"),  # Default file for file operations
-    "read_json_file": os.path.join(BASE_DIR, "examples", "sample.json")          # Default file for JSON operations
+    "text": os.path.join(BASE_DIR, "examples", "sample_text.txt"),  # Default file for file operations
+    "json": os.path.join(BASE_DIR, "examples", "sample.json")       # Default file for JSON operations
 }
 
 # ANSI escape codes for terminal formatting
@@ -158,134 +41,446 @@ BOLD = "\033[1m"
 RESET = "\033[0m"
 CYAN = "\033[96m"
 GREEN = "\033[92m"
+DIM = "\033[2m"
+
+MODEL = "lmstudio-community/Qwen2.5-7B-Instruct-GGUF"
+TEMPERATURE = 0.7
+SYSTEM_PROMPT = "You are a helpful assistant with access to various tools. Use them to assist the user."
+
+# Optional disk cache of completions (see completion_cache.py); set by --completion-cache.
+# In replay mode the whole chat runs from recorded answers without a model server.
+completion_cache = None
+
+# cProfile/tracemalloc around each turn (see tracing.py); set by --profile
+profiler = None
+
+# Limits for the agent loop: how many tool calls from one assistant message run at the same time,
+# and how many rounds of tool calls the model may chain before the turn is ended.
+MAX_TOOL_WORKERS = 4
+MAX_TOOL_STEPS = 5
+
+# Tools defined outside the tools/ package can be registered with the same decorator
+@tool
+def list_available_tools() -> str:
+    """List all available tools and their functions to the user."""
+    response = f"{BOLD}{CYAN}Here are the tools and functions I can assist you with:{RESET}\n"
+    for schema in registry.schemas():
+        tool_name = schema['function']['name']
+        tool_desc = schema['function']['description']
+        response += f"{GREEN}- `{tool_name}`{RESET}: {tool_desc}\n"
+    return response
+
+# Define the tools for the LLM
+# TOOL_METADATA: This 'tools' list is critical for tool calling. Each dictionary here represents metadata that the LLM uses to decide which tool to invoke based on user queries.
+# The 'name' field identifies the tool uniquely; it must match exactly what the LLM calls.
+# The 'description' field is vital - it explains the tool's purpose to the LLM, guiding it to match user intent (e.g., 'multiply numbers' for math queries).
+# The 'parameters' define what inputs the tool expects, helping the LLM extract correct arguments from user input.
+# Clear, specific metadata ensures the LLM selects the right tool; vague or overlapping descriptions can lead to incorrect decisions.
+# The list is generated by the registry from each tool's type hints and docstring (see tools/registry.py), built once per process.
+tools = registry.schemas()
 
 # Function to handle chat interaction
-def chat_with_model(messages):
+# With stream=False (the default, used by scripts) the call blocks until the whole completion is back.
+# With stream=True the tokens are printed as they arrive and the returned message is assembled from the deltas.
+# 'tools' is the list of schemas to offer (see tool_selection.py); by default every registered tool is sent.
+# Every request is traced as an 'llm' span with its size, token usage and whether it came from the cache.
+def chat_with_model(messages, stream=False, tools=None):
+    tools = tools or registry.schemas()
+    with tracer.span("llm", stream=stream, messages=len(messages), tools=len(tools)) as span:
+        if completion_cache is not None:
+            message = cached_chat_with_model(messages, stream, tools)
+        elif stream:
+            message = stream_chat_with_model(messages, tools=tools)
+        else:
+            response = client.chat.completions.create(
+                model=MODEL,
+                messages=messages,
+                tools=tools,
+                temperature=TEMPERATURE
+            )
+            record_usage(span, getattr(response, "usage", None))
+            message = response.choices[0].message
+        span.set(tool_calls=len(message.tool_calls or []), content_chars=len(message.content or ""))
+        return message
+
+# Token counts as reported by the server, added to a trace span
+def record_usage(span, usage):
+    if usage is not None:
+        span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+# chat_with_model through the completion cache. A cached answer is printed in one piece when streaming,
+# so the transcript looks the same whether the answer came from the model or from the cache.
+def cached_chat_with_model(messages, stream, tools):
+    def request():
+        if stream:
+            return stream_chat_with_model(messages, tools=tools)
+        response = client.chat.completions.create(model=MODEL, messages=messages, tools=tools, temperature=TEMPERATURE)
+        record_usage(current_span(), getattr(response, "usage", None))
+        return response.choices[0].message
+
+    message, cached = completion_cache.complete(MODEL, messages, tools, {"temperature": TEMPERATURE}, request)
+    current_span().set(cached=cached)
+    if cached and stream:
+        print(f"Assistant: {message.content or ''}")
+        print(f"{DIM}[cached completion]{RESET}")
+    return message
+
+# Streaming variant of chat_with_model
+# Content deltas are written to stdout immediately. Tool calls arrive in fragments: the first delta for a
+# given index carries the id and function name, later deltas append pieces of the JSON arguments string.
+# The fragments are stitched together per index so the result looks like a regular (non-streamed) message.
+def stream_chat_with_model(messages, out=None, tools=None):
+    out = out or sys.stdout
+    started = time.perf_counter()
+    first_token_at = None
+    content_parts = []
+    tool_call_parts = {}
+
     response = client.chat.completions.create(
-        model="lmstudio-community/Qwen2.5-7B-Instruct-GGUF",
+        model=MODEL,
         messages=messages,
-        tools=tools,
-        temperature=0.7
+        tools=tools or registry.schemas(),
+        temperature=TEMPERATURE,
+        stream=True,
+        # Without this, OpenAI-compatible servers report no token usage for streamed replies
+        stream_options={"include_usage": True}
     )
-    return response.choices[0].message
+    out.write("Assistant: ")
+    out.flush()
+    chunks = 0
+    for chunk in response:
+        chunks += 1
+        # Servers that report usage while streaming send it on a final chunk without choices
+        record_usage(current_span(), getattr(chunk, "usage", None))
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            content_parts.append(delta.content)
+            out.write(delta.content)
+            out.flush()
+        for tool_delta in delta.tool_calls or []:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts = tool_call_parts.setdefault(tool_delta.index, {"id": None, "name": "", "arguments": []})
+            if tool_delta.id:
+                parts["id"] = tool_delta.id
+            if tool_delta.function is not None:
+                if tool_delta.function.name:
+                    parts["name"] += tool_delta.function.name
+                if tool_delta.function.arguments:
+                    parts["arguments"].append(tool_delta.function.arguments)
+
+    finished = time.perf_counter()
+    ttft = (first_token_at or finished) - started
+    out.write(f"\n{DIM}[time to first token: {ttft:.2f}s | total: {finished - started:.2f}s]{RESET}\n")
+    out.flush()
+    current_span().set(ttft_s=round(ttft, 4), chunks=chunks)
+
+    tool_calls = [
+        SimpleNamespace(
+            id=parts["id"] or f"call_{index}",
+            type="function",
+            function=SimpleNamespace(name=parts["name"], arguments="".join(parts["arguments"]) or "{}")
+        )
+        for index, parts in sorted(tool_call_parts.items())
+    ]
+    return SimpleNamespace(role="assistant", content="".join(content_parts) or None, tool_calls=tool_calls or None)
 
 # Router to handle tool calls
 # TOOL_METADATA_USAGE: This function is where the LLM's decision to call a tool is acted upon.
 # The 'tool_call' object contains the tool name and arguments decided by the LLM based on the metadata in the 'tools' list.
 # Observing which tool is called and with what arguments helps users understand how well the metadata matched the user's query.
 # If the LLM calls the wrong tool or provides incorrect parameters, it often indicates a need to refine the tool's description or parameters in the metadata.
-def handle_tool_call(tool_call):
+# Dispatch is a dictionary lookup in the registry, so its cost does not grow with the number of tools.
+def handle_tool_call(tool_call, file_paths=None):
+    if file_paths is None:
+        file_paths = last_file_paths
     tool_name = tool_call.function.name
-    tool_arguments = json.loads(tool_call.function.arguments)
-    
-    if tool_name == "multiply_numbers":
-        result = multiply_numbers(tool_arguments['a'], tool_arguments['b'])
-        return f"The result of multiplying {tool_arguments['a']} by {tool_arguments['b']} is {result}"
-    elif tool_name == "make_http_request":
-        result = make_http_request(tool_arguments['url'])
-        return f"HTTP Response: {result[:200]}..." if len(result) > 200 else f"HTTP Response: {result}"
-    elif tool_name == "get_sales_by_month":
-        result = get_sales_by_month(tool_arguments['month'])
-        return result
-    elif tool_name == "list_all_sold_products":
-        result = list_all_sold_products()
-        return result
-    elif tool_name == "get_top_expensive_products":
-        limit = tool_arguments.get('limit', 5)  # Default to 5 if not specified
-        result = get_top_expensive_products(limit)
-        return result
-    elif tool_name == "list_available_tools":
-        response = f"{BOLD}{CYAN}Here are the tools and functions I can assist you with:{RESET}\n"
-        for tool in tools:
-            tool_name = tool['function']['name']
-            tool_desc = tool['function']['description']
-            response += f"{GREEN}- `{tool_name}`{RESET}: {tool_desc}\n"
-        return response
-    elif tool_name == "read_file_content":
-        path = tool_arguments.get('path', last_file_paths.get("read_file_content"))
-        # Ensure path is absolute by resolving relative paths against BASE_DIR
-        if not os.path.isabs(path):
-            path = os.path.join(BASE_DIR, path)
-        last_file_paths["read_file_content"] = path  # Update last-used file
-        full_path = os.path.abspath(path)
-        print(f"Attempting to read file from: {full_path}")
-        result = read_file_content(path)
-        return f"Content of file '{path}':\n{result}"
-    elif tool_name == "read_json_file":
-        path = tool_arguments.get('path', last_file_paths.get("read_json_file"))
+    spec = registry.get(tool_name)
+    if spec is None:
+        return f"Unknown tool: {tool_name}"
+    tool_arguments = json.loads(tool_call.function.arguments or "{}")
+
+    path_kind = spec.options.get("remember_path")
+    if path_kind:
+        path = tool_arguments.get('path') or file_paths.get(path_kind)
+        if not path:
+            return f"Error: No path was given and no {path_kind} file has been read yet. Pass the file's path."
         # Ensure path is absolute by resolving relative paths against BASE_DIR
         if not os.path.isabs(path):
             path = os.path.join(BASE_DIR, path)
-        last_file_paths["read_json_file"] = path  # Update last-used file
-        full_path = os.path.abspath(path)
-        print(f"Attempting to read JSON file from: {full_path}")
-        result = read_json_file(path)
-        return f"Content of JSON file '{path}':\n{result}"
-    else:
-        return f"Unknown tool: {tool_name}"
+        file_paths[path_kind] = path  # Update last-used file
+        tool_arguments['path'] = path
+        print(f"Attempting to read file from: {os.path.abspath(path)}")
+
+    # Tools with a 'cache' option are answered from memory while their inputs are unchanged; the rest
+    # run on the executor, which applies the tool's isolation and timeout
+    registry.load(tool_name)
+    return tool_results.call(spec, tool_arguments, lambda: tool_executor.run(spec, tool_arguments),
+                             report=lambda outcome: current_span().set(cache=outcome))
+
+# Bounded thread pool shared by all turns, created on first use
+_tool_pool = None
+_tool_pool_lock = threading.Lock()
+
+def get_tool_pool():
+    global _tool_pool
+    with _tool_pool_lock:
+        if _tool_pool is None:
+            _tool_pool = ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS, thread_name_prefix="tool")
+        return _tool_pool
+
+# Run a tool call and turn any exception into a message for the model, so one failing tool
+# does not take down the other calls running next to it. The estimated tokens of every result
+# are counted per tool, since each result is resent with every later request
+def run_tool_call(tool_call, file_paths=None):
+    arguments = tool_call.function.arguments or ""
+    with tracer.span("tool", tool=tool_call.function.name, args_chars=len(arguments)) as span:
+        try:
+            result = handle_tool_call(tool_call, file_paths)
+        except Exception as e:
+            span.set(error=type(e).__name__)
+            result = f"Error running tool '{tool_call.function.name}': {str(e)}"
+        span.set(result_chars=len(result) if isinstance(result, str) else None,
+                 result_tokens=tool_output.record(tool_call.function.name, result))
+        return result
+
+# Execute all tool calls from one assistant message concurrently and return the results in call order.
+# Each call runs in a copy of the caller's context, so its trace span nests under the current turn.
+def run_tool_calls(tool_calls, file_paths=None):
+    if len(tool_calls) == 1:
+        return [run_tool_call(tool_calls[0], file_paths)]
+    pool = get_tool_pool()
+    futures = [run_in_context(pool, run_tool_call, tool_call, file_paths) for tool_call in tool_calls]
+    return [future.result() for future in futures]
+
+# The assistant message as it goes back into the history. The tool_calls have to be kept so the
+# 'tool' messages that follow can be matched to the call that produced them.
+def assistant_history_entry(message):
+    entry = {"role": "assistant", "content": message.content}
+    if message.tool_calls:
+        entry["tool_calls"] = [
+            {
+                "id": tool_call.id,
+                "type": "function",
+                "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments}
+            }
+            for tool_call in message.tool_calls
+        ]
+    return entry
+
+# One user turn of the agent loop
+# TOOL_METADATA_EXECUTION: This is where the LLM's decision to call tools is observed. If 'tool_calls' are present,
+# the LLM matched the query to a tool's metadata (name and description) and extracted parameters as defined.
+# All calls from one assistant message run in parallel, their results are appended as 'tool' messages and a
+# single follow-up completion is requested. If the follow-up asks for more tools the loop continues, up to max_steps rounds.
+# With a ContextManager, each request is built from a token-budgeted view of the history (old tool outputs
+# shortened, oldest turns left out) while 'messages' itself keeps everything.
+# With a ToolSelector, only the tools relevant to the user's message are offered, the same set for every request
+# in the turn; if the model calls a tool outside that set, the full list is offered for the rest of the turn.
+def run_turn(messages, user_input, stream=False, max_steps=MAX_TOOL_STEPS, file_paths=None, context=None,
+             selector=None):
+    with tracer.span("turn", user_chars=len(user_input)), (profiler.section() if profiler else nullcontext()):
+        return _run_turn(messages, user_input, stream, max_steps, file_paths, context, selector)
+
+def _run_turn(messages, user_input, stream, max_steps, file_paths, context, selector):
+    messages.append({"role": "user", "content": user_input})
+    selection = selector.select(user_input) if selector else None
+    if selection:
+        print(f"{DIM}[{selection.describe()}]{RESET}")
+    tools_offered = selection.schemas if selection else None
+    assistant_message = chat_with_model(prompt_messages(messages, context), stream=stream, tools=tools_offered)
+    show_assistant_message(assistant_message, stream)
+
+    steps = 0
+    used_tools = set()
+    while assistant_message.tool_calls and steps < max_steps:
+        called = {tool_call.function.name for tool_call in assistant_message.tool_calls}
+        used_tools |= called
+        if selection and not called <= selection.names:
+            selection = selector.fallback()
+            tools_offered = selection.schemas
+            print(f"{DIM}[{selection.describe()}]{RESET}")
+        messages.append(assistant_history_entry(assistant_message))
+        tool_responses = run_tool_calls(assistant_message.tool_calls, file_paths)
+        for tool_call, tool_response in zip(assistant_message.tool_calls, tool_responses):
+            print(f"Tool Output: {tool_response}")
+            messages.append({"role": "tool", "tool_call_id": tool_call.id, "content": tool_response})
+        steps += 1
+        current_span().set(steps=steps, tools_used=sorted(used_tools))
+
+        # Get follow-up response from assistant
+        assistant_message = chat_with_model(prompt_messages(messages, context), stream=stream, tools=tools_offered)
+        show_assistant_message(assistant_message, stream)
+
+    if selector:
+        selector.note_used(used_tools)
+    if assistant_message.tool_calls:
+        print(f"{DIM}[stopped after {max_steps} rounds of tool calls]{RESET}")
+    messages.append({"role": "assistant", "content": assistant_message.content})
+    return assistant_message
+
+# The messages to send for the next request, with the prompt size reported when a budget is in force
+def prompt_messages(messages, context=None):
+    if context is None:
+        return messages
+    view = context.view(messages)
+    print(f"{DIM}[{context.describe()}]{RESET}")
+    return view
+
+# Command line options
+# Streaming is the default for the interactive loop; --no-stream restores the blocking request/response behaviour.
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chat with a local LM Studio model that can call tools.")
+    parser.add_argument("--no-stream", dest="stream", action="store_false",
+                        help="Wait for the full completion instead of printing tokens as they arrive")
+    parser.add_argument("--max-steps", type=int, default=MAX_TOOL_STEPS,
+                        help="Maximum rounds of tool calls the model may chain within one turn")
+    parser.add_argument("--tool-workers", type=int, default=MAX_TOOL_WORKERS,
+                        help="Maximum number of tool calls from one message that run at the same time")
+    parser.add_argument("--context-budget", type=int, default=DEFAULT_CONTEXT_BUDGET,
+                        help="Estimated prompt size in tokens to stay under by shortening old tool outputs "
+                             "and leaving out old turns (0 sends the full history)")
+    parser.add_argument("--tool-top-k", type=int, default=0,
+                        help=f"Offer only the tools most relevant to each message, this many of them (e.g. {DEFAULT_TOP_K}; "
+                             "0, the default, offers every tool). A tool list that changes from message to message "
+                             "keeps the model server from reusing its prompt cache")
+    parser.add_argument("--completion-cache", choices=COMPLETION_CACHE_MODES,
+                        help="Keep model answers in a disk cache: 'cache' reuses answers to identical requests, "
+                             "'record' stores every answer, 'replay' answers only from the cache without a model server")
+    parser.add_argument("--cassette", help="Completion cache file (default .cache/completions.sqlite3)")
+    parser.add_argument("--endpoints",
+                        help="Comma-separated base URLs of OpenAI-compatible servers to spread requests over "
+                             "(default: LMSTUDIO_ENDPOINTS or " + BASE_URL + ")")
+    parser.add_argument("--sessions", action="store_true", help="List the saved chat sessions and exit")
+    parser.add_argument("--resume", metavar="SESSION", nargs="?", const="latest",
+                        help="Continue a saved session (the most recent one if no id is given)")
+    parser.add_argument("--no-session-log", dest="session_log", action="store_false",
+                        help="Do not save this session to .sessions/")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Write timing spans for turns, model requests and tool calls to this JSONL file "
+                             "and print p50/p95 figures at exit")
+    parser.add_argument("--profile", metavar="PREFIX", nargs="?", const=os.path.join(BASE_DIR, ".cache", "profile"),
+                        help="Run cProfile and tracemalloc around each turn and write PREFIX.prof and PREFIX.txt at exit")
+    return parser.parse_args(argv)
+
+# Print a non-streamed assistant message; streamed messages were already printed while they arrived
+def show_assistant_message(message, stream):
+    if not stream:
+        print(f"Assistant: {message.content}")
 
 # Main chat loop
-def main():
+def main(argv=None):
+    global MAX_TOOL_WORKERS, completion_cache, profiler, client
+    args = parse_args(argv)
+    if args.sessions:
+        print(describe_sessions(list_sessions()))
+        return
+    MAX_TOOL_WORKERS = max(1, args.tool_workers)
+    if args.endpoints:
+        client = ClientPool([url for url in args.endpoints.split(",") if url.strip()], API_KEY)
+    if isinstance(client, ClientPool):
+        client.start_health_checks()
+    if args.completion_cache:
+        completion_cache = CompletionCache(args.cassette, mode=args.completion_cache)
+    if args.trace or args.profile:
+        tracer.configure(args.trace)
+    if args.profile:
+        profiler = Profiler(args.profile)
     messages = [
-        {"role": "system", "content": "You are a helpful assistant with access to various tools. Use them to assist the user."}
+        {"role": "system", "content": SYSTEM_PROMPT}
     ]
+    # Every message is appended to the session log, so the conversation can be resumed later
+    session = None
+    if args.resume:
+        try:
+            session, resumed, file_paths = SessionLog.resume(None if args.resume == "latest" else args.resume)
+        except SessionNotFound as e:
+            print(f"Error: {e}")
+            return
+        messages = resumed or messages
+        last_file_paths.update(file_paths)
+        print(f"Resumed session {session.id}: {len(messages) - 1} recent messages loaded "
+              f"({max(0, session.message_count - 1)} in the session)")
+    elif args.session_log:
+        session = SessionLog.create()
+        print(f"Session {session.id} (continue it later with --resume {session.id})")
+    context = ContextManager(args.context_budget, registry.schemas_json()) if args.context_budget > 0 else None
+    selector = ToolSelector(registry, args.tool_top_k) if args.tool_top_k > 0 else None
     
-    # Test file reading capability at startup
-    print("Testing file reading capability...")
-    test_file_path = os.path.join(BASE_DIR, "examples", "sample_text.txt")
-    try:
-        content = read_file_content(test_file_path)
-        print(f"Successfully read file: {test_file_path}")
-        print(f"First 100 characters of content: {content[:100]}...")
-    except FileNotFoundError:
-        print(f"Failed to find file {test_file_path}")
-        print("Please ensure 'sample_text.txt' is in the 'examples' folder within the project directory.")
-        print("If the file is missing, you can create a sample text file or specify a different path when using the tool.")
-    except Exception as e:
-        print(f"Failed to read file {test_file_path}: {str(e)}")
-        print("Please check file permissions or if the file is accessible.")
-    
-    test_json_path = os.path.join(BASE_DIR, "examples", "sample.json")
-    try:
-        json_content = read_json_file(test_json_path)
-        print(f"Successfully read JSON file: {test_json_path}")
-        print(f"JSON content summary: {len(json_content)} characters")
-    except FileNotFoundError:
-        print(f"Failed to find JSON file {test_json_path}")
-        print("Please ensure 'sample.json' is in the 'examples' folder within the project directory.")
-        print("If the file is missing, you can add a sample JSON file or specify a different path when using the tool.")
-    except Exception as e:
-        print(f"Failed to read JSON file {test_json_path}: {str(e)}")
-        print("Please check file permissions or if the file is accessible.")
+    # Check that the sample files are in place. Only their metadata is read here; the tools load
+    # (and cache) the contents the first time the model asks for them.
+    print("Checking sample files...")
+    for kind, filename in (("text", "sample_text.txt"), ("JSON", "sample.json")):
+        sample_path = os.path.join(BASE_DIR, "examples", filename)
+        try:
+            size = os.stat(sample_path).st_size
+            print(f"Found {kind} file: {sample_path} ({size} bytes)")
+        except FileNotFoundError:
+            print(f"Failed to find {kind} file {sample_path}")
+            print(f"Please ensure '{filename}' is in the 'examples' folder within the project directory.")
+            print("If the file is missing, you can add one or specify a different path when using the tool.")
+        except OSError as e:
+            print(f"Failed to access {kind} file {sample_path}: {str(e)}")
+            print("Please check file permissions or if the file is accessible.")
     
-    print("File reading test completed. Starting chat...")
+    print("File check completed. Starting chat...")
     
     print("Start chatting with the model (type 'exit' to stop):")
     
     while True:
-        user_input = input("You: ")
+        try:
+            user_input = input("You: ")
+        except EOFError:  # end of piped input, e.g. a scripted replay
+            break
         if user_input.lower() == "exit":
             break
         
-        messages.append({"role": "user", "content": user_input})
-        assistant_message = chat_with_model(messages)
-        print(f"Assistant: {assistant_message.content}")
-        messages.append({"role": "assistant", "content": assistant_message.content})
-        
-        # TOOL_METADATA_EXECUTION: This section checks if the LLM decided to call a tool based on the metadata and user input.
-        # If 'tool_calls' are present, it means the LLM matched the query to a tool's metadata (name and description) and extracted parameters as defined.
-        # This is a key point to observe the outcome of the LLM's decision-making process - which tool was chosen and why (based on metadata matching).
-        # Users can learn from this by seeing how query phrasing influences tool selection.
-        if hasattr(assistant_message, 'tool_calls') and assistant_message.tool_calls:
-            for tool_call in assistant_message.tool_calls:
-                tool_response = handle_tool_call(tool_call)
-                print(f"Tool Output: {tool_response}")
-                messages.append({"role": "tool", "tool_call_id": tool_call.id, "content": tool_response})
-                
-                # Get follow-up response from assistant
-                follow_up_response = chat_with_model(messages)
-                print(f"Assistant: {follow_up_response.content}")
-                messages.append({"role": "assistant", "content": follow_up_response.content})
+        turn_start = len(messages)
+        try:
+            run_turn(messages, user_input, stream=args.stream, max_steps=args.max_steps, context=context,
+                     selector=selector)
+        except CompletionNotRecorded as e:
+            # The conversation went somewhere the recording did not; replay cannot continue
+            print(f"Replay stopped: {e}")
+            break
+        except KeyboardInterrupt:
+            # Ctrl-C stops the turn: running tools are cancelled and the unfinished turn is dropped
+            # (a tool call without its results would make the next request invalid)
+            tool_executor.cancel()
+            del messages[turn_start:]
+            print("\nTurn cancelled.")
+        finally:
+            if session is not None:
+                session.update(messages, last_file_paths)
+
+    if session is not None:
+        session.close(messages, last_file_paths)
+    if completion_cache is not None:
+        cache = completion_cache.stats()
+        print(f"Completion cache ({cache['mode']}): {cache['hits']} hits, {cache['misses']} misses, "
+              f"{cache['stored']} stored, {cache['entries']} entries")
+    if isinstance(client, ClientPool) and len(client.endpoints) > 1:
+        print(f"Endpoints:\n{client.describe()}")
+    if tracer.enabled:
+        print(f"Timings:\n{tracer.describe()}")
+        tracer.close()
+    if profiler is not None:
+        print("Profile written to " + " and ".join(profiler.write()))
+    if tool_output.stats():
+        print(f"Tool output tokens:\n{tool_output.describe()}")
+    executor = tool_executor.stats()
+    if executor["timeouts"] or executor["cancelled"] or executor["memory_limit"] or executor["worker_crashed"]:
+        print(f"Tool calls stopped: {executor['timeouts']} timed out, {executor['cancelled']} cancelled, "
+              f"{executor['memory_limit']} out of memory, {executor['worker_crashed']} crashed")
+    tool_executor.shutdown()
+    cache = tool_results.stats()
+    if cache["hit_rate"] is not None:
+        print(f"Tool result cache: {cache['hits'] + cache['coalesced']} of "
+              f"{cache['hits'] + cache['misses'] + cache['coalesced']} calls reused (hit rate {cache['hit_rate']:.0%})")
 
 if __name__ == "__main__":
     main()
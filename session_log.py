@@ -0,0 +1,300 @@
+"""
+Session Log
+
+Keeps chat sessions on disk so a conversation can be picked up again after the chat exits or crashes.
+Each session is a directory under SESSIONS_DIR (default .sessions/ in the project directory) with two
+files:
+
+    log.jsonl       append-only, one record per message ({"seq", "message"}) or change of the
+                    last-used file paths ({"seq", "file_paths"})
+    snapshot.json   the state at some record of the log: the recent history, the file paths and the
+                    byte offset in the log where the snapshot stops
+
+Records are flushed as they are written and fsynced in batches (every FSYNC_EVERY records, and at
+the end of every turn), so a crash loses at most the turn in progress. A snapshot is rewritten
+atomically every SNAPSHOT_EVERY records and when the session is closed.
+
+The snapshot is compact: it keeps the system prompt and only as many of the latest whole turns as
+fit in SNAPSHOT_TOKENS, which is about what the context budget would send to the model anyway.
+Resuming reads the snapshot and the records after its offset, which are never more than
+SNAPSHOT_EVERY, so it costs the same no matter how long the session has been running. The older
+turns stay in the log.
+
+    python llmchat.py --sessions            list saved sessions
+    python llmchat.py --resume [SESSION]    continue a session (the latest one if none is given)
+"""
+
+import json
+import os
+import time
+import uuid
+
+from context_manager import DEFAULT_CONTEXT_BUDGET, message_tokens
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+SESSIONS_DIR = os.environ.get("LMSTUDIO_SESSIONS_DIR", os.path.join(PROJECT_DIR, ".sessions"))
+FSYNC_EVERY = 32                        # records written between fsyncs
+SNAPSHOT_EVERY = 64                     # records written between snapshots
+SNAPSHOT_TOKENS = DEFAULT_CONTEXT_BUDGET
+LOG_FILE = "log.jsonl"
+SNAPSHOT_FILE = "snapshot.json"
+TITLE_CHARS = 60
+
+
+class SessionNotFound(LookupError):
+    pass
+
+
+def new_session_id():
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+def recent_turns(messages, max_tokens):
+    """
+    The system prompt plus the latest whole turns that fit in max_tokens (at least the last turn).
+
+    Args:
+        messages (list): The full conversation; messages[0] is the system prompt.
+        max_tokens (int): Estimated tokens the kept turns may take.
+
+    Returns:
+        list: The messages to keep.
+    """
+    if len(messages) <= 1:
+        return list(messages)
+    start = len(messages)
+    used = 0
+    for index in range(len(messages) - 1, 0, -1):
+        used += message_tokens(messages[index])
+        if messages[index].get("role") == "user":
+            if used > max_tokens and start < len(messages):
+                break
+            start = index
+    if start == len(messages):  # no user message yet
+        start = 1
+    return [messages[0]] + messages[start:]
+
+
+def _title(messages):
+    first = next((m.get("content") or "" for m in messages if m.get("role") == "user"), "")
+    first = " ".join(first.split())
+    return first if len(first) <= TITLE_CHARS else first[:TITLE_CHARS - 3] + "..."
+
+
+class SessionLog:
+    """
+    The on-disk log of one session. Use SessionLog.create() for a new session and
+    SessionLog.resume() to continue one.
+
+    Args:
+        path (str): The session directory.
+        fsync_every (int): Records written between fsyncs.
+        snapshot_every (int): Records written between snapshots.
+        snapshot_tokens (int): Estimated tokens of history kept in a snapshot.
+    """
+
+    def __init__(self, path, fsync_every=FSYNC_EVERY, snapshot_every=SNAPSHOT_EVERY, snapshot_tokens=SNAPSHOT_TOKENS):
+        self.path = path
+        self.id = os.path.basename(path)
+        self.fsync_every = fsync_every
+        self.snapshot_every = snapshot_every
+        self.snapshot_tokens = snapshot_tokens
+        self.seq = 0
+        self.message_count = 0         # messages in the whole session, including those no longer loaded
+        self.title = ""
+        self.created = time.time()
+        self._recorded = 0             # messages of the caller's list that are already in the log
+        self._file_paths = None
+        self._unsynced = 0
+        self._since_snapshot = 0
+        self._has_snapshot = False
+        os.makedirs(path, exist_ok=True)
+        self._file = open(os.path.join(path, LOG_FILE), "ab")
+
+    @classmethod
+    def create(cls, directory=None, session_id=None, **options):
+        path = os.path.join(directory or SESSIONS_DIR, session_id or new_session_id())
+        if os.path.exists(os.path.join(path, LOG_FILE)):
+            raise ValueError(f"Session '{os.path.basename(path)}' already exists")
+        return cls(path, **options)
+
+    @classmethod
+    def resume(cls, session_id=None, directory=None, **options):
+        """
+        Opens a session to continue it.
+
+        Args:
+            session_id (str): The session, or None for the most recently updated one.
+            directory (str): Where the sessions are kept (default SESSIONS_DIR).
+
+        Returns:
+            tuple: (SessionLog, messages, file_paths). Keep appending to `messages` and pass it
+            to update() after every turn.
+
+        Raises:
+            SessionNotFound: If there is no such session (or no session at all).
+        """
+        directory = directory or SESSIONS_DIR
+        if session_id is None:
+            sessions = list_sessions(directory)
+            if not sessions:
+                raise SessionNotFound(f"No sessions in {directory}")
+            session_id = sessions[0]["id"]
+        path = os.path.join(directory, session_id)
+        if not os.path.exists(os.path.join(path, LOG_FILE)):
+            raise SessionNotFound(f"No session '{session_id}' in {directory}")
+        snapshot = read_snapshot(path) or {}
+        messages = list(snapshot.get("messages", []))
+        file_paths = dict(snapshot.get("file_paths") or {})
+        seq = snapshot.get("seq", 0)
+        count = snapshot.get("message_count", 0)
+        with open(os.path.join(path, LOG_FILE), "rb") as file:
+            file.seek(snapshot.get("log_offset", 0))
+            tail = file.read()
+        # Only complete lines count; a line cut off by a crash is dropped from the file below
+        complete = tail[:tail.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("seq", 0) <= seq:
+                continue
+            seq = record["seq"]
+            if "message" in record:
+                messages.append(record["message"])
+                count += 1
+            elif "file_paths" in record:
+                file_paths = record["file_paths"]
+        if len(complete) < len(tail):
+            with open(os.path.join(path, LOG_FILE), "r+b") as file:
+                file.truncate(snapshot.get("log_offset", 0) + len(complete))
+
+        log = cls(path, **options)
+        log.seq = seq
+        log.message_count = count
+        log.title = snapshot.get("title") or _title(messages)
+        log.created = snapshot.get("created", log.created)
+        log._recorded = len(messages)
+        log._file_paths = dict(file_paths)
+        log._has_snapshot = bool(snapshot)
+        log._since_snapshot = seq - snapshot.get("seq", 0)
+        return log, messages, file_paths
+
+    def _write(self, record):
+        self.seq += 1
+        record = {"seq": self.seq, **record}
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+        self._unsynced += 1
+        self._since_snapshot += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def update(self, messages, file_paths=None):
+        """
+        Logs the messages added to `messages` since the last call, and the file paths if they changed.
+        Call it at the end of every turn: the new records are fsynced and a snapshot is taken when due.
+
+        Args:
+            messages (list): The conversation, messages[0] being the system prompt.
+            file_paths (dict): The last-used file paths.
+        """
+        for message in messages[self._recorded:]:
+            self._write({"message": message})
+            self.message_count += 1
+        self._recorded = len(messages)
+        if file_paths is not None and file_paths != self._file_paths:
+            self._write({"file_paths": file_paths})
+            self._file_paths = dict(file_paths)
+        if not self.title:
+            self.title = _title(messages)
+        self.sync()
+        if self._since_snapshot >= self.snapshot_every or not self._has_snapshot:
+            self.snapshot(messages)
+
+    def sync(self):
+        """Flushes the records written so far and fsyncs the log."""
+        self._file.flush()
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def snapshot(self, messages):
+        """Writes snapshot.json for the current end of the log (atomically, so a crash keeps the old one)."""
+        self.sync()
+        snapshot = {
+            "id": self.id,
+            "title": self.title,
+            "created": self.created,
+            "updated": time.time(),
+            "seq": self.seq,
+            "log_offset": self._file.tell(),
+            "message_count": self.message_count,
+            "messages": recent_turns(messages[:self._recorded], self.snapshot_tokens),
+            "file_paths": self._file_paths,
+        }
+        temporary = os.path.join(self.path, SNAPSHOT_FILE + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(snapshot, file, ensure_ascii=False, default=str)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, os.path.join(self.path, SNAPSHOT_FILE))
+        self._has_snapshot = True
+        self._since_snapshot = 0
+
+    def close(self, messages=None, file_paths=None):
+        """Logs what is left, writes a final snapshot if anything changed and closes the log."""
+        if self._file.closed:
+            return
+        if messages is not None:
+            self.update(messages, file_paths)
+            if self._since_snapshot:
+                self.snapshot(messages)
+        self.sync()
+        self._file.close()
+
+
+def read_snapshot(path):
+    try:
+        with open(os.path.join(path, SNAPSHOT_FILE), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def list_sessions(directory=None):
+    """
+    The saved sessions in `directory` (default SESSIONS_DIR), most recently updated first.
+
+    Returns:
+        list: Dicts with id, title, message count, created and updated times and log size in bytes.
+    """
+    directory = directory or SESSIONS_DIR
+    if not os.path.isdir(directory):
+        return []
+    sessions = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        log_path = os.path.join(path, LOG_FILE)
+        if not os.path.isfile(log_path):
+            continue
+        snapshot = read_snapshot(path) or {}
+        stat = os.stat(log_path)
+        sessions.append({
+            "id": name,
+            "title": snapshot.get("title", ""),
+            "messages": snapshot.get("message_count", 0),
+            "created": snapshot.get("created", stat.st_mtime),
+            "updated": max(snapshot.get("updated", 0), stat.st_mtime),
+            "log_bytes": stat.st_size,
+        })
+    sessions.sort(key=lambda session: session["updated"], reverse=True)
+    return sessions
+
+
+def describe_sessions(sessions):
+    """Printable session list, one line per session."""
+    if not sessions:
+        return "No saved sessions."
+    return "\n".join(f"{session['id']}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(session['updated']))}  "
+                     f"{session['messages']:>4} messages  {session['title']}" for session in sessions)
@@ -0,0 +1,80 @@
+"""
+Test script for Accounting Operations Tool
+
+Runs the SIE index tools against examples/sample.json, with NumPy columns when NumPy is
+installed and with array.array columns in any case.
+"""
+
+import json
+import time
+
+import pytest
+
+from tools import accounting_operations
+from tools.accounting_operations import (SieIndex, check_balances, get_account_history, get_top_movers,
+                                         get_year_over_year_changes)
+from tools.document_cache import DocumentCache
+
+SAMPLE = "examples/sample.json"
+BACKENDS = [None] + ([accounting_operations.np] if accounting_operations.np is not None else [])
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda backend: "array" if backend is None else "numpy", autouse=True)
+def backend(request, monkeypatch):
+    monkeypatch.setattr(accounting_operations, "np", request.param)
+    monkeypatch.setattr(accounting_operations, "documents", DocumentCache())
+
+
+def test_index_flattens_the_balance_history():
+    with open(SAMPLE, encoding="utf-8") as file:
+        index = SieIndex(json.load(file))
+    assert index.years == list(range(2010, 2023))
+    assert [int(index.year[row]) for row in index.by_account[1930]] == index.years
+    assert index.closing_for(2015, 1930) == 94063
+    assert index.opening_for(2022, 1930) == index.closing_for(2021, 1930)  # 2022 has no opening balances
+
+
+def test_account_history_and_year_over_year_changes():
+    history = get_account_history("1930", SAMPLE).split("\n")
+    assert history[0].startswith("Account 1930 Företagskonto / affärskonto (asset), SEK")
+    assert history[6] == "2015: 138928 -> 94063 (-44865)"
+    assert len(history) == 14
+
+    changes = get_year_over_year_changes("1930", SAMPLE).split("\n")
+    assert changes[2] == "2011: closing 120813 (75100, +164.3%)"
+    totals = get_year_over_year_changes(path=SAMPLE).split("\n")
+    assert totals[6].startswith("2015: total assets 453966 (55789, +14.0%)")
+    assert get_account_history("9999", SAMPLE).startswith("Error:")
+
+
+def test_top_movers_and_balance_checks():
+    movers = get_top_movers(2015, 2, SAMPLE).split("\n")
+    assert movers[1:] == ["1. 1510 Kundfordringar (asset): 8750 -> 62500 (53750)",
+                          "2. 1354 Obligationer (asset): 201981 -> 251981 (50000)"]
+    assert check_balances(2015, SAMPLE) == "2015: OK"
+    assert check_balances(path=SAMPLE).count("OK") == 13
+    assert get_top_movers(1999, path=SAMPLE).startswith("Error: No balances for 1999")
+    assert get_top_movers("last year", path=SAMPLE) == \
+        "Error: 'last year' is not a year. Years available: 2010-2022."
+    assert check_balances("2015/16", SAMPLE).startswith("Error: '2015/16' is not a year.")
+    assert check_balances("2015", SAMPLE) == "2015: OK"
+
+
+def test_repeated_queries_reuse_the_index():
+    get_account_history("1930", SAMPLE)
+    started = time.perf_counter()
+    for _ in range(100):
+        get_top_movers(2015, 5, SAMPLE)
+    assert (time.perf_counter() - started) / 100 < 0.005
+    assert accounting_operations.documents.stats()["misses"] == 1  # the index was built once
+
+
+def test_balance_check_reports_broken_totals(tmp_path):
+    with open(SAMPLE, encoding="utf-8") as file:
+        document = json.load(file)
+    document["history"]["balance_history"]["2015"]["closing_balances"]["total_assets"] += 100
+    broken = tmp_path / "broken.json"
+    broken.write_text(json.dumps(document), encoding="utf-8")
+    result = check_balances(2015, str(broken))
+    assert "assets accounts sum to 453966, total says 454066" in result
+    assert "assets + liabilities + equity = 100" in result
@@ -0,0 +1,152 @@
+"""
+Test script for the asyncio multi-session server
+
+Runs the engine against fake_openai_server.py, so no model server is needed.
+"""
+
+import asyncio
+import json
+
+import agent_server
+from fake_openai_server import start_fake_server
+
+
+def test_concurrent_sessions_respect_inflight_cap():
+    server = start_fake_server(latency=0.05)
+
+    async def scenario():
+        engine = agent_server.AsyncAgentEngine(base_url=server.base_url, max_inflight=3)
+        try:
+            report = await agent_server.load_test(engine, sessions=10, turns=2)
+            return engine, report
+        finally:
+            await engine.close()
+
+    try:
+        engine, report = asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+    assert report["turns"] == 20
+    assert engine.peak_inflight <= 3
+    assert server.peak_active_requests <= 3
+    # every turn is one tool call plus one follow-up
+    assert server.request_count == 40
+    session = engine.sessions["load-4"]
+    assert "The result of multiplying 4.0 by 2.0 is 8.0" in session.messages[-1]["content"]
+    assert session.file_paths is not engine.sessions["load-5"].file_paths
+
+
+def test_http_front_end_keeps_sessions_apart():
+    server = start_fake_server()
+
+    async def request(port, method, path, payload=None):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        status = int(response.split(b" ", 2)[1])
+        return status, json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+    async def scenario():
+        engine = agent_server.AsyncAgentEngine(base_url=server.base_url)
+        http = await asyncio.start_server(lambda r, w: agent_server.handle_connection(engine, r, w), "127.0.0.1", 0)
+        port = http.sockets[0].getsockname()[1]
+        try:
+            first = await request(port, "POST", "/chat", {"message": "hello"})
+            second = await request(port, "POST", "/chat", {"session_id": first[1]["session_id"], "message": "again"})
+            other = await request(port, "POST", "/chat", {"message": "someone else"})
+            bad = await request(port, "POST", "/chat", {})
+            health = await request(port, "GET", "/health")
+            return engine, first, second, other, bad, health
+        finally:
+            http.close()
+            await engine.close()
+
+    try:
+        engine, first, second, other, bad, health = asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+    assert first[0] == 200 and first[1]["reply"] == "Echo: hello"
+    assert second[1]["session_id"] == first[1]["session_id"]
+    assert other[1]["session_id"] != first[1]["session_id"]
+    assert bad[0] == 400
+    assert health[1]["sessions"] == 2
+    assert len(engine.sessions[first[1]["session_id"]].messages) == 5
+
+
+def test_bad_content_length_gets_an_error_reply(monkeypatch):
+    monkeypatch.setattr(agent_server, "MAX_BODY_BYTES", 100)
+
+    async def raw(port, head):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(head)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return int(response.split(b" ", 2)[1])
+
+    async def scenario():
+        engine = agent_server.AsyncAgentEngine(base_url="http://127.0.0.1:9/v1")
+        http = await asyncio.start_server(lambda r, w: agent_server.handle_connection(engine, r, w), "127.0.0.1", 0)
+        port = http.sockets[0].getsockname()[1]
+        try:
+            return [await raw(port, f"POST /chat HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+                    for length in ("ten", "-5", "101")]
+        finally:
+            http.close()
+            await engine.close()
+
+    assert asyncio.run(scenario()) == [400, 400, 413]
+
+
+def test_idle_sessions_are_dropped_unless_a_turn_is_running():
+    async def scenario():
+        engine = agent_server.AsyncAgentEngine(base_url="http://127.0.0.1:9/v1", session_idle_timeout=60)
+        try:
+            fresh, stale, busy = (engine.get_session(name) for name in ("fresh", "stale", "busy"))
+            now = fresh.last_active
+            stale.last_active = busy.last_active = now - 120
+            async with busy.lock:
+                dropped = engine.sweep_idle(now)
+            kept = sorted(engine.sessions)
+            engine.sweep_idle(now)
+            return dropped, kept, sorted(engine.sessions), engine.evicted_sessions
+        finally:
+            await engine.close()
+
+    dropped, kept, remaining, evicted = asyncio.run(scenario())
+    assert dropped == 1 and kept == ["busy", "fresh"]
+    assert remaining == ["fresh"] and evicted == 2
+
+
+def test_a_failed_turn_leaves_no_partial_messages():
+    from types import SimpleNamespace
+
+    replies = [SimpleNamespace(content=None, tool_calls=[SimpleNamespace(
+        id="c1", type="function", function=SimpleNamespace(name="multiply_numbers", arguments='{"a": 2, "b": 3}'))])]
+
+    async def complete(messages, session=None):
+        if not replies:
+            raise ConnectionError("model server went away")
+        return replies.pop(0)
+
+    async def scenario():
+        engine = agent_server.AsyncAgentEngine(base_url="http://127.0.0.1:9/v1")
+        engine.complete = complete
+        try:
+            session = engine.get_session("s")
+            before = list(session.messages)
+            try:
+                await engine.chat("s", "multiply 2 by 3")
+            except ConnectionError as e:
+                return before, session.messages, e
+        finally:
+            await engine.close()
+
+    before, after, error = asyncio.run(scenario())
+    assert "went away" in str(error)
+    assert after == before
@@ -0,0 +1,108 @@
+"""
+Test script for the Batch Runner
+
+Runs a small batch against fake_openai_server.py, then resumes it after a simulated crash.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import batch_runner
+from agent_server import AsyncAgentEngine
+from fake_openai_server import start_fake_server
+
+
+def write_lines(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+
+def run_items(server, items, output, concurrency=3):
+    async def scenario():
+        engine = AsyncAgentEngine(base_url=server.base_url, max_inflight=concurrency)
+        writer = batch_runner.ResultWriter(str(output))
+        try:
+            return engine, await batch_runner.run_batch(engine, items, writer, concurrency)
+        finally:
+            writer.close()
+            await engine.close()
+
+    return asyncio.run(scenario())
+
+
+def test_read_items_accepts_common_prompt_fields(tmp_path):
+    source = tmp_path / "in.jsonl"
+    source.write_text('{"request_id": "r1", "title": "t", "body": "first"}\n\n"second"\n{"id": 7, "prompt": "third"}\n')
+    assert batch_runner.read_items(str(source)) == [("r1", "first"), ("3", "second"), ("7", "third")]
+    source.write_text('{"id": 1, "prompt": "a"}\n{"id": 1, "prompt": "b"}\n')
+    with pytest.raises(ValueError, match="duplicate id"):
+        batch_runner.read_items(str(source))
+
+
+def test_batch_runs_concurrently_and_records_usage(tmp_path):
+    server = start_fake_server(latency=0.05)
+    items = [(str(i), f"multiply {i} by 2") for i in range(8)]
+    try:
+        engine, summary = run_items(server, items, tmp_path / "out.jsonl")
+    finally:
+        server.shutdown()
+
+    records = [json.loads(line) for line in (tmp_path / "out.jsonl").read_text().splitlines()]
+    assert summary["ok"] == 8 and summary["error"] == 0
+    assert sorted(record["id"] for record in records) == [str(i) for i in range(8)]
+    by_id = {record["id"]: record for record in records}
+    assert "14.0" in by_id["7"]["reply"]
+    assert by_id["3"]["usage"]["requests"] == 2 and by_id["3"]["usage"]["tool_calls"] == 1
+    assert by_id["3"]["usage"]["prompt_tokens"] > 0
+    assert 1 < server.peak_active_requests <= 3
+    assert not engine.sessions  # finished conversations are dropped
+
+
+def test_resume_skips_finished_items_and_repairs_a_cut_off_line(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text('{"id": "a", "status": "ok", "reply": "done"}\n{"id": "b", "status": "error", "error": "x"}\n{"id": "c", "sta')
+    assert batch_runner.completed_ids(str(output)) == {"a"}
+
+    source = tmp_path / "in.jsonl"
+    write_lines(source, [{"id": key, "prompt": f"hello {key}"} for key in "abc"])
+    items = [item for item in batch_runner.read_items(str(source)) if item[0] not in {"a"}]
+    server = start_fake_server()
+    try:
+        _, summary = run_items(server, items, output)
+    finally:
+        server.shutdown()
+
+    assert summary["ok"] == 2 and server.request_count == 2
+    lines = output.read_text().splitlines()
+    assert all(json.loads(line) for line in lines[3:])
+    assert batch_runner.completed_ids(str(output)) == {"a", "b", "c"}
+
+
+def test_results_are_written_off_the_event_loop(tmp_path):
+    import threading
+
+    class RecordingWriter(batch_runner.ResultWriter):
+        def write(self, record):
+            threads.append(threading.get_ident())
+            super().write(record)
+
+    threads = []
+    server = start_fake_server()
+
+    async def scenario():
+        engine = AsyncAgentEngine(base_url=server.base_url)
+        writer = RecordingWriter(str(tmp_path / "out.jsonl"))
+        try:
+            await batch_runner.run_batch(engine, [("1", "hello"), ("2", "again")], writer, concurrency=2)
+            return threading.get_ident()
+        finally:
+            writer.close()
+            await engine.close()
+
+    try:
+        loop_thread = asyncio.run(scenario())
+    finally:
+        server.shutdown()
+    assert len(threads) == 2 and loop_thread not in threads
+    assert batch_runner.completed_ids(str(tmp_path / "out.jsonl")) == {"1", "2"}
@@ -0,0 +1,59 @@
+"""
+Test script for the benchmark harness and the streaming fake server
+
+Runs the quick variant of a few benchmark groups and checks the report can be compared.
+"""
+
+import io
+import json
+
+from openai import OpenAI
+
+import benchmarks
+import llmchat
+from fake_openai_server import start_fake_server, stream_deltas
+
+
+def test_fake_server_streams_content_and_tool_call_fragments(monkeypatch):
+    message = {"content": None, "tool_calls": [{"id": "call_1", "type": "function",
+                                                "function": {"name": "get_top_movers", "arguments": '{"year": 2015}'}}]}
+    deltas = stream_deltas(message)
+    assert deltas[1]["tool_calls"][0]["function"]["name"] == "get_top_movers"
+    assert "".join(d["tool_calls"][0]["function"]["arguments"] for d in deltas[1:]) == '{"year": 2015}'
+
+    server = start_fake_server()
+    try:
+        monkeypatch.setattr(llmchat, "client", OpenAI(base_url=server.base_url, api_key="test"))
+        out = io.StringIO()
+        reply = llmchat.stream_chat_with_model([{"role": "user", "content": "hello streaming world"}], out=out)
+        assert reply.content == "Echo: hello streaming world"
+        assert "Assistant: Echo: hello streaming world" in out.getvalue()
+        reply = llmchat.stream_chat_with_model(
+            [{"role": "user", "content": 'tool:multiply_numbers {"a": 2, "b": 3} tool:get_top_movers {"year": 2015}'}],
+            out=io.StringIO())
+        assert [call.function.name for call in reply.tool_calls] == ["multiply_numbers", "get_top_movers"]
+        assert json.loads(reply.tool_calls[0].function.arguments) == {"a": 2, "b": 3}
+    finally:
+        server.shutdown()
+
+
+def test_quick_report_has_every_benchmark(tmp_path):
+    report = benchmarks.run_benchmarks(["dispatch", "json", "turns"], quick=True)
+    results = report["results"]
+    assert {"dispatch.registry", "dispatch.handle_tool_call", "turns.one_tool.stream",
+            "turns.parallel_tools.blocking"} <= set(results)
+    assert any(name.startswith("json.get_top_movers.") and name.endswith(".cold") for name in results)
+    assert any(name.startswith("json.get_top_movers.") and name.endswith(".executor") for name in results)
+    assert "turns.one_tool.stream.cached" in results and "turns.plain.blocking.cached" not in results
+    assert all(summary["p50"] <= summary["p95"] and summary["n"] >= 1 for summary in results.values())
+    # a tool turn needs two model round trips of simulated latency
+    assert results["turns.one_tool.blocking"]["p50"] >= 2 * results["turns.simulated_model_latency"]["p50"]
+    assert report["meta"]["quick"] is True
+
+
+def test_compare_flags_regressions():
+    def report(**p50s):
+        return {"meta": {"commit": None}, "results": {name: {"p50": value} for name, value in p50s.items()}}
+
+    rows = benchmarks.compare(report(a=1.0, b=1.0, c=1.0, gone=1.0), report(a=1.5, b=1.05, c=0.5, new=1.0))
+    assert [(name, verdict) for name, _, _, _, verdict in rows] == [("a", "slower"), ("b", "same"), ("c", "faster")]
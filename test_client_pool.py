@@ -0,0 +1,113 @@
+"""
+Test script for the Client Pool
+
+Spreads requests over several fake_openai_server.py instances, one of which can be taken down.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+import agent_server
+import client_pool
+from client_pool import ClientPool, conversation_key
+from fake_openai_server import start_fake_server
+
+
+@pytest.fixture
+def servers():
+    started = [start_fake_server(latency=0.05) for _ in range(2)]
+    yield started
+    for server in started:
+        server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(client_pool, "BACKOFF_BASE", 0.0)
+
+
+def dead_url():
+    server = start_fake_server()
+    url = server.base_url
+    server.shutdown()
+    server.server_close()
+    return url
+
+
+def conversation(text):
+    return [{"role": "system", "content": "test"}, {"role": "user", "content": text}]
+
+
+def test_concurrent_conversations_go_to_the_least_loaded_endpoint(servers):
+    pool = ClientPool([server.base_url for server in servers])
+    threads = [threading.Thread(target=pool.create, kwargs={"model": "m", "messages": conversation(f"hello {i}")})
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert [server.request_count for server in servers] == [2, 2]
+    stats = pool.stats()
+    assert all(endpoint["inflight"] == 0 and endpoint["p50_s"] >= 0.05 for endpoint in stats["endpoints"])
+    pool.close()
+
+
+def test_a_conversation_sticks_to_its_endpoint(servers):
+    pool = ClientPool([server.base_url for server in servers])
+    messages = conversation("hello")
+    for turn in range(3):
+        pool.create(model="m", messages=messages)
+        messages = messages + [{"role": "assistant", "content": "hi"}, {"role": "user", "content": f"more {turn}"}]
+    assert sorted(server.request_count for server in servers) == [0, 3]
+    assert pool.stats()["sticky_hits"] == 2
+    assert conversation_key(messages) == conversation_key(conversation("hello"))
+    pool.close()
+
+
+def test_failed_endpoint_is_skipped_and_the_request_retried(servers):
+    pool = ClientPool([dead_url(), servers[0].base_url], cooldown=60)
+    pool._sticky[conversation_key(conversation("hello"))] = 0  # pretend the conversation started on the dead one
+    response = pool.create(model="m", messages=conversation("hello"))
+    assert response.choices[0].message.content == "Echo: hello"
+    stats = pool.stats()
+    assert stats["retries"] == 1 and stats["failovers"] == 1
+    dead, alive = stats["endpoints"]
+    assert not dead["healthy"] and dead["errors"] == 1 and "APIConnectionError" in dead["last_error"]
+    assert alive["requests"] == 1
+    pool.create(model="m", messages=conversation("hello"))  # now sticks to the live endpoint
+    assert servers[0].request_count == 2
+    pool.close()
+
+
+def test_health_check_marks_endpoints_up_and_down(servers):
+    pool = ClientPool([servers[0].base_url, dead_url()])
+    assert list(pool.check_health().values()) == [True, False]
+    assert [endpoint["healthy"] for endpoint in pool.stats()["endpoints"]] == [True, False]
+    pool.close()
+
+
+def test_streams_stay_in_flight_until_consumed(servers):
+    pool = ClientPool([servers[0].base_url])
+    stream = pool.create(model="m", messages=conversation("one two three"), stream=True)
+    assert pool.stats()["endpoints"][0]["inflight"] == 1
+    text = "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices)
+    assert text == "Echo: one two three"
+    assert pool.stats()["endpoints"][0]["inflight"] == 0
+    pool.close()
+
+
+def test_agent_engine_spreads_sessions_over_endpoints(servers):
+    async def scenario():
+        engine = agent_server.AsyncAgentEngine(endpoints=[server.base_url for server in servers], max_inflight=8)
+        try:
+            return await agent_server.load_test(engine, sessions=8, turns=2)
+        finally:
+            await engine.close()
+
+    report = asyncio.run(scenario())
+    assert report["turns"] == 16
+    # 8 sessions x 2 turns x (tool call + follow-up); each session stays on one endpoint
+    assert sum(server.request_count for server in servers) == 32
+    assert all(server.request_count >= 8 for server in servers)
@@ -0,0 +1,89 @@
+"""
+Test script for the Completion Cache
+
+Records a scripted conversation through the chat loop and replays it with no model client at all.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import llmchat
+from completion_cache import CompletionCache, CompletionNotRecorded, request_key
+
+
+def make_message(content=None, tool_calls=None):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+
+def make_tool_call(id, name, arguments="{}"):
+    return SimpleNamespace(id=id, type="function", function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class ScriptedCompletions:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.responses.pop(0)
+
+
+def install_client(monkeypatch, responses):
+    completions = ScriptedCompletions(responses)
+    monkeypatch.setattr(llmchat, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    return completions
+
+
+def test_request_key_is_canonical():
+    messages = [{"role": "user", "content": "hi"}]
+    assert request_key("m", messages, [], {"temperature": 0.7}) == \
+        request_key("m", [{"content": "hi", "role": "user"}], None, {"temperature": 0.7})
+    assert request_key("m", messages, [], {"temperature": 0.7}) != request_key("m", messages, [], {"temperature": 0.2})
+    assert request_key("m", messages) != request_key("other", messages)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = CompletionCache(str(tmp_path / "c.sqlite3"), max_entries=2)
+    for key in ("a", "b"):
+        cache.store(key, "m", SimpleNamespace(content=key, tool_calls=None))
+    assert cache.lookup("a").content == "a"  # "b" is now the least recently used
+    cache.store("c", "m", SimpleNamespace(content="c", tool_calls=None))
+    assert cache.lookup("b") is None
+    assert cache.lookup("a").content == "a" and cache.lookup("c").content == "c"
+    assert cache.stats()["evicted"] == 1
+
+
+def test_record_then_replay_runs_the_agent_loop_offline(monkeypatch, tmp_path):
+    cassette = str(tmp_path / "cassette.sqlite3")
+    script = [make_message(tool_calls=[make_tool_call("call_1", "multiply_numbers", '{"a": 6, "b": 7}')]),
+              make_message("6 times 7 is 42.")]
+    completions = install_client(monkeypatch, script)
+    monkeypatch.setattr(llmchat, "completion_cache", CompletionCache(cassette, mode="record"))
+    recorded = [{"role": "system", "content": "test"}]
+    llmchat.run_turn(recorded, "What is 6 times 7?")
+    assert len(completions.calls) == 2
+
+    monkeypatch.setattr(llmchat, "client", None)  # any request to the model would fail
+    replay = CompletionCache(cassette, mode="replay")
+    monkeypatch.setattr(llmchat, "completion_cache", replay)
+    replayed = [{"role": "system", "content": "test"}]
+    reply = llmchat.run_turn(replayed, "What is 6 times 7?")
+
+    assert reply.content == "6 times 7 is 42."
+    assert replayed == recorded
+    assert replay.stats()["hits"] == 2
+
+    with pytest.raises(CompletionNotRecorded):
+        llmchat.run_turn([{"role": "system", "content": "test"}], "Something new")
+
+
+def test_cache_mode_only_asks_the_model_once(monkeypatch, tmp_path, capsys):
+    chunk = SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="Hello!", tool_calls=None))])
+    completions = install_client(monkeypatch, [iter([chunk])])
+    monkeypatch.setattr(llmchat, "completion_cache", CompletionCache(str(tmp_path / "c.sqlite3")))
+    for _ in range(3):
+        assert llmchat.chat_with_model([{"role": "user", "content": "hi"}], stream=True).content == "Hello!"
+    assert len(completions.calls) == 1
+    assert "[cached completion]" in capsys.readouterr().out
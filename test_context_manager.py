@@ -0,0 +1,73 @@
+"""
+Test script for the Context Manager
+
+Checks the token budget, the order in which history is shortened, and that the start of the prompt
+stays the same from one request to the next.
+"""
+
+import json
+
+from context_manager import ContextManager, estimate_tokens, message_tokens
+
+SYSTEM = {"role": "system", "content": "You are a helpful assistant."}
+
+
+def add_turn(messages, number, tool_output_chars=2000):
+    call_id = f"call_{number}"
+    messages.append({"role": "user", "content": f"question {number}"})
+    messages.append({"role": "assistant", "content": None, "tool_calls": [
+        {"id": call_id, "type": "function", "function": {"name": "read_file_content", "arguments": "{}"}}]})
+    messages.append({"role": "tool", "tool_call_id": call_id, "content": f"output {number} " + "x" * tool_output_chars})
+    messages.append({"role": "assistant", "content": f"answer {number}"})
+
+
+def test_token_estimates():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1 and estimate_tokens("abcde") == 2
+    assert message_tokens({"role": "user", "content": "x" * 40}) == 14
+
+
+def test_history_under_budget_is_sent_unchanged():
+    messages = [SYSTEM]
+    add_turn(messages, 1)
+    context = ContextManager(budget=10000)
+    assert context.view(messages) == messages
+    assert context.last_report["prompt_tokens"] == sum(message_tokens(m) for m in messages)
+
+
+def test_old_tool_outputs_are_shortened_first_and_stay_shortened():
+    messages = [SYSTEM]
+    context = ContextManager(budget=2000, tools_json=json.dumps([{"name": "t"}]))
+    views = []
+    for number in range(1, 7):
+        add_turn(messages, number)
+        messages.append({"role": "user", "content": "next"})
+        views.append(context.view(messages))
+        messages.pop()
+    original = [dict(m) for m in messages]
+
+    last = views[-1]
+    assert last[0] is SYSTEM
+    assert last[3]["content"].startswith("[Earlier tool output removed to save context (507 tokens). It began: output 1")
+    assert last[-1]["content"] == "next"
+    assert context.last_report["prompt_tokens"] <= 2000
+    assert messages == original  # the stored history is never modified
+    # Shortened messages are reused as-is, so the prompt prefix is stable between requests
+    assert views[-1][:4] == views[-2][:4]
+    assert context.describe().startswith("prompt ~")
+
+
+def test_oldest_turns_are_left_out_when_stubs_are_not_enough():
+    messages = [SYSTEM]
+    for number in range(1, 30):
+        add_turn(messages, number, tool_output_chars=100)
+    messages.append({"role": "user", "content": "latest " + "y" * 1000})
+    context = ContextManager(budget=600)
+    view = context.view(messages)
+    assert view[0] is SYSTEM and view[1]["role"] == "user"
+    assert view[-1]["content"].startswith("latest")
+    assert context.last_report["dropped_messages"] > 0
+    assert context.last_report["prompt_tokens"] <= 600
+    # Every kept tool message still follows the assistant message that called it
+    ids = {c["id"] for m in view if m.get("tool_calls") for c in m["tool_calls"]}
+    assert all(m["tool_call_id"] in ids for m in view if m["role"] == "tool")
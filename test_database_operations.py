@@ -0,0 +1,197 @@
+"""
+Test script for Database Operations Tool
+
+Builds a small sales database in a temporary directory and runs the sales tools against it.
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from create_sales_database import create_sales_data
+from tools import database_operations, db_connection
+
+
+@pytest.fixture
+def sales_db(tmp_path):
+    path = str(tmp_path / "sales.db")
+    create_sales_data(path)
+    conn = sqlite3.connect(path)
+    conn.execute("DELETE FROM sales")
+    conn.executemany("INSERT INTO sales (product_name, date_sold, price) VALUES (?, ?, ?)", [
+        ("Laptop", "2025-01-05", 1200.0),
+        ("Laptop", "2025-01-31", 1000.0),
+        ("Mouse", "2025-02-01", 25.5),
+        ("Monitor", "2024-12-31", 300.0),
+    ])
+    conn.commit()
+    conn.close()
+    db_connection.configure(path)
+    yield path
+    db_connection.configure(db_connection.DEFAULT_DB_PATH)
+
+
+def test_sales_by_month(sales_db):
+    assert database_operations.get_sales_by_month("2025-01") == \
+        "In 2025-01, there were 2 items sold, generating a total revenue of $2200.00."
+    assert database_operations.get_sales_by_month("2023-05") == "No sales data found for 2023-05."
+    assert database_operations.get_sales_by_month(202501) == "Error: '202501' is not a month in YYYY-MM format."
+
+
+def test_list_and_top_products(sales_db):
+    listing = database_operations.list_all_sold_products().split("\n")
+    assert listing[1:] == ["product,units_sold,revenue", "Laptop,2,2200.00", "Monitor,1,300.00", "Mouse,1,25.50"]
+    top = database_operations.get_top_expensive_products(2).split("\n")
+    assert top[1:] == ["rank,product,price,date_sold", "1,Laptop,1200.00,2025-01-05", "2,Laptop,1000.00,2025-01-31"]
+
+
+def test_connections_are_reused_per_thread_and_read_only(sales_db):
+    assert db_connection.get_connection() is db_connection.get_connection()
+    with pytest.raises(sqlite3.OperationalError):
+        db_connection.get_connection().execute("DELETE FROM sales")
+
+    seen = []
+
+    def worker():
+        database_operations.get_sales_by_month("2025-01")
+        seen.append(db_connection.get_connection())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(conn) for conn in seen}) == 4
+    assert db_connection.get_connection() not in seen
+
+
+def test_missing_database_is_reported(tmp_path):
+    db_connection.configure(str(tmp_path / "missing.db"))
+    try:
+        assert database_operations.list_all_sold_products().startswith("Error accessing sales data")
+    finally:
+        db_connection.configure(db_connection.DEFAULT_DB_PATH)
+
+
+def test_month_range_is_half_open():
+    assert database_operations.month_range("2025-01") == ("2025-01-01", "2025-02-01")
+    assert database_operations.month_range("2024-12") == ("2024-12-01", "2025-01-01")
+    assert database_operations.get_sales_by_month("January").startswith("Error:")
+
+
+def test_queries_use_the_indexes(sales_db):
+    conn = db_connection.get_connection()
+
+    def plan(query, params):
+        return " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params))
+
+    month_plan = plan(database_operations.SALES_BY_MONTH_QUERY, database_operations.month_range("2025-01"))
+    assert "COVERING INDEX idx_sales_date_price" in month_plan
+    top_plan = plan(database_operations.TOP_EXPENSIVE_QUERY, (5,))
+    assert "idx_sales_price" in top_plan
+    assert "TEMP B-TREE" not in top_plan
+
+
+def read_rollups(conn):
+    products = conn.execute("SELECT product_name, quantity_sold, round(total_revenue, 2) FROM product_sales_summary "
+                            "ORDER BY product_name").fetchall()
+    months = conn.execute("SELECT month, item_count, round(total_revenue, 2) FROM monthly_sales_summary "
+                          "ORDER BY month").fetchall()
+    return products, months
+
+
+def test_triggers_keep_rollups_in_step_with_sales(sales_db):
+    from create_sales_database import rebuild_rollups
+
+    conn = sqlite3.connect(sales_db)
+    assert read_rollups(conn)[1] == [("2024-12", 1, 300.0), ("2025-01", 2, 2200.0), ("2025-02", 1, 25.5)]
+
+    conn.execute("INSERT INTO sales (product_name, date_sold, price) VALUES ('Mouse', '2025-01-10', 30.0)")
+    conn.execute("UPDATE sales SET date_sold = '2025-03-01', price = 1100.0 WHERE price = 1000.0")
+    conn.execute("DELETE FROM sales WHERE product_name = 'Monitor'")
+    conn.commit()
+    maintained = read_rollups(conn)
+
+    rebuild_rollups(conn)
+    conn.commit()
+    assert read_rollups(conn) == maintained
+    assert ("Monitor", 1, 300.0) not in maintained[0]
+    assert ("2025-03", 1, 1100.0) in maintained[1]
+    conn.close()
+
+    assert database_operations.get_sales_by_month("2025-01") == \
+        "In 2025-01, there were 2 items sold, generating a total revenue of $1230.00."
+    assert "\nMouse,2,55.50" in database_operations.list_all_sold_products()
+
+
+def test_tools_fall_back_when_rollups_are_missing(sales_db):
+    from_rollup = database_operations.list_all_sold_products()
+    conn = sqlite3.connect(sales_db)
+    conn.execute("DROP TABLE product_sales_summary")
+    conn.execute("DROP TABLE monthly_sales_summary")
+    conn.commit()
+    conn.close()
+
+    assert "2 items sold" in database_operations.get_sales_by_month("2025-01")
+    # same rows in the same order, ties (Monitor and Mouse) included
+    assert database_operations.list_all_sold_products() == from_rollup
+
+
+def test_bulk_generator_is_reproducible_and_keeps_rollups_consistent(tmp_path):
+    from datetime import datetime
+    from create_sales_database import load_sales
+
+    first, second = str(tmp_path / "a.db"), str(tmp_path / "b.db")
+    options = dict(rows=5000, days=400, end_date=datetime(2025, 6, 30), product_count=40, seed=7, batch_size=1200)
+    assert load_sales(first, **options) == 5000
+    load_sales(second, **options)
+    load_sales(second, rows=1000, days=30, end_date=datetime(2025, 6, 30), seed=8, append=True)
+
+    conn = sqlite3.connect(first)
+    rows = conn.execute("SELECT product_name, date_sold, price FROM sales ORDER BY id").fetchall()
+    assert rows == sqlite3.connect(second).execute(
+        "SELECT product_name, date_sold, price FROM sales ORDER BY id LIMIT 5000").fetchall()
+    assert conn.execute("SELECT COUNT(DISTINCT product_name) FROM sales").fetchone()[0] == 40
+    assert min(row[1] for row in rows) == "2024-05-27" and max(row[1] for row in rows) == "2025-06-30"
+    conn.close()
+
+    from create_sales_database import rebuild_rollups
+    conn = sqlite3.connect(second)
+    assert conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == 6000
+    loaded = read_rollups(conn)
+    rebuild_rollups(conn)
+    assert read_rollups(conn) == loaded
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert len(conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall()) == 3
+    conn.close()
+
+
+def test_small_append_keeps_the_indexes_and_updates_the_rollups_in_place(tmp_path, monkeypatch):
+    from datetime import datetime
+    import create_sales_database
+    from create_sales_database import load_sales, rebuild_rollups
+
+    path = str(tmp_path / "sales.db")
+    options = dict(days=400, end_date=datetime(2025, 6, 30), product_count=30, batch_size=1000)
+    load_sales(path, rows=4000, seed=1, **options)
+    conn = sqlite3.connect(path)
+    index_pages = conn.execute("SELECT name, rootpage FROM sqlite_master WHERE type = 'index'").fetchall()
+    conn.close()
+
+    analyzed = []
+    original = create_sales_database.create_indexes
+    monkeypatch.setattr(create_sales_database, "create_indexes",
+                        lambda conn, analyze=True: analyzed.append(analyze) or original(conn, analyze))
+    load_sales(path, rows=300, seed=2, append=True, **options)
+    assert analyzed == [False]
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT name, rootpage FROM sqlite_master WHERE type = 'index'").fetchall() == index_pages
+    loaded = read_rollups(conn)
+    rebuild_rollups(conn)
+    assert read_rollups(conn) == loaded
+    conn.close()
+
+    load_sales(path, rows=5000, seed=3, append=True, **options)  # larger than half the table: rebuilt
+    assert analyzed == [False, True]
@@ -0,0 +1,210 @@
+"""
+Test script for the Tool Executor
+
+Runs small tools defined in this file on threads and in worker processes, and checks timeouts,
+memory limits, crashes, cancellation and worker reuse.
+"""
+
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import llmchat
+from tools import db_connection
+from tools.executor import ToolExecutor, ToolFailed
+from tools.registry import ToolSpec
+
+INTERRUPTED = []
+
+
+def sleepy(seconds: float = 0.0) -> str:
+    time.sleep(seconds)
+    return f"slept {seconds}"
+
+
+def pid() -> str:
+    return str(os.getpid())
+
+
+def hog(megabytes: int) -> str:
+    return str(len(bytearray(megabytes * 1024 * 1024)))
+
+
+def crash() -> str:
+    os._exit(3)
+
+
+def boom() -> str:
+    raise KeyError("missing")
+
+
+def endless_query() -> str:
+    try:
+        return str(db_connection.get_connection().execute(
+            "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT count(*) FROM c").fetchone())
+    except sqlite3.OperationalError as e:
+        INTERRUPTED.append(str(e))
+        raise
+
+
+def make_spec(func, **options):
+    properties = {name: {} for name in inspect.signature(func).parameters}
+    schema = {"function": {"name": func.__name__, "parameters": {"properties": properties}}}
+    return ToolSpec(func.__name__, __name__, schema, options, func)
+
+
+def stopped(result):
+    assert result.startswith("Error: ")
+    return json.loads(result[len("Error: "):])
+
+
+@pytest.fixture
+def executor():
+    executor = ToolExecutor()
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.parametrize("isolation", ["inline", "thread", "process"])
+def test_results_are_formatted_the_same_everywhere(executor, isolation):
+    spec = make_spec(sleepy, isolation=isolation, result_format="Result: {result}")
+    assert executor.run(spec, {"seconds": 0, "ignored": 1}) == "Result: slept 0"
+
+
+@pytest.mark.parametrize("isolation", ["thread", "process"])
+def test_slow_calls_time_out_with_a_structured_result(executor, isolation):
+    spec = make_spec(sleepy, isolation=isolation, timeout=0.3)
+    started = time.perf_counter()
+    result = stopped(executor.run(spec, {"seconds": 5}))
+    assert time.perf_counter() - started < 2
+    assert result["error"] == "timeout" and result["tool"] == "sleepy" and result["limit_s"] == 0.3
+    assert result["elapsed_s"] >= 0.3
+    assert executor.stats()["timeouts"] == 1
+    assert executor.run(make_spec(sleepy, isolation=isolation), {"seconds": 0}) == "slept 0"
+
+
+def test_process_workers_are_reused_and_killed_on_timeout(executor):
+    spec = make_spec(pid, isolation="process")
+    first, second = executor.run(spec, {}), executor.run(spec, {})
+    assert first == second != str(os.getpid())
+    assert executor.stats()["processes_started"] == 1
+    stopped(executor.run(make_spec(sleepy, isolation="process", timeout=0.2), {"seconds": 5}))
+    time.sleep(0.1)
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(first), 0)
+    assert executor.run(spec, {}) != first
+    assert executor.stats()["processes_started"] == 2
+
+
+def test_memory_limits_and_crashes_are_reported(executor):
+    result = stopped(executor.run(make_spec(hog, isolation="process", memory_mb=256), {"megabytes": 512}))
+    assert result["error"] == "memory_limit" and result["limit_mb"] == 256
+    assert stopped(executor.run(make_spec(crash, isolation="process"), {}))["error"] == "worker_crashed"
+    assert executor.run(make_spec(hog, isolation="process", memory_mb=256), {"megabytes": 16}) == str(16 * 1024 * 1024)
+
+
+def test_exceptions_reach_the_caller(executor):
+    with pytest.raises(KeyError):
+        executor.run(make_spec(boom), {})
+    with pytest.raises(ToolFailed, match="KeyError"):
+        executor.run(make_spec(boom, isolation="process"), {})
+
+
+def test_cancel_stops_every_call_in_progress(executor):
+    results = []
+    calls = [threading.Thread(target=lambda spec=spec: results.append(executor.run(spec, {"seconds": 10})))
+             for spec in (make_spec(sleepy, isolation="thread"), make_spec(sleepy, isolation="process"))]
+    for call in calls:
+        call.start()
+    deadline = time.time() + 5
+    while executor.stats()["active"] < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.3)  # let the worker process pick up its call
+    assert executor.cancel() == 2
+    for call in calls:
+        call.join(2)
+    assert [stopped(result)["error"] for result in results] == ["cancelled", "cancelled"]
+    assert executor.stats()["active"] == 0
+
+
+def test_a_timed_out_query_is_interrupted(executor, tmp_path):
+    path = str(tmp_path / "empty.db")
+    sqlite3.connect(path).close()
+    db_connection.configure(path)
+    INTERRUPTED.clear()
+    try:
+        result = stopped(executor.run(make_spec(endless_query, timeout=0.3), {}))
+        assert result["error"] == "timeout"
+        deadline = time.time() + 5
+        while not INTERRUPTED and time.time() < deadline:
+            time.sleep(0.01)
+        assert INTERRUPTED == ["interrupted"]
+    finally:
+        db_connection.configure(db_connection.DEFAULT_DB_PATH)
+
+
+def test_chat_runs_process_tools_in_a_worker():
+    from types import SimpleNamespace
+    from tools.accounting_operations import get_top_movers
+    from tools.memoize import tool_results
+
+    tool_results.clear()
+    call = SimpleNamespace(id="1", function=SimpleNamespace(name="get_top_movers", arguments='{"year": 2015}'))
+    result = llmchat.handle_tool_call(call, {"json": os.path.abspath("examples/sample.json")})
+    assert result == get_top_movers(2015, path="examples/sample.json")
+    stats = llmchat.tool_executor.stats()
+    assert stats["processes_started"] >= 1 and stats["idle_processes"] >= 1  # the worker is kept for the next call
+
+
+def test_workers_ignore_ctrl_c(executor):
+    import signal
+    spec = make_spec(pid, isolation="process")
+    worker = int(executor.run(spec, {}))
+    os.kill(worker, signal.SIGINT)
+    time.sleep(0.2)
+    os.kill(worker, 0)  # still alive
+    assert executor.run(spec, {}) == str(worker)
+
+
+def test_ctrl_c_while_waiting_interrupts_the_query(executor, tmp_path):
+    import signal
+    path = str(tmp_path / "empty.db")
+    sqlite3.connect(path).close()
+    db_connection.configure(path)
+    INTERRUPTED.clear()
+    threading.Timer(0.3, os.kill, (os.getpid(), signal.SIGINT)).start()
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            executor.run(make_spec(endless_query, timeout=10), {})
+        deadline = time.time() + 5
+        while not INTERRUPTED and time.time() < deadline:
+            time.sleep(0.01)
+        assert INTERRUPTED == ["interrupted"]
+        assert executor.stats()["cancelled"] == 1
+    finally:
+        db_connection.configure(db_connection.DEFAULT_DB_PATH)
+
+
+def test_threads_lost_to_hung_tools_do_not_block_later_calls():
+    executor = ToolExecutor(thread_workers=4)
+    hung = make_spec(sleepy, isolation="thread", timeout=0.1)
+    try:
+        assert stopped(executor.run(hung, {"seconds": 0.4}))["error"] == "timeout"
+        assert executor.stats()["lost_threads"] == 1
+        time.sleep(0.5)  # the tool returns and its thread is back in use
+        assert executor.stats()["lost_threads"] == 0
+
+        for _ in range(2):  # half the pool hangs: new calls go to a fresh pool
+            stopped(executor.run(hung, {"seconds": 2}))
+        stats = executor.stats()
+        assert stats["thread_pools_replaced"] == 1 and stats["lost_threads"] == 0
+        started = time.perf_counter()
+        assert executor.run(make_spec(sleepy, isolation="thread"), {"seconds": 0}) == "slept 0"
+        assert time.perf_counter() - started < 0.5
+    finally:
+        executor.shutdown()
@@ -13,5 +13,64 @@ def main():
     print("Result:")
     print(content)
 
+
+def write_log(tmp_path, lines):
+    path = tmp_path / "app.log"
+    path.write_text("".join(f"line {i} é\n" for i in range(1, lines + 1)), encoding="utf-8")
+    return str(path)
+
+
+def test_default_read_is_a_bounded_window(tmp_path):
+    from tools import file_operations
+    path = write_log(tmp_path, 200000)
+    result = read_file_content(path)
+    assert result.startswith("line 1 é\nline 2")
+    assert result.endswith("; continue with offset=10000)")
+    assert len(result) < file_operations.DEFAULT_READ_BYTES + 100
+    assert read_file_content("examples/sample_text.txt").endswith("The LM Studio Team\n\n")
+
+
+def test_line_ranges_and_tail(tmp_path, monkeypatch):
+    from tools import file_operations
+    monkeypatch.setattr(file_operations, "MMAP_THRESHOLD", 1024)
+    monkeypatch.setattr(file_operations, "SCAN_CHUNK", 4096)
+    path = write_log(tmp_path, 20000)
+    result = read_file_content(path, start_line=12345, end_line=12347)
+    assert result.split("\n")[:3] == ["line 12345 é", "line 12346 é", "line 12347 é"]
+    assert "continue with start_line=12348" in result
+    assert read_file_content(path, tail_lines=2).split("\n")[:2] == ["line 19999 é", "line 20000 é"]
+    assert read_file_content(path, start_line=20001).startswith("Error:")
+
+
+def test_last_line_of_a_newline_terminated_file_has_no_continue_hint(tmp_path):
+    path = tmp_path / "three.txt"
+    path.write_text("a\nbb\nc\n", encoding="utf-8")
+    assert read_file_content(str(path), start_line=3) == "c\n... (lines 3-3, bytes 5-6 of 7)"
+    assert read_file_content(str(path), start_line=2).endswith("(lines 2-3, bytes 2-6 of 7)")
+    assert read_file_content(str(path), start_line=2, end_line=2).endswith("; continue with start_line=3)")
+    assert read_file_content(str(path), start_line=4).startswith("Error:")
+    empty = tmp_path / "empty.txt"
+    empty.write_text("")
+    assert read_file_content(str(empty)) == ""
+    assert read_file_content(str(empty), offset=5) == "Error: Offset 5 is past the end of the file (0 bytes)."
+
+
+def test_byte_ranges_respect_utf8_boundaries(tmp_path):
+    path = tmp_path / "utf8.txt"
+    path.write_text("é" * 100, encoding="utf-8")
+    result = read_file_content(str(path), offset=1, length=10)
+    text, note = result.split("\n... ")
+    assert text == "é" * 4 and "�" not in text
+    assert note == "(bytes 2-10 of 200; continue with offset=10)"
+
+
+def test_file_stats(tmp_path):
+    from tools.file_operations import get_file_stats
+    assert get_file_stats("examples/sample_text.txt").startswith("361 bytes, 7 lines, encoding ascii")
+    stats = get_file_stats(write_log(tmp_path, 200000))
+    assert "lines (estimated" in stats and "encoding utf-8" in stats
+    assert get_file_stats(str(tmp_path / "missing.txt")).startswith("Error:")
+
+
 if __name__ == "__main__":
     main()
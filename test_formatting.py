@@ -0,0 +1,67 @@
+"""
+Test script for Result Formatting
+
+Checks the compact tables, the JSON record rows and the per-tool token counts.
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import llmchat
+from tools import formatting
+from tools.formatting import OutputMeter, estimate_tokens, table, tabulate
+from tools.json_operations import query_json_file
+
+
+def test_table_has_one_header_row_and_compact_cells():
+    text = table(("product", "units", "revenue"), [("Laptop", 3, 3600.0), ('Cable, 2 m "long"', 1, None)],
+                 title="Products:")
+    assert text.split("\n") == ["Products:", "product,units,revenue", "Laptop,3,3600.00", '"Cable, 2 m ""long""",1,']
+    assert table(("a", "b"), [(1, 2.5)], format="tsv") == "a\tb\n1\t2.50"
+    assert [json.loads(line) for line in table(("a", "b"), [("x", 2.345)], format="json").split("\n")] == \
+        [["a", "b"], ["x", 2.35]]
+    with pytest.raises(ValueError):
+        table(("a",), [], format="xml")
+
+
+def test_table_caps_rows_and_tokens():
+    rows = [(f"product {i}", i) for i in range(100)]
+    lines = table(("name", "n"), rows, max_rows=10).split("\n")
+    assert len(lines) == 12 and lines[-1] == "... 90 more rows (100 in total)"
+    capped = table(("name", "n"), rows, max_rows=None, max_tokens=50)
+    assert estimate_tokens(capped) <= 50 + 10  # the "more rows" line comes on top of the budget
+    assert capped.endswith("(100 in total)")
+    assert table(("name", "n"), rows[:3]).count("\n") == 3
+
+
+def test_uniform_records_become_rows():
+    records = [{"id": 1, "tags": [{"k": "a"}, {"k": "b"}]}, {"id": 2, "tags": []}]
+    assert tabulate({"items": records}) == {"items": [["id", "tags"], [1, [["k"], ["a"], ["b"]]], [2, []]]}
+    mixed = [{"a": 1}, {"b": 2}]
+    assert tabulate(mixed) == mixed
+    assert tabulate([{"a": 1}]) == [{"a": 1}]
+    result = json.loads(query_json_file("accounting_context.debit_credit_examples", "examples/sample.json"))
+    assert result[0] == ["account_type", "debit", "credit"] and len(result) == 6
+
+
+def test_tool_output_tokens_are_counted_per_tool(monkeypatch):
+    meter = OutputMeter()
+    assert meter.record("a", "x" * 40) == 10
+    meter.record("a", "x" * 8)
+    meter.record("b", "x" * 400)
+    stats = meter.stats()
+    assert list(stats) == ["b", "a"]
+    assert stats["a"] == {"calls": 2, "tokens": 12, "max_tokens": 10, "mean_tokens": 6}
+    assert "b: 1 calls, 100 tokens" in meter.describe()
+
+    monkeypatch.setattr(llmchat, "tool_output", meter)
+    call = SimpleNamespace(id="1", function=SimpleNamespace(name="multiply_numbers", arguments='{"a": 6, "b": 7}'))
+    result = llmchat.run_tool_call(call, {})
+    assert meter.stats()["multiply_numbers"]["tokens"] == estimate_tokens(result)
+
+
+def test_context_manager_shares_the_estimate():
+    import context_manager
+    assert context_manager.estimate_tokens is formatting.estimate_tokens
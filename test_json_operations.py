@@ -0,0 +1,90 @@
+"""
+Test script for JSON Operations Tool
+
+Queries examples/sample.json through both the in-memory and the streaming selector.
+"""
+
+import json
+
+import pytest
+
+from tools import json_operations
+from tools.json_operations import query_json_file, read_json_file
+
+SAMPLE = "examples/sample.json"
+
+
+@pytest.fixture(params=["memory", "stream"])
+def mode(request, monkeypatch):
+    if request.param == "stream":
+        monkeypatch.setattr(json_operations, "STREAM_THRESHOLD", 0)
+        monkeypatch.setattr(json_operations, "CHUNK_SIZE", 512)  # exercise buffer refills
+    return request.param
+
+
+def test_selector_returns_the_subtree_in_compact_form(mode):
+    result = query_json_file("history.balance_history.2015.opening_balances.assets.1930", SAMPLE)
+    assert json.loads(result) == {"account_number": "1930", "account_name": "Företagskonto / affärskonto",
+                                  "opening_balance": 138928, "closing_balance": 94063}
+    assert " " not in result.replace("Företagskonto / affärskonto", "")
+    assert query_json_file("company_info.name", SAMPLE) == '"Lite Company"'
+    assert json.loads(query_json_file("accounting_context.debit_credit_examples[1]", SAMPLE))["debit"] == "Decrease (-)"
+
+
+def test_wildcards_list_every_match(mode):
+    lines = query_json_file("history.balance_history.*.year_label", SAMPLE).split("\n")
+    assert lines[0] == 'history.balance_history.2010.year_label: "2010"'
+    assert len(lines) == 13
+
+
+def test_large_values_and_misses_are_outlined(mode):
+    result = query_json_file("history.balance_history", SAMPLE)
+    assert result.startswith("(too large to show")
+    assert '"2015":"object, 6 keys"' in result
+    missing = query_json_file("history.balance_history.2099", SAMPLE)
+    assert missing.startswith("Error: Nothing matches") and "2010, 2011" in missing
+    assert json.loads(query_json_file("", SAMPLE))["currency"] == "SEK"
+
+
+def test_read_json_file_outlines_large_documents(tmp_path):
+    assert "query_json_file" in read_json_file(SAMPLE)
+    small = tmp_path / "small.json"
+    small.write_text(json.dumps({"a": [1, 2], "b": "c"}, indent=4))
+    assert read_json_file(str(small)) == '{"a":[1,2],"b":"c"}'
+    assert query_json_file("a[5]", str(small)) == "Error: Nothing matches 'a[5]'. a has indexes 0-1."
+
+
+def test_parsed_documents_are_cached_until_the_file_changes(tmp_path, monkeypatch):
+    from tools.document_cache import DocumentCache
+    cache = DocumentCache()
+    monkeypatch.setattr(json_operations, "documents", cache)
+    path = tmp_path / "doc.json"
+    path.write_text('{"a": 1}')
+    parses = []
+    original = json_operations._parse_file
+    monkeypatch.setattr(json_operations, "_parse_file", lambda p: parses.append(p) or original(p))
+
+    for _ in range(3):
+        assert query_json_file("a", str(path)) == "1"
+    assert len(parses) == 1 and cache.stats()["hits"] == 2
+
+    path.write_text('{"a": 22}')
+    assert query_json_file("a", str(path)) == "22"
+    assert len(parses) == 2
+
+
+def test_document_cache_evicts_least_recently_used(tmp_path):
+    from tools.document_cache import DocumentCache, estimate_size
+    files = []
+    for name in "abc":
+        files.append(tmp_path / name)
+        files[-1].write_bytes(name.encode() * 1000)
+    cache = DocumentCache(max_bytes=2 * estimate_size(b"x" * 1000))
+    load = lambda p: open(p, "rb").read()
+    for file in files[:2]:
+        cache.get(str(file), "bytes", load)
+    cache.get(str(files[0]), "bytes", load)
+    cache.get(str(files[2]), "bytes", load)
+    assert cache.stats()["evicted"] == 1
+    cache.get(str(files[0]), "bytes", load)
+    assert cache.stats()["hits"] == 2
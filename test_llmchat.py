@@ -0,0 +1,154 @@
+"""
+Test script for the chat loop in llmchat
+
+These tests replace the LM Studio client with a scripted stand-in, so they run without a model server.
+"""
+
+import io
+from types import SimpleNamespace
+
+import llmchat
+
+
+def make_chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def make_tool_delta(index, id=None, name=None, arguments=None):
+    return SimpleNamespace(index=index, id=id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class ScriptedCompletions:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.responses.pop(0)
+
+
+def install_client(monkeypatch, responses):
+    completions = ScriptedCompletions(responses)
+    monkeypatch.setattr(llmchat, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    return completions
+
+
+def test_stream_prints_tokens_and_reports_timing(monkeypatch):
+    completions = install_client(monkeypatch, [iter([make_chunk("Hel"), make_chunk("lo"), make_chunk("!")])])
+    out = io.StringIO()
+
+    message = llmchat.stream_chat_with_model([{"role": "user", "content": "hi"}], out=out)
+
+    assert completions.calls[0]["stream"] is True
+    assert message.content == "Hello!"
+    assert message.tool_calls is None
+    assert out.getvalue().startswith("Assistant: Hello!")
+    assert "time to first token" in out.getvalue()
+
+
+def test_stream_assembles_tool_calls_from_fragments(monkeypatch):
+    install_client(monkeypatch, [iter([
+        make_chunk(tool_calls=[make_tool_delta(0, id="call_a", name="multiply_numbers", arguments="")]),
+        make_chunk(tool_calls=[make_tool_delta(0, arguments='{"a": 6, ')]),
+        make_chunk(tool_calls=[make_tool_delta(1, id="call_b", name="list_all_sold_products", arguments="{}")]),
+        make_chunk(tool_calls=[make_tool_delta(0, arguments='"b": 7}')]),
+    ])])
+
+    message = llmchat.stream_chat_with_model([{"role": "user", "content": "6*7"}], out=io.StringIO())
+
+    assert message.content is None
+    assert [call.id for call in message.tool_calls] == ["call_a", "call_b"]
+    assert message.tool_calls[0].function.name == "multiply_numbers"
+    assert message.tool_calls[0].function.arguments == '{"a": 6, "b": 7}'
+    assert message.tool_calls[1].function.arguments == "{}"
+
+
+def test_blocking_path_is_the_default(monkeypatch):
+    reply = SimpleNamespace(content="done", tool_calls=None)
+    completions = install_client(monkeypatch, [SimpleNamespace(choices=[SimpleNamespace(message=reply)])])
+
+    assert llmchat.chat_with_model([{"role": "user", "content": "hi"}]) is reply
+    assert "stream" not in completions.calls[0]
+
+
+def make_message(content=None, tool_calls=None):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+
+def make_tool_call(id, name, arguments="{}"):
+    return SimpleNamespace(id=id, type="function", function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def test_tool_calls_run_concurrently_with_one_follow_up(monkeypatch):
+    import threading
+    import time
+
+    calls = [make_tool_call(f"call_{i}", "slow_tool") for i in range(3)]
+    completions = install_client(monkeypatch, [make_message(tool_calls=calls), make_message("All done")])
+    barrier = threading.Barrier(3, timeout=5)
+
+    def slow_tool(tool_call, file_paths=None):
+        barrier.wait()  # only passes if all three calls are running at the same time
+        time.sleep(0.05)
+        return f"result of {tool_call.id}"
+
+    monkeypatch.setattr(llmchat, "handle_tool_call", slow_tool)
+    messages = [{"role": "system", "content": "test"}]
+
+    reply = llmchat.run_turn(messages, "go")
+
+    assert reply.content == "All done"
+    assert len(completions.calls) == 2
+    assert [m["role"] for m in messages] == ["system", "user", "assistant", "tool", "tool", "tool", "assistant"]
+    assert [call["id"] for call in messages[2]["tool_calls"]] == ["call_0", "call_1", "call_2"]
+    assert [m["content"] for m in messages[3:6]] == ["result of call_0", "result of call_1", "result of call_2"]
+
+
+def test_tool_loop_stops_at_step_limit(monkeypatch):
+    looping = make_message(tool_calls=[make_tool_call("call", "again")])
+    completions = install_client(monkeypatch, [looping, looping, looping])
+    monkeypatch.setattr(llmchat, "handle_tool_call", lambda tool_call, file_paths=None: "ok")
+
+    llmchat.run_turn([{"role": "system", "content": "test"}], "go", max_steps=2)
+
+    assert len(completions.calls) == 3
+
+
+def test_failing_tool_is_reported_to_the_model(monkeypatch):
+    install_client(monkeypatch, [make_message(tool_calls=[make_tool_call("call", "broken")]), make_message("sorry")])
+
+    def broken(tool_call, file_paths=None):
+        raise ValueError("boom")
+
+    monkeypatch.setattr(llmchat, "handle_tool_call", broken)
+    messages = [{"role": "system", "content": "test"}]
+
+    llmchat.run_turn(messages, "go")
+
+    assert "boom" in messages[3]["content"]
+
+
+def test_context_budget_shortens_the_prompt_but_not_the_history(monkeypatch, capsys):
+    from context_manager import ContextManager
+
+    completions = install_client(monkeypatch, [make_message(tool_calls=[make_tool_call("call", "big")]),
+                                               make_message("first"), make_message("second")])
+    monkeypatch.setattr(llmchat, "handle_tool_call", lambda tool_call, file_paths=None: "z" * 8000)
+    messages = [{"role": "system", "content": "test"}]
+    context = ContextManager(budget=1000)
+
+    llmchat.run_turn(messages, "read it", context=context)
+    llmchat.run_turn(messages, "and now?", context=context)
+
+    assert messages[3]["content"] == "z" * 8000
+    last_prompt = completions.calls[-1]["messages"]
+    assert last_prompt[3]["content"].startswith("[Earlier tool output removed")
+    assert "prompt ~" in capsys.readouterr().out
+
+
+def test_file_tool_without_any_path_asks_for_one():
+    tool_call = SimpleNamespace(id="c1", function=SimpleNamespace(name="read_file_content", arguments="{}"))
+    assert llmchat.handle_tool_call(tool_call, {}) == \
+        "Error: No path was given and no text file has been read yet. Pass the file's path."
@@ -0,0 +1,146 @@
+"""
+Test script for Tool Result Memoization
+
+Runs tool calls through a fresh ToolResultCache and checks when results are reused and when a
+change to the database or file makes the tool run again.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+from create_sales_database import create_sales_data
+from tools import db_connection, memoize
+from tools.memoize import ToolResultCache
+from tools.registry import registry
+
+
+def call(cache, name, arguments):
+    registry.load(name)
+    calls = []
+
+    def compute():
+        calls.append(name)
+        return registry.dispatch(name, arguments)
+
+    return cache.call(registry.get(name), dict(arguments), compute), len(calls)
+
+
+def test_pure_tool_is_reused_for_equivalent_arguments():
+    cache = ToolResultCache()
+    first, ran = call(cache, "multiply_numbers", {"a": 6, "b": 7})
+    assert ran == 1 and "42" in first
+    second, ran = call(cache, "multiply_numbers", {"b": 7, "a": 6, "unused": True})
+    assert (second, ran) == (first, 0)
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+    assert stats["per_tool"]["multiply_numbers"] == {"hits": 1, "misses": 1}
+
+
+def test_defaults_are_part_of_the_key():
+    spec = SimpleNamespace(name="get_top_expensive_products", options={"cache": "pure"},
+                           params=frozenset({"limit"}), func=lambda limit=5: None)
+    cache = ToolResultCache()
+    assert cache.canonical_key(spec, {}) == cache.canonical_key(spec, {"limit": 5})
+    assert cache.canonical_key(spec, {}) != cache.canonical_key(spec, {"limit": 6})
+
+
+def test_tools_without_policy_and_errors_are_not_cached():
+    cache = ToolResultCache()
+    spec = SimpleNamespace(name="t", options={"cache": "pure"}, params=frozenset(), func=None)
+    assert cache.call(spec, {}, lambda: "Error: busy") == "Error: busy"
+    assert cache.call(spec, {}, lambda: "ok") == "ok"
+    uncached = SimpleNamespace(name="u", options={}, params=frozenset(), func=None)
+    cache.call(uncached, {}, lambda: "a")
+    assert cache.call(uncached, {}, lambda: "b") == "b"
+    assert cache.stats()["entries"] == 1
+
+
+def test_identical_concurrent_calls_are_coalesced():
+    cache = ToolResultCache()
+    spec = SimpleNamespace(name="slow", options={"cache": "pure"}, params=frozenset({"x"}), func=None)
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def compute():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return "done"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.call(spec, {"x": 1}, compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.call(spec, {"x": 1}, compute)))
+                 for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert results == ["done"] * 5 and len(runs) == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_ttl_policy_expires(monkeypatch):
+    cache = ToolResultCache()
+    spec = SimpleNamespace(name="t", options={"cache": "ttl", "cache_ttl": 10}, params=frozenset(), func=None)
+    now = [100.0]
+    monkeypatch.setattr(memoize.time, "monotonic", lambda: now[0])
+    assert cache.call(spec, {}, lambda: "first") == "first"
+    now[0] = 109.0
+    assert cache.call(spec, {}, lambda: "second") == "first"
+    now[0] = 111.0
+    assert cache.call(spec, {}, lambda: "third") == "third"
+    assert cache.stats()["invalidated"] == 1
+
+
+def test_sqlite_tool_reruns_after_another_connection_writes(tmp_path):
+    path = str(tmp_path / "sales.db")
+    create_sales_data(path)
+    db_connection.configure(path)
+    try:
+        cache = ToolResultCache()
+        arguments = {"month": "2031-01"}
+        first, ran = call(cache, "get_sales_by_month", arguments)
+        assert ran == 1 and first == "No sales data found for 2031-01."
+        assert call(cache, "get_sales_by_month", arguments) == (first, 0)
+
+        conn = sqlite3.connect(path)
+        conn.execute("INSERT INTO sales (product_name, date_sold, price) VALUES ('Laptop', '2031-01-02', 900)")
+        conn.commit()
+        conn.close()
+        second, ran = call(cache, "get_sales_by_month", arguments)
+        assert ran == 1 and "1 items sold" in second
+    finally:
+        db_connection.configure(db_connection.DEFAULT_DB_PATH)
+
+
+def test_file_tool_reruns_after_the_file_changes(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("first version\n")
+    cache = ToolResultCache()
+    arguments = {"path": str(path)}
+    first, ran = call(cache, "read_file_content", arguments)
+    assert ran == 1 and "first version" in first
+    assert call(cache, "read_file_content", arguments) == (first, 0)
+
+    path.write_text("second version, longer\n")
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+    second, ran = call(cache, "read_file_content", arguments)
+    assert ran == 1 and "second version" in second
+
+
+def test_missing_file_is_passed_to_the_tool(tmp_path):
+    cache = ToolResultCache()
+    result, ran = call(cache, "read_file_content", {"path": str(tmp_path / "missing.txt")})
+    assert ran == 1 and "Error" in result
+    assert cache.stats()["uncached"] == 1
+
@@ -0,0 +1,156 @@
+"""
+Test script for the Session Log
+
+Writes sessions to a temporary directory, resumes them, and checks that resuming reads only the
+snapshot and the log records after it.
+"""
+
+import json
+import os
+
+import pytest
+
+import llmchat
+import session_log
+from fake_openai_server import start_fake_server
+from session_log import SessionLog, SessionNotFound, list_sessions, recent_turns
+
+SYSTEM = {"role": "system", "content": "You are a test."}
+
+
+def add_turn(messages, number, tool_output="x"):
+    messages.append({"role": "user", "content": f"question {number}"})
+    messages.append({"role": "assistant", "content": None, "tool_calls": [
+        {"id": f"call_{number}", "type": "function", "function": {"name": "t", "arguments": "{}"}}]})
+    messages.append({"role": "tool", "tool_call_id": f"call_{number}", "content": tool_output})
+    messages.append({"role": "assistant", "content": f"answer {number}"})
+
+
+def test_a_session_resumes_where_it_stopped(tmp_path):
+    log = SessionLog.create(str(tmp_path), "s1")
+    messages = [SYSTEM]
+    add_turn(messages, 1)
+    log.update(messages, {"json": "a.json"})
+    add_turn(messages, 2)
+    log.close(messages, {"json": "b.json"})
+
+    resumed_log, resumed, file_paths = SessionLog.resume("s1", str(tmp_path))
+    assert resumed == messages
+    assert file_paths == {"json": "b.json"}
+    assert resumed_log.message_count == 9 and resumed_log.title == "question 1"
+
+    add_turn(resumed, 3)
+    resumed_log.close(resumed, file_paths)
+    assert SessionLog.resume("s1", str(tmp_path))[1] == resumed
+    seqs = [json.loads(line)["seq"] for line in open(tmp_path / "s1" / "log.jsonl")]
+    assert seqs == list(range(1, len(seqs) + 1))
+    with pytest.raises(SessionNotFound):
+        SessionLog.resume("nope", str(tmp_path))
+    with pytest.raises(ValueError):
+        SessionLog.create(str(tmp_path), "s1")
+
+
+def test_resume_reads_a_bounded_snapshot_and_tail(tmp_path):
+    log = SessionLog.create(str(tmp_path), "long", snapshot_every=20, snapshot_tokens=200)
+    messages = [SYSTEM]
+    for number in range(300):
+        add_turn(messages, number, tool_output="y" * 100)
+        log.update(messages)
+
+    resumed_log, resumed, _ = SessionLog.resume("long", str(tmp_path))
+    assert resumed[0] == SYSTEM and resumed[-1] == {"role": "assistant", "content": "answer 299"}
+    assert len(resumed) < 30  # the recent turns only, not 1201 messages
+    assert resumed_log.message_count == len(messages)
+    assert resumed[1]["role"] == "user"  # whole turns are kept
+    snapshot = json.load(open(tmp_path / "long" / "snapshot.json"))
+    with open(tmp_path / "long" / "log.jsonl", "rb") as file:
+        file.seek(snapshot["log_offset"])
+        assert len(file.read().splitlines()) < 20
+    assert os.path.getsize(tmp_path / "long" / "log.jsonl") > 100 * 1200  # older turns stay in the log
+
+
+def test_a_record_cut_off_by_a_crash_is_dropped(tmp_path):
+    log = SessionLog.create(str(tmp_path), "crash", snapshot_every=1000)
+    messages = [SYSTEM]
+    add_turn(messages, 1)
+    log.update(messages)
+    log.sync()
+    with open(tmp_path / "crash" / "log.jsonl", "ab") as file:
+        file.write(b'{"seq": 6, "message": {"role": "us')
+
+    resumed_log, resumed, _ = SessionLog.resume("crash", str(tmp_path))
+    assert resumed == messages
+    add_turn(resumed, 2)
+    resumed_log.close(resumed)
+    for line in open(tmp_path / "crash" / "log.jsonl"):
+        json.loads(line)
+    assert SessionLog.resume("crash", str(tmp_path))[1] == resumed
+
+
+def test_fsyncs_are_batched(tmp_path, monkeypatch):
+    log = SessionLog.create(str(tmp_path), "sync", fsync_every=8, snapshot_every=1000)
+    messages = [SYSTEM]
+    add_turn(messages, 0)
+    log.update(messages)  # also writes the first snapshot
+    calls = []
+    monkeypatch.setattr(session_log.os, "fsync", lambda fd: calls.append(fd))
+    for number in range(1, 6):
+        add_turn(messages, number)
+    log.update(messages)  # 20 records: two batches of 8 plus the end of the turn
+    assert len(calls) == 3
+    log.update(messages)
+    assert len(calls) == 3  # nothing new, nothing to sync
+
+
+def test_recent_turns_keeps_whole_turns_and_the_last_one():
+    messages = [SYSTEM]
+    for number in range(5):
+        add_turn(messages, number, tool_output="z" * 400)
+    kept = recent_turns(messages, 10)
+    assert kept == [SYSTEM] + messages[-4:]
+    assert recent_turns(messages, 10 ** 6) == messages
+    assert recent_turns([SYSTEM], 10) == [SYSTEM]
+
+
+def test_sessions_are_listed_most_recent_first(tmp_path):
+    for name, question in (("a", "first question"), ("b", "second question " * 10)):
+        log = SessionLog.create(str(tmp_path), name)
+        log.close([SYSTEM, {"role": "user", "content": question}])
+        os.utime(tmp_path / name / "log.jsonl", (1000, 1000) if name == "a" else None)
+    sessions = list_sessions(str(tmp_path))
+    assert [session["id"] for session in sessions] == ["b", "a"]
+    assert sessions[0]["title"].endswith("...") and sessions[1]["messages"] == 2
+    assert SessionLog.resume(directory=str(tmp_path))[0].id == "b"
+    assert list_sessions(str(tmp_path / "missing")) == []
+
+
+def test_chat_can_be_resumed_from_the_command_line(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(session_log, "SESSIONS_DIR", str(tmp_path))
+    server = start_fake_server()
+
+    def chat(lines, *options):
+        answers = iter(lines)
+
+        def fake_input(prompt):
+            try:
+                return next(answers)
+            except StopIteration:
+                raise EOFError
+
+        monkeypatch.setattr("builtins.input", fake_input)
+        monkeypatch.setattr(llmchat, "client", llmchat.client)  # main() replaces it; put it back afterwards
+        llmchat.main(["--no-stream", "--tool-top-k", "0", "--endpoints", server.base_url, *options])
+        return capsys.readouterr().out
+
+    try:
+        chat(["hello there", "exit"])
+        (session,) = list_sessions()
+        output = chat(["again"], "--resume")
+        assert f"Resumed session {session['id']}: 2 recent messages loaded" in output
+        assert "Echo: again" in output
+        assert "hello there" in chat([], "--sessions")
+        _, messages, _ = SessionLog.resume(session["id"])
+        assert [m["content"] for m in messages[1:]] == ["hello there", "Echo: hello there", "again", "Echo: again"]
+        assert "No session 'missing'" in chat([], "--resume", "missing")
+    finally:
+        server.shutdown()
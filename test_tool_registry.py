@@ -0,0 +1,104 @@
+"""
+Test script for the tool registry
+
+Checks that schemas are generated from signatures and docstrings, that dispatch goes through
+the registry, and that tool modules are only imported when a tool is first called.
+"""
+
+import json
+import os
+import textwrap
+from types import SimpleNamespace
+
+import llmchat
+from tools.registry import ToolRegistry, registry
+
+
+def make_tool_call(name, arguments):
+    return SimpleNamespace(id="call", function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+
+def write_tool_package(tmp_path):
+    package = tmp_path / "fake_tools"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "greeting.py").write_text(textwrap.dedent('''
+        from typing import Optional
+        from tools.registry import tool
+
+        LOADED = True
+
+        @tool(result_format="Greeting: {result}")
+        def greet(name: str, times: int = 1, punctuation: Optional[str] = None, tags: list = None) -> str:
+            """
+            Greet someone by name.
+
+            Args:
+                name (str): Who to greet
+                times (int): How many times to repeat
+                    the greeting.
+                punctuation (str): Optional ending
+
+            Returns:
+                str: The greeting.
+            """
+            return " ".join([f"Hello {name}{punctuation or '!'}"] * times)
+
+        def helper():
+            return "not a tool"
+    '''))
+    return package
+
+
+def test_schema_is_built_from_signature_and_docstring(tmp_path, monkeypatch):
+    package = write_tool_package(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    fake_registry = ToolRegistry(package="fake_tools", package_dir=str(package))
+
+    assert fake_registry.names() == ["greet"]
+    function = fake_registry.schemas()[0]["function"]
+    assert function["description"] == "Greet someone by name."
+    assert function["parameters"]["required"] == ["name"]
+    properties = function["parameters"]["properties"]
+    assert properties["name"] == {"type": "string", "description": "Who to greet"}
+    assert properties["times"] == {"type": "integer", "description": "How many times to repeat the greeting."}
+    assert properties["punctuation"]["type"] == "string"
+    assert properties["tags"]["type"] == "array"
+    assert fake_registry.schemas() is fake_registry.schemas()
+    assert json.loads(fake_registry.schemas_json()) == fake_registry.schemas()
+
+
+def test_tool_module_is_imported_on_first_call(tmp_path, monkeypatch):
+    import sys
+
+    package = write_tool_package(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    fake_registry = ToolRegistry(package="fake_tools", package_dir=str(package))
+    fake_registry.discover()
+
+    assert "fake_tools.greeting" not in sys.modules
+    assert fake_registry.dispatch("greet", {"name": "Ada", "times": 2, "unexpected": 1}) == "Greeting: Hello Ada! Hello Ada!"
+    assert "fake_tools.greeting" in sys.modules
+
+
+def test_builtin_tools_are_registered():
+    names = registry.names()
+    for name in ("multiply_numbers", "make_http_request", "get_sales_by_month", "list_all_sold_products",
+                 "get_top_expensive_products", "read_file_content", "read_json_file", "list_available_tools"):
+        assert name in names
+    assert llmchat.tools is registry.schemas()
+
+
+def test_handle_tool_call_dispatches_and_formats():
+    result = llmchat.handle_tool_call(make_tool_call("multiply_numbers", {"a": 6, "b": 7}))
+    assert result == "The result of multiplying 6 by 7 is 42"
+    assert llmchat.handle_tool_call(make_tool_call("no_such_tool", {})) == "Unknown tool: no_such_tool"
+
+
+def test_file_tools_fall_back_to_last_used_path():
+    file_paths = dict(llmchat.last_file_paths)
+    file_paths["text"] = os.path.join(llmchat.BASE_DIR, "examples", "sample_text.txt")
+
+    result = llmchat.handle_tool_call(make_tool_call("read_file_content", {}), file_paths)
+
+    assert result.startswith(f"Content of file '{file_paths['text']}':")
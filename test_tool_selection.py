@@ -0,0 +1,59 @@
+"""
+Test script for Tool Selection
+
+Ranks the real tool registry against typical questions and checks the fallback in the chat loop.
+"""
+
+import json
+
+import llmchat
+from test_llmchat import install_client, make_message, make_tool_call
+from tool_selection import ToolSelector, tokenize
+
+
+def test_tokenize_drops_stopwords_and_endings():
+    assert tokenize("What are the balances of the accounts?") == ["balance", "account"]
+    assert tokenize("multiplying numbers") == ["multiply", "number"]
+
+
+def test_relevant_tools_are_selected_in_registry_order():
+    selector = ToolSelector(llmchat.registry, top_k=3)
+    assert selector.rank("Fetch https://example.com")[0][1] == "make_http_request"
+    assert selector.rank("What were the sales in 2025-01?")[0][1] == "get_sales_by_month"
+    assert selector.rank("What is the trend of account 1930?")[0][1] == "get_account_history"
+
+    selection = selector.select("Show the last 20 lines of the log file")
+    assert "read_file_content" in selection.names and "list_available_tools" in selection.names
+    order = llmchat.registry.names()
+    assert [s["function"]["name"] for s in selection.schemas] == sorted(selection.names, key=order.index)
+    assert selection.tokens_sent < selection.tokens_full
+    assert "tool tokens saved" in selection.describe()
+
+
+def test_unmatched_messages_get_every_tool():
+    selector = ToolSelector(llmchat.registry, top_k=3)
+    assert selector.select("hi there").schemas is llmchat.registry.schemas()
+    assert ToolSelector(llmchat.registry, top_k=0).select("multiply 2 by 3").schemas is llmchat.registry.schemas()
+
+
+def test_recently_used_tools_stay_available():
+    selector = ToolSelector(llmchat.registry, top_k=2)
+    selector.note_used({"get_top_movers"})
+    assert "get_top_movers" in selector.select("and for 2016?").names
+
+
+def test_turn_falls_back_to_all_tools_when_the_model_calls_an_unsent_tool(monkeypatch):
+    completions = install_client(monkeypatch, [
+        make_message(tool_calls=[make_tool_call("call", "get_sales_by_month", json.dumps({"month": "2025-01"}))]),
+        make_message("done"),
+    ])
+    monkeypatch.setattr(llmchat, "handle_tool_call", lambda tool_call, file_paths=None: "ok")
+    selector = ToolSelector(llmchat.registry, top_k=2)
+
+    llmchat.run_turn([{"role": "system", "content": "test"}], "multiply 6 by 7", selector=selector)
+
+    first, follow_up = (call["tools"] for call in completions.calls)
+    assert "get_sales_by_month" not in {s["function"]["name"] for s in first}
+    assert follow_up is llmchat.registry.schemas()
+    assert selector.stats["fallbacks"] == 1
+    assert selector.recent[-1] == {"get_sales_by_month"}
@@ -0,0 +1,101 @@
+"""
+Test script for Tracing
+
+Runs a scripted turn with parallel tool calls under the tracer and checks the spans it writes.
+"""
+
+import contextlib
+import io
+import json
+import tracemalloc
+from types import SimpleNamespace
+
+import pytest
+
+import llmchat
+import tracing
+
+
+def make_response(content=None, tool_calls=None, prompt_tokens=0, completion_tokens=0):
+    message = SimpleNamespace(content=content, tool_calls=tool_calls)
+    usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def make_tool_call(id, name, arguments):
+    return SimpleNamespace(id=id, type="function", function=SimpleNamespace(name=name, arguments=arguments))
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    tracing.tracer.configure(str(path))
+    yield path
+    tracing.tracer.configure(enabled=False)
+
+
+def test_turn_spans_nest_across_tool_threads(monkeypatch, trace_file):
+    calls = [make_tool_call("c1", "multiply_numbers", '{"a": 3, "b": 4}'),
+             make_tool_call("c2", "multiply_numbers", '{"a": 5, "b": 6}')]
+    responses = [make_response(tool_calls=calls, prompt_tokens=100, completion_tokens=20),
+                 make_response("12 and 30", prompt_tokens=150, completion_tokens=5)]
+    completions = SimpleNamespace(create=lambda **kwargs: responses.pop(0))
+    monkeypatch.setattr(llmchat, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+
+    llmchat.run_turn([{"role": "system", "content": "test"}], "multiply twice", max_steps=2)
+    tracing.tracer.close()
+
+    spans = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    turn = next(span for span in spans if span["name"] == "turn")
+    assert turn["parent_id"] is None and turn["attrs"]["steps"] == 1
+    assert turn["attrs"]["tools_used"] == ["multiply_numbers"]
+    llm = [span for span in spans if span["name"] == "llm"]
+    tools = [span for span in spans if span["name"] == "tool"]
+    assert len(llm) == 2 and len(tools) == 2
+    assert all(span["parent_id"] == turn["span_id"] and span["trace_id"] == turn["trace_id"] for span in llm + tools)
+    assert llm[0]["attrs"]["prompt_tokens"] == 100 and llm[0]["attrs"]["tool_calls"] == 2
+    assert {span["attrs"]["tool"] for span in tools} == {"multiply_numbers"}
+    assert all(span["attrs"]["result_chars"] > 0 and "cache" in span["attrs"] for span in tools)
+
+    summary = tracing.tracer.summary()
+    assert summary["spans"]["tool"]["count"] == 2
+    assert summary["spans"]["turn"]["p50_s"] >= summary["spans"]["llm"]["p50_s"]
+    assert summary["tokens"] == {"prompt_tokens": 250, "completion_tokens": 25}
+
+
+def test_streamed_turns_report_token_usage(monkeypatch, trace_file):
+    from openai import OpenAI
+    from fake_openai_server import start_fake_server
+
+    server = start_fake_server()
+    try:
+        monkeypatch.setattr(llmchat, "client", OpenAI(base_url=server.base_url, api_key="test"))
+        monkeypatch.setattr(llmchat, "completion_cache", None)
+        with contextlib.redirect_stdout(io.StringIO()):
+            llmchat.run_turn([{"role": "system", "content": "x" * 400}], "hello streaming usage", stream=True)
+    finally:
+        server.shutdown()
+
+    # the fake server counts a token per 4 characters of message content
+    tokens = tracing.tracer.summary()["tokens"]
+    assert tokens["prompt_tokens"] >= 100
+    assert tokens["completion_tokens"] == len("Echo: hello streaming usage") // 4
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = tracing.Tracer()
+    with tracer.span("turn") as span:
+        span.set(ignored=True)
+        assert tracing.current_span() is tracing.NULL_SPAN
+    assert tracer.summary()["spans"] == {}
+
+
+def test_profiler_writes_reports(tmp_path):
+    profiler = tracing.Profiler(str(tmp_path / "profile"))
+    with profiler.section():
+        sorted(str(i) for i in range(10000))
+    prof_path, text_path = profiler.write()
+    report = open(text_path).read()
+    assert "cumulative" in report and "Traced memory" in report
+    assert open(prof_path, "rb").read()
+    tracemalloc.stop()
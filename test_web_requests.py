@@ -0,0 +1,193 @@
+"""
+Test script for Web Requests Tool
+
+Serves a few pages from a local http.server and fetches them through make_http_request.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tools import web_requests
+from tools.http_cache import HttpCache
+
+PAGES = {
+    "/page.html": ("text/html; charset=utf-8",
+                   b"<html><head><title>Demo</title><style>p {color: red}</style></head>"
+                   b"<body><h1>Hello</h1><script>var x = 1;</script><p>World &amp; friends</p></body></html>"),
+    "/data.json": ("application/json", json.dumps({"a": [1, 2, 3], "b": {"c": "d"}}, indent=4).encode()),
+    "/big.txt": ("text/plain", b"x" * (2 * 1024 * 1024)),
+    "/image.png": ("image/png", b"\x89PNG" + b"\x00" * 100),
+}
+
+# Pages with caching headers: path -> extra response headers
+CACHED_PAGES = {
+    "/fresh.txt": {"Cache-Control": "max-age=60"},
+    "/etag.txt": {"Cache-Control": "no-cache", "ETag": '"v1"'},
+    "/lastmod.txt": {"Cache-Control": "max-age=0", "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+    "/nostore.txt": {"Cache-Control": "no-store", "ETag": '"v1"'},
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.clients.add(self.client_address)
+        self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+        if self.path in CACHED_PAGES:
+            self.send_cached(CACHED_PAGES[self.path])
+            return
+        if self.path == "/slow":
+            time.sleep(1)
+            return
+        if self.path not in PAGES:
+            body = b"not here"
+            self.send_response(404)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        content_type, body = PAGES[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def send_cached(self, headers):
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        not_modified = (etag and self.headers.get("If-None-Match") == etag) or \
+            (last_modified and self.headers.get("If-Modified-Since") == last_modified)
+        body = b"" if not_modified else f"body of {self.path}".encode()
+        self.server.not_modified += bool(not_modified)  # counted before the client can see the answer
+        self.send_response(304 if not_modified else 200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if not not_modified:
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(autouse=True)
+def http_cache(tmp_path, monkeypatch):
+    cache = HttpCache(path=str(tmp_path / "http_cache.sqlite3"))
+    monkeypatch.setattr(web_requests, "_cache", cache)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    httpd.clients = set()
+    httpd.hits = {}
+    httpd.not_modified = 0
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", httpd
+    httpd.shutdown()
+
+
+def test_html_is_reduced_to_visible_text(server):
+    base, _ = server
+    result = web_requests.make_http_request(f"{base}/page.html")
+    header, text = result.split("\n", 1)
+    assert header.startswith("HTTP 200 OK | text/html")
+    assert " ms" in header
+    assert text.split("\n") == ["Demo", "Hello", "World & friends"]
+
+
+def test_json_is_compacted_and_binary_is_skipped(server):
+    base, _ = server
+    assert web_requests.make_http_request(f"{base}/data.json").endswith('{"a":[1,2,3],"b":{"c":"d"}}')
+    assert "[image/png content, 104 bytes, not shown]" in web_requests.make_http_request(f"{base}/image.png")
+
+
+def test_large_body_is_cut_off_at_the_byte_cap(server):
+    base, _ = server
+    result = web_requests.fetch(f"{base}/big.txt", max_bytes=64 * 1024)
+    assert len(result["body"]) == 64 * 1024
+    assert result["truncated"] and result["declared_size"] == 2 * 1024 * 1024
+
+    text = web_requests.make_http_request(f"{base}/big.txt")
+    assert "cut off at the 256 KB cap" in text
+    assert len(text) < web_requests.MAX_TEXT_CHARS + 300
+
+
+def test_connections_are_pooled(server):
+    base, httpd = server
+    for _ in range(5):
+        web_requests.make_http_request(f"{base}/data.json")
+    assert len(httpd.clients) == 1
+
+
+def test_errors_and_timeouts_are_reported(server, monkeypatch):
+    base, _ = server
+    assert web_requests.make_http_request(f"{base}/missing").startswith("Error: HTTP 404")
+    monkeypatch.setattr(web_requests, "READ_TIMEOUT", 0.2)
+    started = time.perf_counter()
+    assert web_requests.make_http_request(f"{base}/slow").startswith("Error:")
+    assert time.perf_counter() - started < 0.9
+
+
+def test_fresh_responses_are_served_from_the_cache(server, http_cache):
+    base, httpd = server
+    first = web_requests.make_http_request(f"{base}/fresh.txt")
+    second = web_requests.make_http_request(f"{base}/fresh.txt")
+    assert first.endswith("body of /fresh.txt") and "cache" not in first.split("\n")[0]
+    assert second.endswith("body of /fresh.txt") and second.split("\n")[0].endswith("| cache hit")
+    assert httpd.hits["/fresh.txt"] == 1
+    assert http_cache.stats()["hits"] == 1 and http_cache.stats()["misses"] == 1
+
+
+def test_stale_responses_are_revalidated(server, http_cache):
+    base, httpd = server
+    for path in ("/etag.txt", "/lastmod.txt"):
+        for _ in range(3):
+            result = web_requests.cached_fetch(f"{base}{path}")
+            assert result["body"] == f"body of {path}".encode()
+        assert result["cache"] == "revalidated"
+        assert httpd.hits[path] == 3
+    assert httpd.not_modified == 4
+    assert http_cache.stats()["revalidated"] == 4
+
+
+def test_no_store_is_never_cached(server, http_cache):
+    base, httpd = server
+    for _ in range(2):
+        assert web_requests.cached_fetch(f"{base}/nostore.txt")["cache"] == "miss"
+    assert httpd.hits["/nostore.txt"] == 2
+    assert http_cache.stats()["stored"] == 0
+
+
+def test_cache_persists_on_disk_and_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "lru.sqlite3")
+    cache = HttpCache(path=path, max_bytes=1000, max_entries=2)
+    for name in ("a", "b"):
+        cache.store(name, {"status": 200, "reason": "OK", "headers": {"Cache-Control": "max-age=60"},
+                           "body": b"x" * 100, "truncated": False, "declared_size": 100})
+    cache.lookup("a")
+    cache.store("c", {"status": 200, "reason": "OK", "headers": {"Cache-Control": "max-age=60"},
+                      "body": b"x" * 100, "truncated": False, "declared_size": 100})
+    assert cache.lookup("b") is None and cache.lookup("a") is not None
+    assert cache.stats()["evicted"] == 1
+    cache.close()
+
+    reopened = HttpCache(path=path, max_bytes=250)
+    assert reopened.stats()["entries"] == 2
+    reopened.store("d", {"status": 200, "reason": "OK", "headers": {"Cache-Control": "max-age=60"},
+                         "body": b"x" * 100, "truncated": False, "declared_size": 100})
+    assert reopened.stats()["bytes"] <= 250
+    reopened.close()
@@ -0,0 +1,171 @@
+"""
+Tool Selection
+
+Picks which tool schemas to send with a request. Sending every tool on every request costs prompt
+tokens and prefill time for each tool the model will not use; instead the tools are ranked against
+the user's message with TF-IDF scoring over their names, descriptions and parameter descriptions,
+and only the top few are sent.
+
+- Tools the model called in the last few turns get a bonus, so follow-up questions keep their tools.
+- The selection is made once per user turn and kept for every request in that turn, and the chosen
+  schemas keep their registry order, so the tool list stays byte-stable within a turn.
+- If nothing in the message matches any tool, or the model calls a tool that was not sent, the full
+  tool list is used for the rest of the turn.
+- Each selection reports how many estimated tokens it saved against sending the full list.
+
+The tools come before the conversation in the prompt, so a tool list that changes between messages
+means the model server cannot reuse its cached prefill of the conversation so far. Selection pays
+off with many tools and short conversations; the chat uses it only when --tool-top-k is given.
+"""
+
+import json
+import math
+import re
+from collections import Counter, deque
+
+from context_manager import estimate_tokens
+
+DEFAULT_TOP_K = 6
+NAME_WEIGHT = 3          # a word in the tool name counts this many times
+RECENT_TURNS = 3         # tools used in this many recent turns get RECENT_BONUS
+RECENT_BONUS = 0.15
+ALWAYS_INCLUDE = ("list_available_tools",)
+
+WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can could do does for from get give how i in is it me my of on or "
+    "please show tell than that the this to what when which with you your".split()
+)
+
+
+def tokenize(text):
+    """Lower-cased words without stopwords, with plural and -ing endings stripped."""
+    words = []
+    for word in WORD.findall((text or "").lower()):
+        if word in STOPWORDS:
+            continue
+        if word.endswith("ing") and len(word) > 5:
+            word = word[:-3]
+        elif word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def _schema_words(schema):
+    function = schema["function"]
+    words = tokenize(function["name"].replace("_", " ")) * NAME_WEIGHT
+    words += tokenize(function.get("description", ""))
+    for name, prop in function.get("parameters", {}).get("properties", {}).items():
+        words += tokenize(name.replace("_", " ")) + tokenize(prop.get("description", ""))
+    return words
+
+
+class ToolSelection:
+    """The tools chosen for one turn and what they cost compared to the full list."""
+
+    def __init__(self, schemas, names, tokens_sent, tokens_full, reason):
+        self.schemas = schemas
+        self.names = names
+        self.tokens_sent = tokens_sent
+        self.tokens_full = tokens_full
+        self.reason = reason
+
+    def describe(self):
+        saved = self.tokens_full - self.tokens_sent
+        return f"tools: {len(self.names)} sent ({self.reason}), ~{saved} of ~{self.tokens_full} tool tokens saved"
+
+
+class ToolSelector:
+    """
+    Ranks the tools of a registry against user messages.
+
+    Args:
+        registry: The ToolRegistry whose schemas are ranked.
+        top_k (int): Number of tools to send; 0 or less always sends the full list.
+    """
+
+    def __init__(self, registry, top_k=DEFAULT_TOP_K):
+        self.registry = registry
+        self.top_k = top_k
+        self.recent = deque(maxlen=RECENT_TURNS)
+        self.stats = {"turns": 0, "fallbacks": 0, "tokens_sent": 0, "tokens_full": 0}
+        self._schemas = None
+
+    def _index(self):
+        schemas = self.registry.schemas()
+        if schemas is self._schemas:
+            return
+        self._schemas = schemas
+        self._names = [schema["function"]["name"] for schema in schemas]
+        self._full_tokens = estimate_tokens(self.registry.schemas_json())
+        documents = [Counter(_schema_words(schema)) for schema in schemas]
+        frequency = Counter(word for document in documents for word in document)
+        self._idf = {word: math.log((1 + len(documents)) / (1 + count)) + 1 for word, count in frequency.items()}
+        self._vectors = []
+        for document in documents:
+            vector = {word: count * self._idf[word] for word, count in document.items()}
+            norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+            self._vectors.append({word: weight / norm for word, weight in vector.items()})
+
+    def rank(self, text):
+        """
+        Scores every tool against a message.
+
+        Returns:
+            list: (score, tool name) pairs, best first.
+        """
+        self._index()
+        query = Counter(word for word in tokenize(text) if word in self._idf)
+        weights = {word: count * self._idf[word] for word, count in query.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        used = {name for names in self.recent for name in names}
+        scores = []
+        for position, (name, vector) in enumerate(zip(self._names, self._vectors)):
+            score = sum(weight * vector.get(word, 0.0) for word, weight in weights.items()) / norm
+            if score and name in used:
+                score += RECENT_BONUS
+            elif name in used and weights:
+                score = RECENT_BONUS
+            scores.append((-score, position, name))
+        scores.sort()
+        return [(-score, name) for score, _, name in scores]
+
+    def select(self, text):
+        """
+        Chooses the tools for a turn that starts with `text`.
+
+        Returns:
+            ToolSelection: The schemas to send, in registry order.
+        """
+        self._index()
+        self.stats["turns"] += 1
+        if self.top_k <= 0 or self.top_k >= len(self._names):
+            return self.full("all tools")
+        ranked = [(score, name) for score, name in self.rank(text) if score > 0]
+        if not ranked:
+            return self.full("no match, all tools")
+        chosen = {name for _, name in ranked[:self.top_k]}
+        chosen.update(name for name in ALWAYS_INCLUDE if name in self._names)
+        schemas = [schema for schema, name in zip(self._schemas, self._names) if name in chosen]
+        tokens = estimate_tokens(json.dumps(schemas, separators=(",", ":"), sort_keys=True))
+        return self._record(ToolSelection(schemas, frozenset(chosen), tokens, self._full_tokens, "by relevance"))
+
+    def full(self, reason="all tools"):
+        self._index()
+        return self._record(ToolSelection(self._schemas, frozenset(self._names), self._full_tokens,
+                                          self._full_tokens, reason))
+
+    def fallback(self):
+        """The full tool list, after the model asked for a tool that was not sent."""
+        self.stats["fallbacks"] += 1
+        return self.full("fallback, all tools")
+
+    def _record(self, selection):
+        self.stats["tokens_sent"] += selection.tokens_sent
+        self.stats["tokens_full"] += selection.tokens_full
+        return selection
+
+    def note_used(self, names):
+        """Remembers the tools called during a turn, for the recent-usage bonus."""
+        self.recent.append(frozenset(names))
@@ -0,0 +1,337 @@
+"""
+Accounting Operations Tool
+
+This module answers questions about the SIE balance history in accounting JSON files such as
+examples/sample.json (history.balance_history -> year -> opening/closing balances -> assets,
+liabilities, equity -> account number) without sending the raw document to the model.
+
+The first query against a file flattens its balance history into an index of parallel columns
+(year, account, section, opening balance, closing balance) plus per-account and per-year row
+lists. The columns are NumPy arrays when NumPy is installed and `array.array` otherwise. The index
+lives in the shared document cache, so it is rebuilt only when the file changes, and every tool
+returns a few lines computed from it.
+
+Building the index loads the whole document, so the tools run in a worker process with a memory
+limit (see tools/executor.py); the worker keeps its document cache from one call to the next.
+"""
+
+import math
+from array import array
+from typing import Optional
+
+from tools.document_cache import documents, resolve_path
+from tools.json_operations import load_json
+from tools.registry import tool
+
+try:
+    import numpy as np
+except ImportError:  # optional: the index falls back to array.array columns
+    np = None
+
+SECTIONS = ("assets", "liabilities", "equity")
+SECTION_NAMES = {"assets": "asset", "liabilities": "liability", "equity": "equity"}
+TOLERANCE = 0.01  # amounts closer than this count as equal in balance checks
+
+
+def _amount(value):
+    return float("nan") if value is None else float(value)
+
+
+def _column(typecode, values):
+    if np is not None:
+        return np.array(values, dtype="int64" if typecode == "q" else "float64")
+    return array(typecode, values)
+
+
+def fmt(value):
+    """Formats an amount: whole numbers without decimals, n/a for missing values."""
+    if value is None or math.isnan(value):
+        return "n/a"
+    value = round(value, 2)
+    return str(int(value)) if value == int(value) else f"{value:.2f}"
+
+
+class SieIndex:
+    """
+    Column store of the balance history in one accounting JSON document.
+
+    Args:
+        document (dict): The parsed JSON document.
+    """
+
+    def __init__(self, document):
+        history = document.get("history", {})
+        self.company = history.get("company_name") or document.get("company_info", {}).get("name", "")
+        self.currency = history.get("currency") or document.get("currency", "")
+        self.names = {}
+        self.sections = {}
+        self.totals = {}
+        rows = {}
+        for label, entry in history.get("balance_history", {}).items():
+            try:
+                year = int(entry.get("year_label", label))
+            except (TypeError, ValueError):
+                continue
+            closing = entry.get("closing_balances") or {}
+            opening = entry.get("opening_balances") or {}
+            self.totals[year] = {
+                "closing": {section: closing.get(f"total_{section}") for section in SECTIONS},
+                "opening": {section: opening.get(f"total_{section}") for section in SECTIONS},
+            }
+            # Each year lists its accounts under both opening and closing balances; the closing
+            # list wins where both have a record, and accounts only present in one are kept too.
+            for balances in (opening, closing):
+                for section in SECTIONS:
+                    for number, record in (balances.get(section) or {}).items():
+                        account = int(record.get("account_number", number))
+                        self.names[account] = record.get("account_name", "")
+                        self.sections[account] = section
+                        rows[(year, account)] = (
+                            SECTIONS.index(section),
+                            _amount(record.get("opening_balance")),
+                            _amount(record.get("closing_balance")),
+                        )
+
+        keys = sorted(rows)
+        self.year = _column("q", [year for year, _ in keys])
+        self.account = _column("q", [account for _, account in keys])
+        self.section = _column("q", [rows[key][0] for key in keys])
+        self.opening = _column("d", [rows[key][1] for key in keys])
+        self.closing = _column("d", [rows[key][2] for key in keys])
+        self.years = sorted(self.totals)
+        self.by_account = {}
+        self.by_year = {}
+        for row, (year, account) in enumerate(keys):
+            self.by_account.setdefault(account, []).append(row)
+            self.by_year.setdefault(year, []).append(row)
+        self._positions = {key: row for row, key in enumerate(keys)}
+
+    def __len__(self):
+        return len(self.year)
+
+    def __sizeof__(self):
+        columns = (self.year, self.account, self.section, self.opening, self.closing)
+        return object.__sizeof__(self) + sum(
+            column.nbytes if np is not None else column.itemsize * len(column) for column in columns
+        ) + 200 * (len(self.names) + len(self._positions))
+
+    def row(self, year, account):
+        return self._positions.get((year, account))
+
+    def closing_for(self, year, account):
+        row = self.row(year, account)
+        return float(self.closing[row]) if row is not None else float("nan")
+
+    def opening_for(self, year, account):
+        """Opening balance of an account, falling back to the previous year's closing balance."""
+        row = self.row(year, account)
+        value = float(self.opening[row]) if row is not None else float("nan")
+        if math.isnan(value):
+            value = self.closing_for(year - 1, account)
+        return value
+
+    def label(self, account):
+        return f"{account} {self.names.get(account, '')} ({SECTION_NAMES[self.sections[account]]})"
+
+    def movements(self, year):
+        """(account, opening, closing, change) for every account in a year."""
+        rows = self.by_year.get(year, [])
+        if np is not None and rows:
+            index = np.array(rows)
+            opening = self.opening[index].copy()
+            missing = np.isnan(opening)
+            for position in np.flatnonzero(missing):
+                opening[position] = self.closing_for(year - 1, int(self.account[rows[position]]))
+            closing = self.closing[index]
+            return list(zip(self.account[index].tolist(), opening.tolist(), closing.tolist(),
+                            (closing - opening).tolist()))
+        result = []
+        for row in rows:
+            account = self.account[row]
+            opening = self.opening_for(year, account)
+            result.append((account, opening, self.closing[row], self.closing[row] - opening))
+        return result
+
+
+def _build_index(path):
+    return SieIndex(load_json(path))
+
+
+def load_index(path):
+    """Returns the index for an accounting JSON file, building it on first use or after the file changed."""
+    return documents.get(path, "sie-index", _build_index)
+
+
+def _open(path):
+    path, error = resolve_path(path)
+    if error:
+        return None, error
+    try:
+        index = load_index(path)
+    except Exception as e:
+        return None, f"Error reading accounting data from '{path}': {str(e)}"
+    if not len(index):
+        return None, f"Error: '{path}' has no history.balance_history accounts."
+    return index, None
+
+
+def _account(index, account):
+    try:
+        number = int(str(account).strip())
+    except ValueError:
+        return None, f"Error: '{account}' is not an account number."
+    if number not in index.names:
+        return None, f"Error: Account {number} does not appear in the balance history."
+    return number, None
+
+
+def _year(index, year):
+    try:
+        return int(str(year).strip()), None
+    except ValueError:
+        return None, f"Error: '{year}' is not a year. Years available: {index.years[0]}-{index.years[-1]}."
+
+
+@tool(remember_path="json", cache="file", isolation="process", memory_mb=1024, timeout=60)
+def get_account_history(account: str, path: Optional[str] = None) -> str:
+    """
+    Get the opening and closing balance of one account for every year in an accounting JSON file (SIE export).
+
+    Args:
+        account (str): Account number, e.g. '1930'.
+        path (str): Path to the accounting JSON file, relative to project directory.
+            Defaults to the last JSON file that was read.
+    """
+    index, error = _open(path)
+    if error:
+        return error
+    number, error = _account(index, account)
+    if error:
+        return error
+    lines = [f"Account {index.label(number)}, {index.currency}. year: opening -> closing (change)"]
+    for row in index.by_account[number]:
+        year = int(index.year[row])
+        opening, closing = index.opening_for(year, number), float(index.closing[row])
+        lines.append(f"{year}: {fmt(opening)} -> {fmt(closing)} ({fmt(closing - opening)})")
+    return "\n".join(lines)
+
+
+@tool(remember_path="json", cache="file", isolation="process", memory_mb=1024, timeout=60)
+def get_year_over_year_changes(account: Optional[str] = None, path: Optional[str] = None) -> str:
+    """
+    Get the year-over-year change in closing balance of one account, or of total assets,
+    liabilities and equity when no account is given.
+
+    Args:
+        account (str): Account number, e.g. '1930'. Leave out for the balance sheet totals.
+        path (str): Path to the accounting JSON file, relative to project directory.
+            Defaults to the last JSON file that was read.
+    """
+    index, error = _open(path)
+    if error:
+        return error
+    if account:
+        number, error = _account(index, account)
+        if error:
+            return error
+        series = [(year, {"closing": index.closing_for(year, number)}) for year in index.years]
+        subject = f"Account {index.label(number)}"
+    else:
+        series = [(year, {f"total {section}": _amount(index.totals[year]["closing"][section]) for section in SECTIONS})
+                  for year in index.years]
+        subject = "Balance sheet totals"
+    lines = [f"{subject}: closing balances in {index.currency}, change against the previous year"]
+    previous = None
+    for year, values in series:
+        parts = []
+        for name, value in values.items():
+            part = f"{name} {fmt(value)}"
+            before = previous.get(name) if previous else None
+            if before is not None and not math.isnan(before) and not math.isnan(value):
+                change = value - before
+                percent = f", {change / abs(before) * 100:+.1f}%" if before else ""
+                part += f" ({fmt(change)}{percent})"
+            parts.append(part)
+        lines.append(f"{year}: " + "; ".join(parts))
+        previous = values
+    return "\n".join(lines)
+
+
+@tool(remember_path="json", cache="file", isolation="process", memory_mb=1024, timeout=60)
+def get_top_movers(year: int, limit: int = 5, path: Optional[str] = None) -> str:
+    """
+    Get the accounts whose balance changed the most during a year (closing minus opening balance).
+
+    Args:
+        year (int): The fiscal year, e.g. 2015.
+        limit (int): How many accounts to return (default 5).
+        path (str): Path to the accounting JSON file, relative to project directory.
+            Defaults to the last JSON file that was read.
+    """
+    index, error = _open(path)
+    if error:
+        return error
+    year, error = _year(index, year)
+    if error:
+        return error
+    if year not in index.by_year:
+        return f"Error: No balances for {year}. Years available: {index.years[0]}-{index.years[-1]}."
+    movements = [movement for movement in index.movements(year) if not math.isnan(movement[3])]
+    movements.sort(key=lambda movement: (-abs(movement[3]), movement[0]))
+    lines = [f"Largest balance changes in {year} ({index.currency}):"]
+    for rank, (account, opening, closing, change) in enumerate(movements[:max(1, int(limit))], start=1):
+        lines.append(f"{rank}. {index.label(account)}: {fmt(opening)} -> {fmt(closing)} ({fmt(change)})")
+    return "\n".join(lines)
+
+
+@tool(remember_path="json", cache="file", isolation="process", memory_mb=1024, timeout=60)
+def check_balances(year: Optional[int] = None, path: Optional[str] = None) -> str:
+    """
+    Check that the balance sheet adds up: account balances match the section totals,
+    assets, liabilities and equity sum to zero (liabilities and equity are stored as negative balances),
+    and each opening balance equals the previous year's closing balance.
+
+    Args:
+        year (int): Check only this year. Leave out to check every year.
+        path (str): Path to the accounting JSON file, relative to project directory.
+            Defaults to the last JSON file that was read.
+    """
+    index, error = _open(path)
+    if error:
+        return error
+    if year is not None:
+        year, error = _year(index, year)
+        if error:
+            return error
+    years = index.years if year is None else [year]
+    lines = []
+    for current in years:
+        if current not in index.totals:
+            return f"Error: No balances for {current}. Years available: {index.years[0]}-{index.years[-1]}."
+        problems = []
+        totals = index.totals[current]["closing"]
+        sums = dict.fromkeys(SECTIONS, 0.0)
+        for row in index.by_year.get(current, []):
+            value = float(index.closing[row])
+            if not math.isnan(value):
+                sums[SECTIONS[int(index.section[row])]] += value
+        for section in SECTIONS:
+            reported = totals[section]
+            if reported is not None and abs(sums[section] - reported) > TOLERANCE:
+                problems.append(f"{section} accounts sum to {fmt(sums[section])}, total says {fmt(reported)}")
+        if all(totals[section] is not None for section in SECTIONS):
+            difference = sum(totals[section] for section in SECTIONS)
+            if abs(difference) > TOLERANCE:
+                problems.append(f"assets + liabilities + equity = {fmt(difference)}, expected 0")
+        breaks = []
+        if current - 1 in index.by_year:
+            for row in index.by_year[current]:
+                account = int(index.account[row])
+                opening = float(index.opening[row])
+                before = index.closing_for(current - 1, account)
+                if not math.isnan(opening) and not math.isnan(before) and abs(opening - before) > TOLERANCE:
+                    breaks.append(f"{account} ({fmt(before)} -> {fmt(opening)})")
+        if breaks:
+            problems.append(f"opening differs from {current - 1} closing for " + ", ".join(breaks))
+        lines.append(f"{current}: " + ("OK" if not problems else "; ".join(problems)))
+    return "\n".join(lines)
@@ -1,28 +1,73 @@
 import sqlite3
 from datetime import datetime
 
+from tools.db_connection import get_connection
+from tools.formatting import table
+from tools.registry import tool
+
+# Queries are module constants so every call hits the connection's prepared-statement cache
+# The month filter is a half-open range on the raw date_sold column, so it can use idx_sales_date_price
+# (see create_sales_database.py) instead of evaluating strftime() on every row.
+SALES_BY_MONTH_QUERY = """
+SELECT COUNT(*) as item_count, SUM(price) as total_sales
+FROM sales
+WHERE date_sold >= ? AND date_sold < ?
+"""
+SOLD_PRODUCTS_QUERY = """
+SELECT product_name, COUNT(*) as quantity_sold, SUM(price) as total_revenue
+FROM sales
+GROUP BY product_name
+ORDER BY quantity_sold DESC, product_name
+"""
+# Rollup tables maintained by triggers (see create_sales_database.py). Reading them costs one row per
+# month or product instead of a pass over the sales history; the queries above are the fallback for
+# databases created before the rollups existed.
+MONTH_ROLLUP_QUERY = "SELECT item_count, total_revenue FROM monthly_sales_summary WHERE month = ?"
+PRODUCT_ROLLUP_QUERY = """
+SELECT product_name, quantity_sold, total_revenue
+FROM product_sales_summary
+ORDER BY quantity_sold DESC, product_name
+"""
+# Walks idx_sales_price from the top and stops after LIMIT rows instead of sorting the whole table
+TOP_EXPENSIVE_QUERY = """
+SELECT product_name, price, date_sold
+FROM sales
+ORDER BY price DESC
+LIMIT ?
+"""
+
+def query_rollup(conn, rollup_query, rollup_params, fallback_query, fallback_params):
+    """Run a query against a rollup table, or the equivalent query on the sales table if the rollups are missing."""
+    try:
+        return conn.execute(rollup_query, rollup_params).fetchall()
+    except sqlite3.OperationalError as e:
+        if "no such table" not in str(e):
+            raise
+        return conn.execute(fallback_query, fallback_params).fetchall()
+
+def month_range(month: str):
+    """Turn 'YYYY-MM' into the half-open date range ['YYYY-MM-01', first day of the next month)."""
+    start = datetime.strptime(month, "%Y-%m")
+    year, next_month = (start.year + 1, 1) if start.month == 12 else (start.year, start.month + 1)
+    return start.strftime("%Y-%m-%d"), f"{year:04d}-{next_month:02d}-01"
+
+@tool(cache="sqlite", timeout=10)
 def get_sales_by_month(month: str) -> str:
-    """Retrieve total sales for a specified month from the product sales database.
-    Month should be in 'YYYY-MM' format (e.g., '2025-01')."""
+    """Get total sales for a specific month from the product sales database.
+    Month should be in 'YYYY-MM' format (e.g., '2025-01').
+
+    Args:
+        month (str): The month in YYYY-MM format
+    """
     try:
-        conn = sqlite3.connect('/Users/mafr/Code/lmstudio/product_sales.db')
-        cursor = conn.cursor()
-        
-        # Query to sum the prices for the specified month
-        query = """
-        SELECT SUM(price) as total_sales
-        FROM sales
-        WHERE strftime('%Y-%m', date_sold) = ?
-        """
-        cursor.execute(query, (month,))
-        result = cursor.fetchone()
-        total_sales = result[0] if result[0] is not None else 0.0
-        
-        # Also get the number of items sold in that month
-        cursor.execute("SELECT COUNT(*) FROM sales WHERE strftime('%Y-%m', date_sold) = ?", (month,))
-        item_count = cursor.fetchone()[0]
-        
-        conn.close()
+        start, end = month_range(month)
+    except (TypeError, ValueError):  # TypeError: the model sent a number such as 202501
+        return f"Error: '{month}' is not a month in YYYY-MM format."
+    try:
+        # One primary-key lookup in the monthly rollup (or one pass over the month's index range)
+        rows = query_rollup(get_connection(), MONTH_ROLLUP_QUERY, (start[:7],), SALES_BY_MONTH_QUERY, (start, end))
+        item_count, total_sales = rows[0] if rows else (0, None)
+        total_sales = total_sales if total_sales is not None else 0.0
         
         if item_count > 0:
             return f"In {month}, there were {item_count} items sold, generating a total revenue of ${total_sales:.2f}."
@@ -31,58 +76,38 @@ def get_sales_by_month(month: str) -> str:
     except Exception as e:
         return f"Error accessing sales data: {str(e)}"
 
+@tool(cache="sqlite", timeout=10)
 def list_all_sold_products() -> str:
-    """Retrieve a list of all unique products sold along with the total quantity sold for each."""
+    """Retrieve a list of all unique products sold along with the total quantity sold for each.
+    Returned as a table with one row per product; very long lists end with a count of the rows left out."""
     try:
-        conn = sqlite3.connect('/Users/mafr/Code/lmstudio/product_sales.db')
-        cursor = conn.cursor()
-        
-        # Query to get unique products and their count
-        query = """
-        SELECT product_name, COUNT(*) as quantity_sold, SUM(price) as total_revenue
-        FROM sales
-        GROUP BY product_name
-        ORDER BY quantity_sold DESC
-        """
-        cursor.execute(query)
-        results = cursor.fetchall()
-        
-        conn.close()
+        # Products with their count and revenue, read from the per-product rollup
+        results = query_rollup(get_connection(), PRODUCT_ROLLUP_QUERY, (), SOLD_PRODUCTS_QUERY, ())
         
         if results:
-            response = "Here are the products sold along with the quantity sold and total revenue:\n"
-            for product, qty, revenue in results:
-                response += f"- {product}: {qty} units sold, total revenue ${revenue:.2f}\n"
-            return response
+            return table(("product", "units_sold", "revenue"), results,
+                         title="Products sold, most units first (revenue in $):")
         else:
             return "No products found in the sales database."
     except Exception as e:
         return f"Error accessing sales data: {str(e)}"
 
+@tool(cache="sqlite", timeout=10)
 def get_top_expensive_products(limit: int = 5) -> str:
     """Retrieve the top N most expensive products sold based on individual sale price.
-    Default limit is 5 if not specified."""
+    Default limit is 5 if not specified.
+
+    Args:
+        limit (int): Number of top products to return, default is 5
+    """
     try:
-        conn = sqlite3.connect('/Users/mafr/Code/lmstudio/product_sales.db')
-        cursor = conn.cursor()
-        
         # Query to get the top N most expensive individual sales
-        query = """
-        SELECT product_name, price, date_sold
-        FROM sales
-        ORDER BY price DESC
-        LIMIT ?
-        """
-        cursor.execute(query, (limit,))
-        results = cursor.fetchall()
-        
-        conn.close()
+        results = get_connection().execute(TOP_EXPENSIVE_QUERY, (limit,)).fetchall()
         
         if results:
-            response = f"Here are the top {limit} most expensive individual product sales:\n"
-            for i, (product, price, date) in enumerate(results, 1):
-                response += f"{i}. {product} sold for ${price:.2f} on {date}\n"
-            return response
+            return table(("rank", "product", "price", "date_sold"),
+                         [(rank, *row) for rank, row in enumerate(results, 1)],
+                         title=f"Top {limit} most expensive individual sales (price in $):")
         else:
             return "No sales data found in the database."
     except Exception as e:
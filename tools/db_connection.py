@@ -0,0 +1,181 @@
+"""
+SQLite Connection Manager
+
+This module gives the database tools a shared, reusable connection to the sales database instead
+of opening and closing one on every tool call.
+
+- The database path comes from the SALES_DB_PATH environment variable, or product_sales.db in the
+  project directory, and can be changed at runtime with configure().
+- Each thread gets its own connection (sqlite3 connections must not be shared between threads
+  that run queries at the same time), so the concurrent tool executor can query without locking.
+- Connections are opened read-only through a file: URI by default, with pragmas tuned for a
+  read-mostly workload (large page cache, memory-mapped I/O, in-memory temp storage).
+- Read-write connections switch the database to WAL so readers never block on a writer.
+- Each connection keeps a cache of prepared statements; the tools use constant SQL strings so
+  repeated calls reuse the compiled statement.
+- interrupt() aborts the query running on a given thread, for the tool executor's timeouts
+  (see tools/executor.py).
+- data_version() tells callers whether the database changed since they last looked, for caches
+  of query results (see tools/memoize.py).
+"""
+
+import os
+import sqlite3
+import threading
+from urllib.parse import quote
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB_PATH = os.environ.get("SALES_DB_PATH", os.path.join(PROJECT_DIR, "product_sales.db"))
+
+# Pragmas applied to every new connection
+CACHE_SIZE_KIB = 64 * 1024           # page cache size (negative cache_size means KiB)
+MMAP_SIZE_BYTES = 256 * 1024 * 1024  # map up to 256 MB of the database file into memory
+BUSY_TIMEOUT_MS = 5000               # wait this long for a lock instead of failing immediately
+STATEMENT_CACHE_SIZE = 128           # prepared statements kept per connection
+
+_settings = {"path": DEFAULT_DB_PATH, "read_only": True}
+_generation = 0
+_local = threading.local()
+_connections = []
+_by_thread = {}
+_lock = threading.Lock()
+_version_state = {"conn": None, "key": None}
+_version_lock = threading.Lock()
+
+
+def configure(path=None, read_only=True):
+    """
+    Points the database tools at a different database file and/or access mode.
+    Connections opened under the previous settings are closed.
+
+    Args:
+        path (str): Path to the SQLite database file. Relative paths are resolved against the project directory.
+        read_only (bool): Open connections in read-only mode (the default for tool calls).
+    """
+    if path is not None and not os.path.isabs(path):
+        path = os.path.join(PROJECT_DIR, path)
+    with _lock:
+        _settings["path"] = path or _settings["path"]
+        _settings["read_only"] = read_only
+    close_all()
+
+
+def get_db_path():
+    return _settings["path"]
+
+
+def _open(path, read_only):
+    mode = "ro" if read_only else "rwc"
+    uri = f"file:{quote(os.path.abspath(path))}?mode={mode}"
+    conn = sqlite3.connect(
+        uri,
+        uri=True,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE
+    )
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE_BYTES}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if read_only:
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def get_connection():
+    """
+    Returns this thread's connection to the sales database, opening it on first use.
+
+    Returns:
+        sqlite3.Connection: A connection configured with the current settings.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.generation == _generation:
+        return conn
+    if conn is not None:
+        _discard(conn)
+    with _lock:
+        path, read_only, generation = _settings["path"], _settings["read_only"], _generation
+    conn = _open(path, read_only)
+    with _lock:
+        _connections.append(conn)
+        _by_thread[threading.get_ident()] = conn
+    _local.conn = conn
+    _local.generation = generation
+    return conn
+
+
+def _discard(conn):
+    with _lock:
+        if conn in _connections:
+            _connections.remove(conn)
+        if _by_thread.get(threading.get_ident()) is conn:
+            del _by_thread[threading.get_ident()]
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+    _local.conn = None
+
+
+def close_all():
+    """Closes every connection opened by this module. Threads reconnect on their next query."""
+    global _generation
+    with _lock:
+        _generation += 1
+        connections = list(_connections)
+        _connections.clear()
+        _by_thread.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.ProgrammingError:
+            pass  # still in use on another thread; it is dropped when that thread reconnects
+
+
+def interrupt(thread_id):
+    """
+    Aborts the statement running on a thread's connection, if any; the query there fails with
+    sqlite3.OperationalError('interrupted'). Safe to call from any thread.
+
+    Args:
+        thread_id (int): threading.get_ident() of the thread running the query.
+
+    Returns:
+        bool: Whether the thread had a connection to interrupt.
+    """
+    with _lock:
+        conn = _by_thread.get(thread_id)
+    if conn is None:
+        return False
+    try:
+        conn.interrupt()
+    except sqlite3.ProgrammingError:
+        return False  # closed in the meantime
+    return True
+
+
+def data_version():
+    """
+    Returns a token that changes whenever the database is modified or replaced.
+
+    SQLite's `PRAGMA data_version` changes when another connection commits, but only as seen from one
+    connection that stays open, so a dedicated read-only connection is kept for it. The file's inode is
+    part of the token, so a database that is deleted and recreated counts as changed as well.
+
+    Returns:
+        tuple: (database path, inode, data_version).
+    """
+    with _version_lock:
+        path = _settings["path"]
+        inode = os.stat(path).st_ino
+        conn = _version_state["conn"]
+        if conn is None or _version_state["key"] != (path, inode):
+            if conn is not None:
+                conn.close()
+            conn = _version_state["conn"] = _open(path, read_only=True)
+            _version_state["key"] = (path, inode)
+        return path, inode, conn.execute("PRAGMA data_version").fetchone()[0]
@@ -0,0 +1,124 @@
+"""
+Document Cache
+
+A process-wide cache of loaded documents shared by the file and JSON tools, so asking about the
+same file several times in a conversation parses it once.
+
+- Entries are keyed on the absolute path and the kind of load (raw bytes, parsed JSON, ...).
+- Every lookup stats the file; an entry is only used while the file's mtime, size and inode are
+  unchanged, so edits on disk are picked up on the next call.
+- The cache is bounded by an estimate of the memory its values use (DOCUMENT_CACHE_MB, 0 disables
+  it); the least recently used documents are evicted first.
+
+resolve_path() is the path check every tool that reads a file runs before loading it.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+MAX_CACHE_BYTES = int(float(os.environ.get("DOCUMENT_CACHE_MB", "128")) * 1024 * 1024)
+
+
+def estimate_size(value):
+    """Approximate memory used by a loaded document (strings, bytes and nested JSON containers)."""
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return size
+
+
+class DocumentCache:
+    """
+    LRU cache of loaded files, invalidated by file changes.
+
+    Args:
+        max_bytes (int): Memory budget for cached values; 0 disables caching.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "misses": 0, "evicted": 0}
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path, kind, loader):
+        """
+        Returns the document at `path` as produced by `loader(path)`, loading it only if the file
+        changed since it was cached.
+
+        Args:
+            path (str): Absolute path of the file.
+            kind (str): Name of the representation, so one file can be cached as text and as JSON.
+            loader (callable): Reads the file and returns the value to cache.
+
+        Returns:
+            The cached value. It is shared between callers and must not be modified.
+        """
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        key = (kind, path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[1]
+            self.counters["misses"] += 1
+        value = loader(path)
+        if self.max_bytes <= 0:
+            return value
+        cost = estimate_size(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            if cost <= self.max_bytes:
+                self._entries[key] = (version, value, cost)
+                self._bytes += cost
+                while self._bytes > self.max_bytes:
+                    _, (_, _, evicted_cost) = self._entries.popitem(last=False)
+                    self._bytes -= evicted_cost
+                    self.counters["evicted"] += 1
+        return value
+
+    def invalidate(self, path=None):
+        """Drops the entries for one file, or everything."""
+        with self._lock:
+            for key in [key for key in self._entries if path is None or key[1] == path]:
+                self._bytes -= self._entries.pop(key)[2]
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), bytes=self._bytes)
+
+
+documents = DocumentCache()
+
+
+def resolve_path(path):
+    """
+    Resolves a path against the working directory and checks that it names a file.
+
+    Returns:
+        tuple: (absolute path, None) or (path, error message).
+    """
+    if not path:
+        return path, "Error: No file path was given."
+    # Ensure the path is relative to the current working directory
+    if not os.path.isabs(path):
+        path = os.path.join(os.getcwd(), path)
+    if not os.path.exists(path):
+        return path, f"Error: File '{path}' does not exist."
+    if not os.path.isfile(path):
+        return path, f"Error: '{path}' is not a file."
+    return path, None
@@ -0,0 +1,377 @@
+"""
+Tool Executor
+
+Runs tool calls away from the chat loop, so a hung request, a runaway query or a huge file cannot
+freeze the agent. Each tool picks how it runs with @tool options (plain literals, see tools/registry.py):
+
+    isolation="inline"      in the calling thread, no limits (trivial tools such as multiply_numbers)
+    isolation="thread"      on a shared thread pool (the default)
+    isolation="process"     in a separate worker process with a memory limit
+    timeout=10              wall-clock seconds before the call is given up (default TOOL_TIMEOUT, 30)
+    memory_mb=512           address-space limit of the worker process (process isolation only)
+
+A call that runs past its timeout, or is cancelled with cancel(), returns at once with a structured
+error for the model instead of blocking:
+
+    Error: {"error":"timeout","tool":"get_sales_by_month","limit_s":10,"elapsed_s":10.0,"message":"..."}
+
+What happens to the work itself depends on the isolation. A thread cannot be killed, so the executor
+stops waiting for it and interrupts its SQLite query if it has one (see tools/db_connection.py); the
+thread finishes on its own and its result is dropped. Until then the thread is counted as lost, and once
+half of the pool's threads are lost to tools that hang, later calls go to a fresh pool, so hung tools
+cannot leave every other call waiting in the queue. A process worker is killed. A worker that runs out
+of memory or dies reports "memory_limit" or "worker_crashed".
+
+Threads and worker processes are reused across calls, so the cost of isolation is a queue hand-off
+(thread) or one pipe round trip (process) per call. Worker processes start on first use and keep their
+own copies of the caches the tools use (documents, connections) from one call to the next.
+"""
+
+import importlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import wait
+
+from tools.registry import registry
+
+ISOLATIONS = ("inline", "thread", "process")
+DEFAULT_ISOLATION = "thread"
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", "30"))
+DEFAULT_MEMORY_MB = 1024
+THREAD_WORKERS = 16
+IDLE_PROCESSES = 4        # idle worker processes kept per memory limit
+POLL_INTERVAL = 0.1       # how often a process call checks for cancellation
+
+
+class ToolFailed(Exception):
+    """A tool raised an exception inside a worker process."""
+
+
+def _set_memory_limit(memory_mb):
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return
+    limit = int(memory_mb) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _worker_main(conn, memory_mb):
+    """Loop of a worker process: receive (module, tool, arguments), send back the outcome."""
+    # Workers share the terminal's process group, so Ctrl-C in the chat reaches them too. The parent
+    # decides what to cancel and kills the workers it needs to; an idle worker keeps its caches.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if memory_mb:
+        _set_memory_limit(memory_mb)
+    while True:
+        try:
+            module_name, name, arguments = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            result = getattr(importlib.import_module(module_name), name)(**arguments)
+            outcome = ("ok", result)
+        except MemoryError:
+            outcome = ("memory_limit", None)
+        except Exception as e:
+            outcome = ("raise", f"{type(e).__name__}: {e}")
+        try:
+            conn.send(outcome)
+        except MemoryError:
+            conn.send(("memory_limit", None))
+
+
+class _Worker:
+    """One worker process and the pipe to it."""
+
+    def __init__(self, context, memory_mb):
+        self.memory_mb = memory_mb
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child, memory_mb), daemon=True,
+                                       name=f"tool-worker-{memory_mb}mb")
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+class _Call:
+    """One tool call in progress. The first of result, timeout and cancel to finish it wins."""
+
+    def __init__(self, spec, timeout):
+        self.spec = spec
+        self.timeout = timeout
+        self.started = time.perf_counter()
+        self.finished = threading.Event()
+        self.outcome = None
+        self.thread_id = None
+        self.pool = None           # the thread pool running it (thread isolation)
+        self.returned = False      # its thread is done with the tool
+        self.abandoned = False     # stopped while its thread was still in the tool
+        self._lock = threading.Lock()
+
+    def finish(self, outcome):
+        with self._lock:
+            if self.finished.is_set():
+                return False
+            self.outcome = outcome
+            self.finished.set()
+            return True
+
+
+def limit_result(spec, reason, limit=None, elapsed=None):
+    """The structured error returned to the model when a call is stopped."""
+    messages = {
+        "timeout": "The tool took too long and was stopped. Try narrower arguments or a different tool.",
+        "cancelled": "The tool call was cancelled.",
+        "memory_limit": "The tool ran out of memory and was stopped. Try a smaller request.",
+        "worker_crashed": "The tool's worker process stopped unexpectedly.",
+    }
+    record = {"error": reason, "tool": spec.name}
+    if limit is not None:
+        record["limit_s" if reason == "timeout" else "limit_mb"] = limit
+    if elapsed is not None:
+        record["elapsed_s"] = round(elapsed, 2)
+    record["message"] = messages[reason]
+    return "Error: " + json.dumps(record, separators=(",", ":"))
+
+
+class ToolExecutor:
+    """
+    Runs tool calls with the isolation, timeout and memory limit their options ask for.
+
+    Args:
+        thread_workers (int): Size of the shared thread pool.
+        idle_processes (int): Idle worker processes kept per memory limit for reuse.
+    """
+
+    def __init__(self, thread_workers=THREAD_WORKERS, idle_processes=IDLE_PROCESSES):
+        self.thread_workers = thread_workers
+        self.idle_processes = idle_processes
+        self._threads = None
+        self._lost_threads = 0     # threads of the current pool still busy with stopped calls
+        self._idle = {}
+        self._active = set()
+        self._lock = threading.Lock()
+        self._context = None
+        self._counts = {"calls": 0, "timeouts": 0, "cancelled": 0, "memory_limit": 0, "worker_crashed": 0,
+                        "processes_started": 0, "thread_pools_replaced": 0}
+
+    def limits(self, spec):
+        """(isolation, timeout, memory_mb) for a tool, from its options and the defaults."""
+        options = spec.options
+        isolation = options.get("isolation", DEFAULT_ISOLATION)
+        if isolation not in ISOLATIONS:
+            raise ValueError(f"Tool '{spec.name}' has unknown isolation '{isolation}'")
+        timeout = options.get("timeout", TOOL_TIMEOUT)
+        return isolation, (timeout if timeout and timeout > 0 else None), options.get("memory_mb", DEFAULT_MEMORY_MB)
+
+    def run(self, spec, arguments, isolation=None):
+        """
+        Calls a tool and returns the text that goes back to the model.
+
+        Args:
+            spec (ToolSpec): The tool.
+            arguments (dict): Decoded JSON arguments; keys that are not parameters of the tool are ignored.
+            isolation (str): Overrides the tool's own isolation option.
+
+        Returns:
+            str: The formatted result, or a structured error if the call timed out, was cancelled or
+            hit its memory limit.
+
+        Raises:
+            Exception: Whatever the tool raised (ToolFailed for tools running in a worker process).
+        """
+        tool_isolation, timeout, memory_mb = self.limits(spec)
+        isolation = isolation or tool_isolation
+        kwargs = {key: value for key, value in arguments.items() if key in spec.params}
+        with self._lock:
+            self._counts["calls"] += 1
+        if isolation == "inline":
+            return registry.format_result(spec, arguments, (spec.func or registry.load(spec.name))(**kwargs))
+
+        call = _Call(spec, timeout)
+        with self._lock:
+            self._active.add(call)
+        try:
+            if isolation == "process":
+                self._run_in_process(call, kwargs, memory_mb)
+            else:
+                self._run_in_thread(call, kwargs)
+        except BaseException:
+            # Ctrl-C (or anything else) while waiting: the caller is gone, so stop the work now;
+            # once the call has left _active a later cancel() would not find it
+            if call.finish(("cancelled", None)):
+                with self._lock:
+                    self._counts["cancelled"] += 1
+                self._stop_thread(call)
+            raise
+        finally:
+            with self._lock:
+                self._active.discard(call)
+        kind, value = call.outcome
+        if kind == "ok":
+            return registry.format_result(spec, arguments, value)
+        if kind == "raise":
+            raise value
+        with self._lock:
+            self._counts["timeouts" if kind == "timeout" else kind] += 1
+        limit = {"timeout": timeout, "memory_limit": memory_mb}.get(kind)
+        return limit_result(spec, kind, limit, time.perf_counter() - call.started)
+
+    # Threads
+
+    def _thread_pool(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="tool-exec")
+            return self._threads
+
+    def _run_in_thread(self, call, kwargs):
+        function = call.spec.func or registry.load(call.spec.name)
+
+        def task():
+            call.thread_id = threading.get_ident()
+            try:
+                if call.finished.is_set():  # cancelled while queued
+                    return
+                call.finish(("ok", function(**kwargs)))
+            except Exception as e:
+                call.finish(("raise", e))
+            finally:
+                with self._lock:
+                    call.returned = True
+                    if call.abandoned and call.pool is self._threads:
+                        self._lost_threads -= 1
+
+        call.pool = self._thread_pool()
+        call.pool.submit(task)
+        if not call.finished.wait(call.timeout) and call.finish(("timeout", None)):
+            self._stop_thread(call)
+
+    def _stop_thread(self, call):
+        if call.thread_id is None:  # a process call, or still queued: it returns as soon as it starts
+            return
+        # The thread keeps running; interrupt its SQLite query so it gives the worker back soon
+        db_connection = sys.modules.get("tools.db_connection")
+        if db_connection is not None:
+            db_connection.interrupt(call.thread_id)
+        # Anything else that hangs keeps its thread. Count it as lost, and once half of the pool is
+        # lost, send new calls to a fresh pool; the old one still runs what was queued on it
+        with self._lock:
+            if call.returned or call.abandoned or call.pool is not self._threads:
+                return
+            call.abandoned = True
+            self._lost_threads += 1
+            if self._lost_threads < max(1, self.thread_workers // 2):
+                return
+            stale, self._threads, self._lost_threads = self._threads, None, 0
+            self._counts["thread_pools_replaced"] += 1
+        stale.shutdown(wait=False)
+
+    # Processes
+
+    def _get_worker(self, memory_mb):
+        with self._lock:
+            idle = self._idle.get(memory_mb)
+            while idle:
+                worker = idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.kill()
+            if self._context is None:
+                methods = multiprocessing.get_all_start_methods()
+                self._context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            self._counts["processes_started"] += 1
+        return _Worker(self._context, memory_mb)
+
+    def _put_worker(self, worker):
+        with self._lock:
+            idle = self._idle.setdefault(worker.memory_mb, [])
+            if len(idle) < self.idle_processes:
+                idle.append(worker)
+                return
+        worker.kill()
+
+    def _run_in_process(self, call, kwargs, memory_mb):
+        worker = self._get_worker(memory_mb)
+        deadline = None if call.timeout is None else call.started + call.timeout
+        try:
+            worker.conn.send((call.spec.module, call.spec.name, kwargs))
+            while True:
+                remaining = POLL_INTERVAL if deadline is None else min(POLL_INTERVAL, deadline - time.perf_counter())
+                ready = wait([worker.conn, worker.process.sentinel], max(0.0, remaining))
+                if call.finished.is_set():  # cancelled
+                    break
+                if worker.conn in ready:
+                    kind, value = worker.conn.recv()
+                    if kind == "raise":
+                        value = ToolFailed(value)
+                    call.finish((kind, value))
+                    if kind == "memory_limit":
+                        break  # do not reuse a worker that ran out of memory
+                    self._put_worker(worker)
+                    worker = None
+                    return
+                if ready:  # the process exited without answering
+                    call.finish(("worker_crashed", None))
+                    break
+                if deadline is not None and time.perf_counter() >= deadline:
+                    call.finish(("timeout", None))
+                    break
+        except (EOFError, OSError):
+            call.finish(("worker_crashed", None))
+        finally:
+            if worker is not None:
+                worker.kill()
+
+    # Control
+
+    def cancel(self):
+        """
+        Cancels every call in progress: each returns a "cancelled" result at once, worker processes
+        running them are killed and SQLite queries on threads are interrupted.
+
+        Returns:
+            int: The number of calls cancelled.
+        """
+        with self._lock:
+            calls = list(self._active)
+        cancelled = 0
+        for call in calls:
+            if call.finish(("cancelled", None)):
+                cancelled += 1
+                self._stop_thread(call)
+        return cancelled
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, active=len(self._active), lost_threads=self._lost_threads,
+                        idle_processes=sum(len(workers) for workers in self._idle.values()))
+
+    def shutdown(self):
+        """Cancels running calls, stops the worker processes and releases the thread pool."""
+        self.cancel()
+        with self._lock:
+            workers = [worker for idle in self._idle.values() for worker in idle]
+            self._idle.clear()
+            threads, self._threads, self._lost_threads = self._threads, None, 0
+        for worker in workers:
+            worker.kill()
+        if threads is not None:
+            # Calls still queued were cancelled above, so they return as soon as a thread picks them up
+            # (no cancel_futures=True, which needs Python 3.9)
+            threads.shutdown(wait=False)
+
+
+tool_executor = ToolExecutor()
@@ -3,33 +3,267 @@ File Operations Tool
 
 This module provides functions for interacting with the local file system,
 allowing the LLM to read content from files.
+
+Reads are bounded windows: the model asks for a byte range (offset/length), a line range
+(start_line/end_line) or the last lines of a file (tail_lines), and only that part of the file is
+read. Files above MMAP_THRESHOLD are memory-mapped, so finding a line deep inside a large log scans
+the mapping in chunks instead of reading the file into memory. Smaller files are kept in the shared
+document cache (tools/document_cache.py), so repeated reads of the same file do not touch the disk
+until it changes. get_file_stats gives the size, an
+estimated line count and the encoding so the model can plan its reads.
 """
 
+import mmap
 import os
+import time
+from typing import Optional
+
+from tools.document_cache import documents, resolve_path
+from tools.registry import tool
+
+DEFAULT_READ_BYTES = 10000          # window returned when no range is given
+MAX_READ_BYTES = 100000             # largest window a single call may return
+MAX_LINES = 500                     # largest line range a single call may return
+MMAP_THRESHOLD = 1024 * 1024        # files at least this large are memory-mapped
+SCAN_CHUNK = 1024 * 1024            # bytes examined at a time when counting lines
+SAMPLE_BYTES = 64 * 1024            # bytes sampled for encoding detection and line estimates
+
+
+class _Window:
+    """Byte access to a file: an mmap for large files, or the cached contents of a small one."""
+
+    def __init__(self, file=None, data=None):
+        self.data = data
+        self.map = None
+        if data is not None:
+            self.size = len(data)
+        else:
+            self.size = os.fstat(file.fileno()).st_size
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def read(self, start, end):
+        start, end = max(0, start), min(self.size, end)
+        if end <= start:
+            return b""
+        if self.data is not None:
+            return self.data[start:end]
+        if self.map is not None:
+            return self.map[start:end]
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+
+
+def _read_bytes(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def _utf8_start(data):
+    """Skips UTF-8 continuation bytes at the front of a window that starts mid-character."""
+    skip = 0
+    while skip < min(3, len(data)) and data[skip] & 0xC0 == 0x80:
+        skip += 1
+    return skip
+
+
+def _utf8_end(data):
+    """Length of `data` without a multi-byte character cut off at the end of the window."""
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 == 0x80:
+            continue  # continuation byte, keep looking for the lead byte
+        if byte >= 0xC0:
+            needed = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            return len(data) - back if needed > back else len(data)
+        return len(data)
+    return len(data)
+
+
+def _decode(data):
+    return data.decode("utf-8", errors="replace")
+
+
+def _line_start(window, line):
+    """Byte offset where 1-based `line` starts, or None if the file has fewer lines."""
+    if line <= 1:
+        return 0
+    remaining = line - 1
+    position = 0
+    while position < window.size:
+        chunk = window.read(position, position + SCAN_CHUNK)
+        newlines = chunk.count(b"\n")
+        if newlines < remaining:
+            remaining -= newlines
+            position += len(chunk)
+            continue
+        index = -1
+        for _ in range(remaining):
+            index = chunk.index(b"\n", index + 1)
+        start = position + index + 1
+        return start if start < window.size else None
+    return None
+
+
+def _read_lines(window, start_line, end_line):
+    start = _line_start(window, start_line)
+    if start is None:
+        return None, 0, 0
+    wanted = end_line - start_line + 1
+    data = window.read(start, start + MAX_READ_BYTES)
+    lines = data.split(b"\n")
+    if start + len(data) < window.size:
+        lines = lines[:max(len(lines) - 1, 1)]  # the last piece is cut off by the window
+    elif lines[-1] == b"":
+        lines.pop()  # the file ends with a newline
+    lines = lines[:wanted]
+    return b"\n".join(lines), start, len(lines)
+
+
+def _tail(window, count):
+    """Start offset of the last `count` lines, reading backwards in chunks."""
+    end = window.size
+    while end and window.read(end - 1, end) in (b"\n", b"\r"):
+        end -= 1  # trailing newlines do not start another line
+    position = end
+    found = 0
+    while position > 0 and end - position < MAX_READ_BYTES:
+        chunk_start = max(0, position - SCAN_CHUNK, end - MAX_READ_BYTES)
+        chunk = window.read(chunk_start, position)
+        index = len(chunk)
+        while True:
+            index = chunk.rfind(b"\n", 0, index)
+            if index < 0:
+                break
+            found += 1
+            if found == count:
+                return chunk_start + index + 1, end
+        position = chunk_start
+    return max(0, end - MAX_READ_BYTES), end
 
-def read_file_content(path: str) -> str:
+
+@tool(remember_path="text", cache="file", result_format="Content of file '{path}':\n{result}")
+def read_file_content(path: Optional[str] = None, offset: Optional[int] = None, length: Optional[int] = None,
+                      start_line: Optional[int] = None, end_line: Optional[int] = None,
+                      tail_lines: Optional[int] = None) -> str:
     """
-    Reads the content of a specified file and returns it as a string.
-    
+    Read and return content from a local text file for discussion or analysis.
+    Returns the first 10,000 bytes unless a byte range, a line range or tail_lines is given.
+
     Args:
-        path (str): The path to the file to be read.
-    
+        path (str): Path to the text file, relative to project directory.
+            Defaults to the last file that was read.
+        offset (int): Byte offset to start reading at.
+        length (int): Number of bytes to read (at most 100,000).
+        start_line (int): First line to return, counting from 1.
+        end_line (int): Last line to return (at most 500 lines per call).
+        tail_lines (int): Return the last N lines of the file instead.
+
+    Returns:
+        str: The requested part of the file followed by a note on where it sits in the file,
+             or an error message if the file cannot be read.
+    """
+    path, error = resolve_path(path)
+    if error:
+        return error
+    try:
+        if os.path.getsize(path) < MMAP_THRESHOLD:
+            window = _Window(data=documents.get(path, "bytes", _read_bytes))
+            return _read_window(window, offset, length, start_line, end_line, tail_lines)
+        with open(path, 'rb') as file:
+            window = _Window(file)
+            try:
+                return _read_window(window, offset, length, start_line, end_line, tail_lines)
+            finally:
+                window.close()
+    except Exception as e:
+        return f"Error reading file '{path}': {str(e)}"
+
+
+def _read_window(window, offset, length, start_line, end_line, tail_lines):
+    size = window.size
+    if tail_lines:
+        start, end = _tail(window, max(1, int(tail_lines)))
+        data = window.read(start, end)
+        skip = _utf8_start(data)
+        lines = data[skip:].count(b"\n") + 1 if data else 0
+        return _decode(data[skip:]) + f"\n... (last {lines} lines, bytes {start + skip}-{end} of {size})"
+
+    if start_line or end_line:
+        start_line = max(1, int(start_line or 1))
+        end_line = max(start_line, int(end_line or start_line + MAX_LINES - 1))
+        end_line = min(end_line, start_line + MAX_LINES - 1)
+        data, start, count = _read_lines(window, start_line, end_line)
+        if data is None:
+            return f"Error: The file has fewer than {start_line} lines."
+        last = start_line + count - 1
+        end = start + len(data)
+        note = f"lines {start_line}-{last}, bytes {start}-{end} of {size}"
+        # Another line follows unless all that is left is the file's final newline
+        if end < size and window.read(end, end + 2) not in (b"\n", b"\r\n"):
+            note += f"; continue with start_line={last + 1}"
+        return _decode(data) + f"\n... ({note})"
+
+    start = max(0, int(offset or 0))
+    length = min(MAX_READ_BYTES, max(1, int(length or DEFAULT_READ_BYTES)))
+    if start and start >= size:
+        return f"Error: Offset {start} is past the end of the file ({size} bytes)."
+    data = window.read(start, start + length)
+    skip = _utf8_start(data) if start else 0
+    keep = _utf8_end(data) if start + len(data) < size else len(data)
+    end = start + keep
+    text = _decode(data[skip:keep])
+    if start == 0 and end >= size:
+        return text
+    note = f"bytes {start + skip}-{end} of {size}"
+    if end < size:
+        note += f"; continue with offset={end}"
+    return text + f"\n... ({note})"
+
+
+def detect_encoding(sample):
+    """Best guess at the encoding of a file from its first bytes."""
+    if sample.startswith(b"\xef\xbb\xbf"):
+        return "utf-8 with BOM"
+    if sample.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return "utf-16"
+    if b"\x00" in sample:
+        return "binary"
+    try:
+        sample[:_utf8_end(sample)].decode("utf-8")
+    except UnicodeDecodeError:
+        return "not UTF-8 (probably latin-1 or cp1252)"
+    return "ascii" if sample.isascii() else "utf-8"
+
+
+@tool(remember_path="text", cache="file", result_format="File '{path}': {result}")
+def get_file_stats(path: Optional[str] = None) -> str:
+    """
+    Get the size, approximate line count and encoding of a local file without reading all of it.
+    Use this before reading a large file to decide which part to read.
+
+    Args:
+        path (str): Path to the file, relative to project directory.
+            Defaults to the last file that was read.
+
     Returns:
-        str: The content of the file if successful, or an error message if the file cannot be read.
+        str: A one-line summary of the file, or an error message.
     """
+    path, error = resolve_path(path)
+    if error:
+        return error
     try:
-        # Ensure the path is relative to the current working directory
-        if not os.path.isabs(path):
-            path = os.path.join(os.getcwd(), path)
-        if not os.path.exists(path):
-            return f"Error: File '{path}' does not exist."
-        if not os.path.isfile(path):
-            return f"Error: '{path}' is not a file."
-        with open(path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            # Limit the response size to avoid overwhelming the model
-            if len(content) > 10000:
-                return content[:10000] + "\n... (content truncated due to length)"
-            return content
+        stat = os.stat(path)
+        with open(path, 'rb') as file:
+            sample = file.read(SAMPLE_BYTES)
+        newlines = sample.count(b"\n")
+        if stat.st_size <= len(sample):
+            unterminated = 1 if sample and not sample.endswith(b"\n") else 0
+            lines = f"{newlines + unterminated} lines"
+        else:
+            lines = f"~{round(newlines * stat.st_size / len(sample))} lines (estimated from the first {len(sample)} bytes)"
+        modified = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stat.st_mtime))
+        return f"{stat.st_size} bytes, {lines}, encoding {detect_encoding(sample)}, modified {modified}"
     except Exception as e:
         return f"Error reading file '{path}': {str(e)}"
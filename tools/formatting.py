@@ -0,0 +1,145 @@
+"""
+Result Formatting
+
+Helpers for keeping tool results small in the prompt. Every tool result is sent back to the model
+on each later request of the conversation, so a result written as prose ("- Laptop: 3 units sold,
+total revenue $...") costs prefill time over and over. Tabular results are written as one header
+row plus one compact row per record instead:
+
+    product,units_sold,revenue
+    Laptop,3,3600.00
+    ... 12 more rows (15 in total)
+
+table() caps the number of rows and the estimated tokens of a result and ends it with a line saying
+how many rows were left out. tabulate() does the same for JSON: a list of objects that all have the
+same keys becomes a list of rows whose first row holds the keys.
+
+OutputMeter keeps per-tool counts of the tokens tool results add to the prompt; the chat prints
+them at exit and every traced tool span carries its result_tokens.
+"""
+
+import csv
+import io
+import json
+import threading
+
+CHARS_PER_TOKEN = 4
+MAX_ROWS = 50            # rows shown before the "more rows" line
+MAX_TABLE_TOKENS = 1500  # estimated tokens of one table
+FORMATS = ("csv", "tsv", "json")
+
+
+def estimate_tokens(text):
+    """Rough token count for a piece of text."""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def cell(value):
+    """A table cell: floats with two decimals, None as empty, everything else as text."""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def _line(values, format):
+    if format == "json":
+        return json.dumps(values, separators=(",", ":"), ensure_ascii=False)
+    if format == "tsv":
+        return "\t".join(str(value).replace("\t", " ").replace("\n", " ") for value in values)
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(values)
+    return buffer.getvalue()
+
+
+def table(columns, rows, title=None, max_rows=MAX_ROWS, max_tokens=MAX_TABLE_TOKENS, format="csv"):
+    """
+    Writes rows as a compact table with one header row.
+
+    Args:
+        columns (list): Column names.
+        rows (list): Row tuples, in the order they should appear.
+        title (str): Optional first line, e.g. what the rows are sorted by.
+        max_rows (int): Rows shown at most; None shows all (still subject to max_tokens).
+        max_tokens (int): Estimated tokens the table may take; rows that do not fit are left out.
+        format (str): "csv", "tsv" or "json" (one JSON array per line, the first holding the names).
+
+    Returns:
+        str: The table, with a "... N more rows" line if rows were left out.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown table format '{format}' (expected one of {', '.join(FORMATS)})")
+    lines = [title] if title else []
+    lines.append(_line(list(columns), format))
+    used = sum(estimate_tokens(line) + 1 for line in lines)
+    shown = 0
+    for row in rows:
+        if max_rows is not None and shown >= max_rows:
+            break
+        values = [round(value, 2) if isinstance(value, float) else value for value in row] \
+            if format == "json" else [cell(value) for value in row]
+        line = _line(values, format)
+        if shown and max_tokens and used + estimate_tokens(line) + 1 > max_tokens:
+            break
+        lines.append(line)
+        used += estimate_tokens(line) + 1
+        shown += 1
+    if shown < len(rows):
+        lines.append(f"... {len(rows) - shown} more rows ({len(rows)} in total)")
+    return "\n".join(lines)
+
+
+def tabulate(value):
+    """
+    Rewrites every list of two or more objects that share the same keys (in the same order) as a list
+    of rows, the first row holding the keys. Other values are returned unchanged.
+    """
+    if isinstance(value, dict):
+        return {key: tabulate(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if (len(value) > 1 and all(isinstance(item, dict) for item in value)
+                and value[0] and all(list(item) == list(value[0]) for item in value[1:])):
+            keys = list(value[0])
+            return [keys] + [[tabulate(item[key]) for key in keys] for item in value]
+        return [tabulate(item) for item in value]
+    return value
+
+
+class OutputMeter:
+    """Counts the estimated tokens each tool's results add to the prompt."""
+
+    def __init__(self):
+        self._tools = {}
+        self._lock = threading.Lock()
+
+    def record(self, tool, text):
+        """Adds one result and returns its estimated tokens."""
+        tokens = estimate_tokens(text if isinstance(text, str) else str(text))
+        with self._lock:
+            entry = self._tools.setdefault(tool, {"calls": 0, "tokens": 0, "max_tokens": 0})
+            entry["calls"] += 1
+            entry["tokens"] += tokens
+            entry["max_tokens"] = max(entry["max_tokens"], tokens)
+        return tokens
+
+    def stats(self):
+        """Calls, total, mean and largest result tokens per tool, most expensive tool first."""
+        with self._lock:
+            ordered = sorted(self._tools.items(), key=lambda item: -item[1]["tokens"])
+            return {tool: dict(entry, mean_tokens=round(entry["tokens"] / entry["calls"]))
+                    for tool, entry in ordered}
+
+    def describe(self):
+        return "\n".join(f"{tool}: {entry['calls']} calls, {entry['tokens']} tokens "
+                         f"(mean {entry['mean_tokens']}, max {entry['max_tokens']})"
+                         for tool, entry in self.stats().items())
+
+    def clear(self):
+        with self._lock:
+            self._tools.clear()
+
+
+tool_output = OutputMeter()
@@ -0,0 +1,254 @@
+"""
+HTTP Cache
+
+An on-disk cache for the web request tool, so fetching the same URL again within a conversation,
+or in a later session, does not go back to the network when the server says the response is still
+fresh.
+
+- Responses are stored in a SQLite file (HTTP_CACHE_DIR, default .cache/ in the project directory).
+- Freshness follows Cache-Control (no-store, no-cache, max-age, Age) and Expires; responses without
+  explicit freshness but with a Last-Modified date get the usual 10% heuristic lifetime.
+- Stale entries with an ETag or Last-Modified are revalidated with If-None-Match / If-Modified-Since,
+  and a 304 answer serves the stored body.
+- The cache is bounded by total body size (HTTP_CACHE_MB, 0 disables it) and entry count; the least
+  recently used entries are evicted first.
+- Hit, miss and revalidation counters are kept per process, see stats().
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.join(PROJECT_DIR, ".cache"))
+MAX_CACHE_BYTES = int(float(os.environ.get("HTTP_CACHE_MB", "64")) * 1024 * 1024)
+MAX_ENTRIES = 5000
+HEURISTIC_FRACTION = 0.1          # of the time since Last-Modified
+MAX_HEURISTIC_LIFETIME = 86400    # seconds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    reason TEXT,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    truncated INTEGER NOT NULL,
+    declared_size INTEGER,
+    etag TEXT,
+    last_modified TEXT,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL
+)
+"""
+
+
+def _header(headers, name):
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _parse_cache_control(value):
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"')
+    return directives
+
+
+def _http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_lifetime(headers, now=None):
+    """
+    Works out how long a response may be served from the cache without asking the server.
+
+    Args:
+        headers (dict): Response headers.
+        now (float): Current time, for tests.
+
+    Returns:
+        float or None: Seconds of freshness (0 means revalidate on every use), or None if the
+                       response must not be stored at all.
+    """
+    now = now or time.time()
+    directives = _parse_cache_control(_header(headers, "cache-control"))
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    age = float(_header(headers, "age") or 0) if (_header(headers, "age") or "").isdigit() else 0.0
+    if "max-age" in directives:
+        try:
+            return max(0.0, int(directives["max-age"]) - age)
+        except ValueError:
+            return 0.0
+    expires = _http_date(_header(headers, "expires"))
+    if expires is not None:
+        date = _http_date(_header(headers, "date")) or now
+        return max(0.0, expires - date)
+    last_modified = _http_date(_header(headers, "last-modified"))
+    if last_modified is not None:
+        return min(MAX_HEURISTIC_LIFETIME, max(0.0, (now - last_modified) * HEURISTIC_FRACTION))
+    return 0.0
+
+
+class HttpCache:
+    """
+    SQLite-backed response cache with LRU eviction by size and entry count.
+
+    Args:
+        path (str): Cache database file.
+        max_bytes (int): Upper bound for the total size of stored bodies; 0 disables the cache.
+        max_entries (int): Upper bound for the number of stored responses.
+    """
+
+    def __init__(self, path=None, max_bytes=MAX_CACHE_BYTES, max_entries=MAX_ENTRIES):
+        self.path = path or os.path.join(CACHE_DIR, "http_cache.sqlite3")
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.enabled = max_bytes > 0
+        self.counters = {"hits": 0, "misses": 0, "revalidated": 0, "stored": 0, "evicted": 0}
+        self._conn = None
+        self._total_bytes = 0
+        self._entries = 0
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+            self._entries, self._total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            self._conn = conn
+        return self._conn
+
+    def count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def lookup(self, url):
+        """Returns the stored entry for a URL (fresh or stale) and marks it as recently used."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT status, reason, headers, body, truncated, declared_size, etag, last_modified, expires_at "
+                "FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+        status, reason, headers, body, truncated, declared_size, etag, last_modified, expires_at = row
+        headers = json.loads(headers)
+        return {
+            "status": status,
+            "reason": reason,
+            "headers": headers,
+            "content_type": _header(headers, "content-type") or "",
+            "body": bytes(body),
+            "truncated": bool(truncated),
+            "declared_size": declared_size,
+            "etag": etag,
+            "last_modified": last_modified,
+            "expires_at": expires_at,
+        }
+
+    @staticmethod
+    def is_fresh(entry, now=None):
+        return entry["expires_at"] > (now or time.time())
+
+    @staticmethod
+    def validators(entry):
+        """Conditional request headers for revalidating a stale entry."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, result):
+        """Stores a 200 response if its headers allow it. Returns True when it was stored."""
+        if not self.enabled or result["status"] != 200:
+            return False
+        headers = result["headers"]
+        lifetime = freshness_lifetime(headers)
+        etag, last_modified = _header(headers, "etag"), _header(headers, "last-modified")
+        if lifetime is None or (lifetime == 0 and not etag and not last_modified):
+            return False  # not storable, or stale at once with no way to revalidate
+        size = len(result["body"])
+        if size > self.max_bytes:
+            return False
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            previous = conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (url, status, reason, headers, body, truncated, declared_size, "
+                "etag, last_modified, expires_at, last_access, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, result["status"], result["reason"], json.dumps(headers), sqlite3.Binary(result["body"]),
+                 int(result["truncated"]), result["declared_size"], etag, last_modified, now + lifetime, now, size))
+            if previous:
+                self._total_bytes -= previous[0]
+            else:
+                self._entries += 1
+            self._total_bytes += size
+            self.counters["stored"] += 1
+            self._evict(conn)
+        return True
+
+    def refresh(self, url, headers):
+        """Extends the freshness of an entry after the server answered 304 Not Modified."""
+        lifetime = freshness_lifetime(headers)
+        with self._lock:
+            self._connection().execute(
+                "UPDATE responses SET expires_at = ?, etag = COALESCE(?, etag) WHERE url = ?",
+                (time.time() + (lifetime or 0.0), _header(headers, "etag"), url))
+
+    def _evict(self, conn):
+        while self._entries > 0 and (self._total_bytes > self.max_bytes or self._entries > self.max_entries):
+            row = conn.execute("SELECT url, size FROM responses ORDER BY last_access LIMIT 1").fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM responses WHERE url = ?", (row[0],))
+            self._entries -= 1
+            self._total_bytes -= row[1]
+            self.counters["evicted"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._connection().execute("DELETE FROM responses")
+            self._entries = 0
+            self._total_bytes = 0
+
+    def stats(self):
+        """Counters plus the current size of the cache."""
+        with self._lock:
+            if self.enabled:
+                self._connection()
+            lookups = self.counters["hits"] + self.counters["revalidated"] + self.counters["misses"]
+            served = self.counters["hits"] + self.counters["revalidated"]
+            return dict(self.counters, entries=self._entries, bytes=self._total_bytes,
+                        hit_rate=round(served / lookups, 3) if lookups else None)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -3,39 +3,514 @@ JSON Operations Tool
 
 This module provides functions for interacting with JSON files,
 allowing the LLM to read and process structured data, such as accounting data.
+
+query_json_file returns only the part of a document a selector points at, e.g.
+'history.balance_history.2015.opening_balances.assets.1930', in compact form. Files up to
+STREAM_THRESHOLD are parsed with json.load; larger files are scanned with a streaming parser that
+skips every value off the selected path without building it, so memory stays bounded by the size
+of the selected subtree. Results too large for the model are replaced by an outline of their keys.
+Parsed documents below the threshold are kept in the shared document cache, so repeated queries
+against the same file skip json.load until the file changes.
+
+Lists of objects that share the same keys are returned as rows under one header row (see
+tools/formatting.py), so the keys are not repeated for every record.
 """
 
 import os
 import json
+import re
+from typing import Optional
+
+from tools.document_cache import documents, resolve_path
+from tools.formatting import tabulate
+from tools.registry import tool
+
+MAX_RESULT_CHARS = 4000            # default size of a query result
+MAX_DOCUMENT_CHARS = 10000         # read_json_file returns the whole document up to this size
+STREAM_THRESHOLD = 1024 * 1024     # files at least this large are stream-parsed
+CHUNK_SIZE = 64 * 1024
+MAX_LISTED_KEYS = 30               # keys shown in outlines and "no match" hints
+
+SELECTOR_TOKEN = re.compile(r"""\[\s*(?:(\d+|\*)|"([^"]*)"|'([^']*)')\s*\]|([^.\[\]]+)""")
+WILDCARD = "*"
+
+
+def load_json(path):
+    """Parses a JSON file, returning the cached tree while the file is unchanged."""
+    return documents.get(path, "json", _parse_file)
+
+
+def _parse_file(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def compact(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
 
-def read_json_file(path: str) -> str:
+def parse_selector(selector):
     """
-    Reads the content of a specified JSON file and returns it as a formatted string.
-    
+    Splits a selector such as 'a.b[0].*' or 'a["x.y"]' into its keys.
+
+    Returns:
+        list: Keys as strings; '*' matches every key or item.
+    """
+    selector = (selector or "").strip()
+    if selector.startswith("$"):
+        selector = selector[1:]
+    components = []
+    position = 0
+    while position < len(selector):
+        if selector[position] == ".":
+            position += 1
+            continue
+        match = SELECTOR_TOKEN.match(selector, position)
+        if match is None:
+            raise ValueError(f"Cannot parse selector at '{selector[position:]}'")
+        index, double_quoted, single_quoted, name = match.groups()
+        key = next(part for part in (index, double_quoted, single_quoted, name) if part is not None)
+        components.append(key.strip() if name is not None else key)
+        position = match.end()
+    return components
+
+
+def format_path(parts):
+    text = ""
+    for part in parts:
+        text += f"[{part}]" if isinstance(part, int) else (f".{part}" if text else part)
+    return text or "$"
+
+
+def _matches(component, key):
+    return component == WILDCARD or component == str(key)
+
+
+def describe(value):
+    """Short description of a value for outlines: the value itself if small, else its shape."""
+    if isinstance(value, dict):
+        return f"object, {len(value)} keys"
+    if isinstance(value, list):
+        return f"array, {len(value)} items"
+    text = compact(value)
+    return value if len(text) <= 60 else f"{type(value).__name__}, {len(text)} chars"
+
+
+def outline(value):
+    """One level of structure: each key (or the first items) with a short description."""
+    if isinstance(value, dict):
+        keys = list(value)
+        shown = {key: describe(value[key]) for key in keys[:MAX_LISTED_KEYS]}
+        if len(keys) > MAX_LISTED_KEYS:
+            shown["..."] = f"{len(keys) - MAX_LISTED_KEYS} more keys"
+        return shown
+    if isinstance(value, list):
+        return [describe(item) for item in value[:5]] + ([f"... {len(value) - 5} more items"] if len(value) > 5 else [])
+    return describe(value)
+
+
+# In-memory selection for documents below STREAM_THRESHOLD
+
+def select(data, components):
+    """
+    Finds the values a selector points at in a parsed document.
+
+    Returns:
+        tuple: ([(path parts, value)], hint) where hint names the available keys when nothing matched.
+    """
+    results = []
+    hint = [None]
+
+    def walk(value, remaining, parts):
+        if not remaining:
+            results.append((parts, value))
+            return
+        component, rest = remaining[0], remaining[1:]
+        if isinstance(value, dict):
+            entries = value.items()
+        elif isinstance(value, list):
+            entries = enumerate(value)
+        else:
+            return
+        matched = False
+        for key, child in entries:
+            if _matches(component, key):
+                matched = True
+                walk(child, rest, parts + [key])
+        if not matched and hint[0] is None:
+            hint[0] = (parts, _available(value))
+
+    walk(data, components, [])
+    return results, hint[0]
+
+
+def _available(value):
+    if isinstance(value, dict):
+        keys = list(value)
+        return f"keys {', '.join(keys[:MAX_LISTED_KEYS])}" + (", ..." if len(keys) > MAX_LISTED_KEYS else "")
+    return f"indexes 0-{len(value) - 1}" if value else "no items"
+
+
+# Streaming selection for large documents
+
+class _Done(Exception):
+    pass
+
+
+class JsonStream:
+    """
+    Forward-only reader over a JSON file that can skip values without decoding them.
+    Works on bytes: every structural character in JSON is ASCII, so UTF-8 text passes through untouched.
+    """
+
+    STRUCTURE = re.compile(rb'["{}\[\]]')
+    STRING_END = re.compile(rb'["\\]')
+    SCALAR_END = re.compile(rb'[\s,\]}]')
+    WHITESPACE = b" \t\r\n"
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = b""
+        self.pos = 0
+        self.base = 0
+
+    def _fill(self):
+        chunk = self.file.read(CHUNK_SIZE)
+        if not chunk:
+            return False
+        self.base += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def offset(self):
+        return self.base + self.pos
+
+    def seek(self, offset):
+        self.file.seek(offset)
+        self.buffer, self.pos, self.base = b"", 0, offset
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos:self.pos + 1]
+            if not self._fill():
+                return None
+
+    def take(self, expected=None):
+        char = self.peek()
+        if char is None or (expected is not None and char != expected):
+            raise ValueError(f"Expected {expected!r} at byte {self.offset()}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def _search(self, pattern):
+        """Moves to the next match of `pattern`, reading more of the file as needed."""
+        while True:
+            match = pattern.search(self.buffer, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return self.buffer[self.pos:self.pos + 1]
+            self.pos = len(self.buffer)
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def read_string(self):
+        start = self.offset()
+        self.skip_string()
+        end = self.offset()
+        if start >= self.base:
+            raw = self.buffer[start - self.base:end - self.base]
+        else:  # a very long key that spans a buffer refill
+            self.seek(start)
+            raw = self.file.read(end - start)
+            self.seek(end)
+        return json.loads(raw.decode("utf-8"))
+
+    def skip_string(self):
+        self.take(b'"')
+        while True:
+            if self._search(self.STRING_END) == b"\\":
+                self.pos += 1
+                if self.pos >= len(self.buffer):
+                    self._fill()
+                self.pos += 1
+            else:
+                self.pos += 1
+                return
+
+    def skip_value(self):
+        char = self.peek()
+        if char == b'"':
+            self.skip_string()
+        elif char in (b"{", b"["):
+            self.pos += 1
+            depth = 1
+            while depth:
+                char = self._search(self.STRUCTURE)
+                if char == b'"':
+                    self.skip_string()
+                    continue
+                depth += 1 if char in (b"{", b"[") else -1
+                self.pos += 1
+        elif char is None:
+            raise ValueError("Unexpected end of JSON document")
+        else:
+            while True:
+                match = self.SCALAR_END.search(self.buffer, self.pos)
+                if match is not None:
+                    self.pos = match.start()
+                    return
+                self.pos = len(self.buffer)
+                if not self._fill():
+                    return
+
+    def entries(self):
+        """Iterates over the keys (objects) or indexes (arrays) of the value at the current position,
+        leaving the stream at the start of each child value. The caller must consume each child."""
+        opening = self.take()
+        closing = b"}" if opening == b"{" else b"]"
+        if self.peek() == closing:
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            if opening == b"{":
+                key = self.read_string()
+                self.take(b":")
+            else:
+                key = index
+                index += 1
+            yield key
+            if self.take() == closing:
+                return
+
+    def read_value(self, start, end):
+        self.seek(start)
+        raw = self.file.read(end - start)
+        return json.loads(raw.decode("utf-8"))
+
+    def describe(self):
+        """Like describe(), for the value at the current position (which is consumed)."""
+        char = self.peek()
+        if char in (b"{", b"["):
+            count = 0
+            for _ in self.entries():
+                self.skip_value()
+                count += 1
+            return f"object, {count} keys" if char == b"{" else f"array, {count} items"
+        start = self.offset()
+        self.skip_value()
+        end = self.offset()
+        if end - start > 200:
+            return f"string, ~{end - start - 2} chars"
+        value = self.read_value(start, end)
+        self.seek(end)
+        return describe(value)
+
+    def outline(self):
+        """Like outline(), for the value at the current position."""
+        char = self.peek()
+        if char == b"{":
+            shown, count = {}, 0
+            for key in self.entries():
+                count += 1
+                if count <= MAX_LISTED_KEYS:
+                    shown[key] = self.describe()
+                else:
+                    self.skip_value()
+            if count > MAX_LISTED_KEYS:
+                shown["..."] = f"{count - MAX_LISTED_KEYS} more keys"
+            return shown
+        if char == b"[":
+            shown, count = [], 0
+            for _ in self.entries():
+                count += 1
+                if count <= 5:
+                    shown.append(self.describe())
+                else:
+                    self.skip_value()
+            return shown + ([f"... {count - 5} more items"] if count > 5 else [])
+        return self.describe()
+
+
+def stream_select(file, components, capture_bytes):
+    """
+    Streaming counterpart of select(): finds the selected values without parsing the rest of the file.
+
+    Args:
+        file: The JSON file opened in binary mode.
+        components (list): Parsed selector.
+        capture_bytes (int): Selected values up to this many bytes in the file are decoded; larger
+            ones are returned as an outline.
+
+    Returns:
+        tuple: ([(path parts, value or Outline)], hint).
+    """
+    stream = JsonStream(file)
+    spans = []
+    hint = [None]
+    single = WILDCARD not in components
+
+    def walk(remaining, parts):
+        if not remaining:
+            start = stream.offset() if stream.peek() is not None else 0
+            stream.skip_value()
+            spans.append((parts, start, stream.offset()))
+            if single:
+                raise _Done()
+            return
+        if stream.peek() not in (b"{", b"["):
+            stream.skip_value()
+            return
+        component, rest = remaining[0], remaining[1:]
+        matched, seen = False, []
+        for key in stream.entries():
+            if _matches(component, key):
+                matched = True
+                walk(rest, parts + [key])
+            else:
+                if len(seen) <= MAX_LISTED_KEYS:
+                    seen.append(key)
+                stream.skip_value()
+        if not matched and hint[0] is None:
+            if seen and isinstance(seen[0], int):
+                available = f"indexes 0-{seen[-1]}" if len(seen) <= MAX_LISTED_KEYS else "indexes 0-..."
+            elif seen:
+                available = f"keys {', '.join(seen[:MAX_LISTED_KEYS])}" + (", ..." if len(seen) > MAX_LISTED_KEYS else "")
+            else:
+                available = "no items"
+            hint[0] = (parts, available)
+
+    try:
+        walk(components, [])
+    except _Done:
+        pass
+
+    results = []
+    for parts, start, end in spans:
+        if end - start <= capture_bytes:
+            results.append((parts, stream.read_value(start, end)))
+        else:
+            stream.seek(start)
+            results.append((parts, Outline(stream.outline(), end - start)))
+    return results, hint[0]
+
+
+class Outline:
+    """Marks a selected value that was too large to return, carrying its outline instead."""
+
+    def __init__(self, shape, size):
+        self.shape = shape
+        self.size = size
+
+
+def render(results, selector, max_chars):
+    """Turns selected values into the text returned to the model."""
+    single = len(results) == 1 and WILDCARD not in parse_selector(selector)
+    lines = []
+    used = 0
+    for index, (parts, value) in enumerate(results):
+        text = None if isinstance(value, Outline) else compact(tabulate(value))
+        if text is None or len(text) > max_chars:
+            shape = value.shape if isinstance(value, Outline) else outline(value)
+            size = f"about {value.size} bytes" if text is None else f"{len(text)} characters"
+            text = (f"(too large to show: {size}; select one of its keys instead) "
+                    f"{compact(shape)}")
+        line = text if single else f"{format_path(parts)}: {text}"
+        if lines and used + len(line) > max_chars:
+            lines.append(f"... ({len(results) - index} more matches; narrow the selector)")
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(lines)
+
+
+@tool(remember_path="json", cache="file", result_format="{selector} in '{path}':\n{result}")
+def query_json_file(selector: str, path: Optional[str] = None, max_chars: int = MAX_RESULT_CHARS) -> str:
+    """
+    Return only the part of a JSON file that a selector points at, in compact form.
+    Use dots between keys, [n] for list items and * for every key or item,
+    e.g. 'history.balance_history.2015.opening_balances.assets.1930' or 'history.balance_history.*.year_label'.
+    An empty selector outlines the top level of the document.
+    Lists of objects with the same keys come back as rows, the first row holding the keys.
+
     Args:
-        path (str): The path to the JSON file to be read.
-    
+        selector (str): Path to the value, such as 'company_info.name' or 'items[0].price'.
+        path (str): Path to the JSON file, relative to project directory.
+            Defaults to the last JSON file that was read.
+        max_chars (int): Largest result to return; bigger values are replaced by an outline of their keys.
+
+    Returns:
+        str: The selected value(s), an outline if the value is too large, or an error message.
+    """
+    path, error = resolve_path(path)
+    if error:
+        return error
+    try:
+        components = parse_selector(selector)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    max_chars = max(200, int(max_chars or MAX_RESULT_CHARS))
+    try:
+        if not components:
+            return compact(document_outline(path))
+        if os.path.getsize(path) >= STREAM_THRESHOLD:
+            with open(path, 'rb') as file:
+                results, hint = stream_select(file, components, capture_bytes=max(64 * 1024, max_chars * 8))
+        else:
+            results, hint = select(load_json(path), components)
+    except (json.JSONDecodeError, ValueError) as e:
+        return f"Error: File '{path}' contains invalid JSON. Details: {str(e)}"
+    except Exception as e:
+        return f"Error reading JSON file '{path}': {str(e)}"
+    if not results:
+        if hint is None:
+            return f"Error: Nothing matches '{selector}'."
+        parts, available = hint
+        return f"Error: Nothing matches '{selector}'. {format_path(parts)} has {available}."
+    return render(results, selector, max_chars)
+
+
+def document_outline(path):
+    if os.path.getsize(path) >= STREAM_THRESHOLD:
+        with open(path, 'rb') as file:
+            return JsonStream(file).outline()
+    return outline(load_json(path))
+
+
+@tool(remember_path="json", cache="file", result_format="Content of JSON file '{path}':\n{result}")
+def read_json_file(path: Optional[str] = None) -> str:
+    """
+    Read and return content from a JSON file for analysis, such as accounting data.
+    Large files are returned as an outline of their top-level keys; use query_json_file to read parts of them.
+    Lists of objects with the same keys come back as rows, the first row holding the keys.
+
+    Args:
+        path (str): Path to the JSON file, relative to project directory.
+            Defaults to the last JSON file that was read.
+
     Returns:
-        str: The content of the JSON file as a formatted string if successful, 
+        str: The content of the JSON file in compact form (or an outline for large files),
              or an error message if the file cannot be read or is not valid JSON.
     """
+    path, error = resolve_path(path)
+    if error:
+        return error
     try:
-        # Ensure the path is relative to the current working directory
-        if not os.path.isabs(path):
-            path = os.path.join(os.getcwd(), path)
-        if not os.path.exists(path):
-            return f"Error: File '{path}' does not exist."
-        if not os.path.isfile(path):
-            return f"Error: '{path}' is not a file."
-        with open(path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            # Convert JSON data to a formatted string for readability
-            formatted_data = json.dumps(data, indent=2)
-            # Limit the response size to avoid overwhelming the model
-            if len(formatted_data) > 10000:
-                return formatted_data[:10000] + "\n... (content truncated due to length)"
-            return formatted_data
-    except json.JSONDecodeError as e:
+        if os.path.getsize(path) < STREAM_THRESHOLD:
+            data = load_json(path)
+            text = compact(tabulate(data))
+            if len(text) <= MAX_DOCUMENT_CHARS:
+                return text
+            shape = outline(data)
+        else:
+            shape = document_outline(path)
+        return (f"(The document is too large to show in full; query parts of it with query_json_file.) "
+                f"{compact(shape)}")
+    except (json.JSONDecodeError, ValueError) as e:
         return f"Error: File '{path}' contains invalid JSON. Details: {str(e)}"
     except Exception as e:
         return f"Error reading JSON file '{path}': {str(e)}"
@@ -1,4 +1,12 @@
+from tools.registry import tool
+
+@tool(cache="pure", isolation="inline", result_format="The result of multiplying {a} by {b} is {result}")
 def multiply_numbers(a: float, b: float) -> float:
-    """Multiply two numbers and return the result."""
+    """Multiply two numbers and return the result.
+
+    Args:
+        a (float): The first number
+        b (float): The second number
+    """
     result = a * b
     return result
@@ -0,0 +1,164 @@
+"""
+Tool Result Memoization
+
+Models repeat tool calls all the time in follow-up questions. Tools that declare a cache policy in
+their @tool options have their formatted results remembered, so a repeated call is answered from
+memory until the result could have changed:
+
+    @tool(cache="pure")                  same arguments, same result, forever (multiply_numbers)
+    @tool(cache="ttl", cache_ttl=30)     reuse the result for cache_ttl seconds (default 60)
+    @tool(cache="sqlite")                reuse until the sales database changes (PRAGMA data_version)
+    @tool(cache="file")                  reuse until the file in the 'path' argument changes (mtime, size)
+
+Keys are the tool name plus its arguments after defaults are filled in and unknown keys dropped,
+serialized with sorted keys, so {"b": 2, "a": 1} and {"a": 1, "b": 2} share an entry. When several
+threads make the same call at the same time, one runs the tool and the others wait for its result.
+Results that start with "Error" are not cached. Hit and miss counters are kept per tool.
+"""
+
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+MAX_ENTRIES = 1024
+DEFAULT_TTL = 60.0
+
+
+def _sqlite_version(arguments):
+    from tools.db_connection import data_version
+    return data_version()
+
+
+def _file_version(arguments):
+    path = arguments.get("path")
+    if not path:
+        return None
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+# Policy name -> function returning a token that changes when a cached result may be stale
+VERSIONS = {
+    "pure": lambda arguments: None,
+    "ttl": lambda arguments: None,
+    "sqlite": _sqlite_version,
+    "file": _file_version,
+}
+
+
+class ToolResultCache:
+    """
+    Memoizes tool results according to each tool's cache policy.
+
+    Args:
+        max_entries (int): Results kept before the least recently used are dropped.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "invalidated": 0, "uncached": 0}
+        self.per_tool = {}
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._defaults = {}
+        self._lock = threading.Lock()
+
+    def canonical_key(self, spec, arguments):
+        """The tool name plus its effective arguments, serialized deterministically."""
+        defaults = self._defaults.get(spec.name)
+        if defaults is None and spec.func is not None:
+            defaults = self._defaults[spec.name] = {
+                name: param.default for name, param in inspect.signature(spec.func).parameters.items()
+                if param.default is not inspect.Parameter.empty
+            }
+        effective = dict(defaults or {})
+        effective.update((key, value) for key, value in arguments.items() if key in spec.params)
+        return spec.name + json.dumps(effective, sort_keys=True, separators=(",", ":"), default=str)
+
+    def _count(self, name, counter):
+        self.counters[counter] += 1
+        tool_counters = self.per_tool.setdefault(name, {"hits": 0, "misses": 0})
+        if counter in tool_counters:
+            tool_counters[counter] += 1
+
+    def call(self, spec, arguments, compute, report=None):
+        """
+        Returns the result of `compute()` for a tool call, from the cache when the tool's policy allows.
+
+        Args:
+            spec: The tool's ToolSpec; its 'cache' option selects the policy.
+            arguments (dict): The arguments the tool will be called with.
+            compute (callable): Runs the tool and returns its formatted result.
+            report (callable): Called with "hit", "miss", "coalesced" or "uncached" (for tracing).
+        """
+        report = report or (lambda outcome: None)
+        policy = spec.options.get("cache")
+        if policy not in VERSIONS:
+            return compute()
+        try:
+            version = VERSIONS[policy](arguments)
+        except Exception:
+            with self._lock:
+                self.counters["uncached"] += 1
+            report("uncached")
+            return compute()  # e.g. the database or file is missing; let the tool report it
+        key = self.canonical_key(spec, arguments)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, expires, result = entry
+                if entry_version == version and (expires is None or expires > now):
+                    self._entries.move_to_end(key)
+                    self._count(spec.name, "hits")
+                    report("hit")
+                    return result
+                del self._entries[key]
+                self.counters["invalidated"] += 1
+            future = self._inflight.get((key, version))
+            leader = future is None
+            if leader:
+                future = self._inflight[(key, version)] = Future()
+                self._count(spec.name, "misses")
+            else:
+                self.counters["coalesced"] += 1
+        report("miss" if leader else "coalesced")
+        if not leader:
+            return future.result()
+
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop((key, version), None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._inflight.pop((key, version), None)
+            if not (isinstance(result, str) and result.startswith("Error")):
+                ttl = spec.options.get("cache_ttl", DEFAULT_TTL) if policy == "ttl" else None
+                self._entries[key] = (version, now + ttl if ttl is not None else None, result)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        future.set_result(result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters, the overall hit rate and per-tool hits and misses."""
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"] + self.counters["coalesced"]
+            served = self.counters["hits"] + self.counters["coalesced"]
+            return dict(self.counters, entries=len(self._entries),
+                        hit_rate=round(served / lookups, 3) if lookups else None,
+                        per_tool={name: dict(counts) for name, counts in self.per_tool.items()})
+
+
+tool_results = ToolResultCache()
@@ -0,0 +1,375 @@
+"""
+Tool Registry
+
+This module collects the functions in the tools/ package that are marked with the @tool decorator,
+builds the JSON schema the LLM sees from their type hints and docstrings, and dispatches tool calls
+by name through a dictionary.
+
+Discovery reads the tool modules with `ast` instead of importing them, so starting the chat does not
+pay for `requests`, `sqlite3` and the rest. A tool module is imported the first time one of its tools
+is called. Schemas are built once and the serialized tool list is cached for the life of the process.
+
+Adding a tool is a matter of decorating a function in a module under tools/:
+
+    from tools.registry import tool
+
+    @tool
+    def add_numbers(a: float, b: float) -> float:
+        \"\"\"
+        Add two numbers and return the sum.
+
+        Args:
+            a (float): The first number
+            b (float): The second number
+        \"\"\"
+        return a + b
+
+Decorator options (plain literals, so discovery can read them without importing the module):
+    description (str): Overrides the first paragraph of the docstring as the tool description.
+    result_format (str): Template for the text returned to the model, e.g. "Result: {result}".
+        Tool arguments are available by name, the return value as {result}.
+    max_result_chars (int): Cut the result to this many characters before formatting.
+    remember_path (str): The tool takes a 'path' argument; the chat loop fills in the last path
+        used for this kind of file when the model leaves it out.
+    cache (str): Memoize results: "pure", "ttl", "sqlite" or "file" (see tools/memoize.py).
+    cache_ttl (float): Seconds a result is reused under the "ttl" policy.
+    isolation (str): Where the tool runs: "inline", "thread" (default) or "process" (see tools/executor.py).
+    timeout (float): Seconds before a call is given up with a timeout result (default 30).
+    memory_mb (int): Memory limit of the worker process for isolation="process" (default 1024).
+"""
+
+import ast
+import importlib
+import inspect
+import json
+import os
+import re
+import threading
+
+TOOL_PACKAGE = "tools"
+TOOL_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Python annotation -> JSON schema type
+JSON_TYPES = {
+    "str": "string",
+    "int": "integer",
+    "float": "number",
+    "bool": "boolean",
+    "list": "array",
+    "List": "array",
+    "tuple": "array",
+    "Tuple": "array",
+    "dict": "object",
+    "Dict": "object",
+}
+
+ARG_LINE = re.compile(r"^(\w+)\s*(?:\(([^)]*)\))?\s*:\s*(.*)$")
+
+
+class ToolSpec:
+    """Everything the registry knows about one tool. `func` stays None until the tool is first used."""
+
+    __slots__ = ("name", "module", "schema", "options", "func", "params")
+
+    def __init__(self, name, module, schema, options, func=None):
+        self.name = name
+        self.module = module
+        self.schema = schema
+        self.options = options
+        self.func = func
+        self.params = frozenset(schema["function"]["parameters"]["properties"])
+
+
+def _annotation_from_ast(node):
+    """Turns an annotation AST node back into source text (ast.unparse needs Python 3.9)."""
+    if node is None:
+        return None
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Constant) and node.value is None:
+        return "None"
+    if isinstance(node, ast.Subscript):
+        inner = node.slice.value if hasattr(ast, "Index") and isinstance(node.slice, ast.Index) else node.slice
+        if isinstance(inner, ast.Tuple):
+            args = ", ".join(_annotation_from_ast(element) or "" for element in inner.elts)
+        else:
+            args = _annotation_from_ast(inner)
+        return f"{_annotation_from_ast(node.value)}[{args}]"
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+        return f"{_annotation_from_ast(node.left)} | {_annotation_from_ast(node.right)}"
+    return None
+
+
+def _annotation_from_object(annotation):
+    if annotation is inspect.Parameter.empty:
+        return None
+    if isinstance(annotation, str):
+        return annotation
+    if isinstance(annotation, type):
+        return annotation.__name__
+    return inspect.formatannotation(annotation).replace("typing.", "")
+
+
+def _json_type(annotation):
+    """Maps annotation text such as 'Optional[int]' or 'list[str]' to a JSON schema fragment."""
+    if not annotation:
+        return {"type": "string"}
+    annotation = annotation.strip()
+    optional = re.match(r"^Optional\[(.*)\]$", annotation)
+    if optional:
+        return _json_type(optional.group(1))
+    if "|" in annotation or annotation.startswith("Union["):
+        members = annotation[6:-1].split(",") if annotation.startswith("Union[") else annotation.split("|")
+        members = [member.strip() for member in members if member.strip() != "None"]
+        return _json_type(members[0]) if len(members) == 1 else {}
+    base, _, rest = annotation.partition("[")
+    schema = {"type": JSON_TYPES.get(base, "string")}
+    if schema["type"] == "array" and rest:
+        schema["items"] = _json_type(rest[:-1].split(",")[0])
+    return schema
+
+
+def _parse_docstring(docstring):
+    """Splits a Google-style docstring into (description, {argument: description})."""
+    if not docstring:
+        return "", {}
+    docstring = inspect.cleandoc(docstring)
+    paragraphs = re.split(r"\n\s*\n", docstring)
+    description = " ".join(paragraphs[0].split()) if not paragraphs[0].strip().startswith("Args:") else ""
+
+    arguments = {}
+    lines = docstring.splitlines()
+    in_args = False
+    current = None
+    args_indent = 0
+    for line in lines:
+        stripped = line.strip()
+        if stripped in ("Args:", "Arguments:", "Parameters:"):
+            in_args, args_indent, current = True, len(line) - len(line.lstrip()), None
+            continue
+        if not in_args:
+            continue
+        indent = len(line) - len(line.lstrip())
+        if stripped and indent <= args_indent:
+            in_args = False
+            continue
+        match = ARG_LINE.match(stripped)
+        if match and (current is None or indent <= current[1]):
+            current = (match.group(1), indent)
+            arguments[current[0]] = match.group(3)
+        elif stripped and current is not None:
+            arguments[current[0]] += " " + stripped
+    return description, arguments
+
+
+def _build_schema(name, docstring, params, options):
+    """
+    Builds the OpenAI tool schema for one function.
+
+    Args:
+        name (str): Tool name.
+        docstring (str): The function docstring.
+        params (list): (name, annotation text, has_default) for each parameter.
+        options (dict): Decorator options.
+    """
+    description, arg_docs = _parse_docstring(docstring)
+    properties = {}
+    required = []
+    for param, annotation, has_default in params:
+        prop = _json_type(annotation)
+        if arg_docs.get(param):
+            prop["description"] = arg_docs[param]
+        properties[param] = prop
+        if not has_default:
+            required.append(param)
+    parameters = {"type": "object", "properties": properties}
+    if required:
+        parameters["required"] = required
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": options.get("description") or description,
+            "parameters": parameters
+        }
+    }
+
+
+def _is_tool_decorator(node):
+    target = node.func if isinstance(node, ast.Call) else node
+    return (isinstance(target, ast.Name) and target.id == "tool") or \
+        (isinstance(target, ast.Attribute) and target.attr == "tool")
+
+
+def _literal_options(node):
+    options = {}
+    if isinstance(node, ast.Call):
+        for keyword in node.keywords:
+            try:
+                options[keyword.arg] = ast.literal_eval(keyword.value)
+            except ValueError:
+                pass  # non-literal options are picked up when the module is imported
+    return options
+
+
+class _FormatArguments(dict):
+    def __missing__(self, key):
+        return ""
+
+
+# Registries by package name, so @tool binds a function to the registry that owns its module
+_registries = {}
+
+
+class ToolRegistry:
+    """
+    Name -> ToolSpec lookup for every tool in the package, plus tools registered from other modules.
+
+    Args:
+        package (str): Import name of the tool package.
+        package_dir (str): Directory the tool modules live in.
+    """
+
+    def __init__(self, package=TOOL_PACKAGE, package_dir=TOOL_PACKAGE_DIR):
+        self.package = package
+        self.package_dir = package_dir
+        self._specs = {}
+        self._discovered = False
+        self._lock = threading.RLock()
+        self._schemas = None
+        self._schemas_json = None
+        _registries.setdefault(package, self)
+
+    def discover(self):
+        """Reads the tool modules' source and registers every @tool function without importing anything."""
+        with self._lock:
+            if self._discovered:
+                return
+            self._discovered = True
+            for filename in sorted(os.listdir(self.package_dir)):
+                if not filename.endswith(".py") or filename in ("__init__.py", "registry.py"):
+                    continue
+                with open(os.path.join(self.package_dir, filename), "r", encoding="utf-8") as file:
+                    source = file.read()
+                if "@tool" not in source:
+                    continue
+                module = f"{self.package}.{filename[:-3]}"
+                for node in ast.parse(source).body:
+                    if not isinstance(node, ast.FunctionDef):
+                        continue
+                    decorators = [d for d in node.decorator_list if _is_tool_decorator(d)]
+                    if not decorators:
+                        continue
+                    options = _literal_options(decorators[0])
+                    positional = node.args.args
+                    first_default = len(positional) - len(node.args.defaults)
+                    params = [
+                        (arg.arg, _annotation_from_ast(arg.annotation), index >= first_default)
+                        for index, arg in enumerate(positional)
+                    ]
+                    schema = _build_schema(node.name, ast.get_docstring(node), params, options)
+                    self._add(ToolSpec(node.name, module, schema, options))
+
+    def _add(self, spec):
+        self._specs[spec.name] = spec
+        self._schemas = None
+        self._schemas_json = None
+
+    def bind(self, func, options):
+        """Called by @tool when a module is imported: attaches the function, or registers it if it is new."""
+        self.discover()
+        with self._lock:
+            spec = self._specs.get(func.__name__)
+            if spec is not None:
+                spec.func = func
+                spec.options.update(options)
+                return
+            signature = inspect.signature(func)
+            params = [
+                (param.name, _annotation_from_object(param.annotation), param.default is not inspect.Parameter.empty)
+                for param in signature.parameters.values()
+            ]
+            schema = _build_schema(func.__name__, inspect.getdoc(func), params, options)
+            self._add(ToolSpec(func.__name__, func.__module__, schema, dict(options), func))
+
+    def get(self, name):
+        self.discover()
+        return self._specs.get(name)
+
+    def names(self):
+        self.discover()
+        return list(self._specs)
+
+    def schemas(self):
+        """The tool list sent to the model. Built once; the same list object is returned on every call."""
+        self.discover()
+        with self._lock:
+            if self._schemas is None:
+                self._schemas = [spec.schema for spec in self._specs.values()]
+            return self._schemas
+
+    def schemas_json(self):
+        """The tool list serialized once, for hashing, size estimates and anything else that needs the bytes."""
+        with self._lock:
+            if self._schemas_json is None:
+                self._schemas_json = json.dumps(self.schemas(), separators=(",", ":"), sort_keys=True)
+            return self._schemas_json
+
+    def load(self, name):
+        """Returns the function behind a tool, importing its module on first use."""
+        spec = self.get(name)
+        if spec is None:
+            raise KeyError(name)
+        if spec.func is None:
+            with self._lock:
+                if spec.func is None:
+                    module = importlib.import_module(spec.module)
+                    spec.func = getattr(module, name)
+        return spec.func
+
+    def dispatch(self, name, arguments):
+        """
+        Calls a tool with the arguments the model supplied and returns the text that goes back to the model.
+
+        Args:
+            name (str): Tool name.
+            arguments (dict): Decoded JSON arguments. Keys that are not parameters of the tool are ignored.
+
+        Returns:
+            str: The formatted tool result.
+        """
+        func = self.load(name)
+        spec = self._specs[name]
+        result = func(**{key: value for key, value in arguments.items() if key in spec.params})
+        return self.format_result(spec, arguments, result)
+
+    @staticmethod
+    def format_result(spec, arguments, result):
+        max_chars = spec.options.get("max_result_chars")
+        if max_chars and isinstance(result, str) and len(result) > max_chars:
+            result = result[:max_chars] + "..."
+        template = spec.options.get("result_format")
+        if template:
+            return template.format_map(_FormatArguments(arguments, result=result))
+        return result if isinstance(result, str) else str(result)
+
+
+registry = ToolRegistry()
+
+
+def tool(func=None, **options):
+    """
+    Marks a function as a tool the LLM can call. Usable as @tool or @tool(option=value, ...).
+    The function itself is returned unchanged.
+    """
+    def decorate(f):
+        owner = _registries.get(f.__module__.rpartition(".")[0], registry)
+        owner.bind(f, options)
+        return f
+    if func is not None:
+        return decorate(func)
+    return decorate
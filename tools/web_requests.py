@@ -1,10 +1,253 @@
+"""
+Web Requests Tool
+
+This module lets the LLM fetch a URL. Requests go through one pooled `requests.Session`, so
+repeated calls to the same host reuse the TCP/TLS connection, and every request has connect and
+read timeouts plus an overall deadline. The body is streamed and reading stops at a byte cap, so a
+huge download costs no more than the prefix the model can use. Text extraction (HTML to plain
+text, compact JSON) runs over that bounded prefix only.
+
+Responses are kept in an on-disk cache (see tools/http_cache.py): a fresh entry is answered without
+touching the network, and a stale one is revalidated with a conditional GET.
+"""
+
+import json
+import re
+import threading
+import time
+from html.parser import HTMLParser
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from tools.http_cache import HttpCache
+from tools.registry import tool
+
+CONNECT_TIMEOUT = 5.0         # seconds to establish the connection
+READ_TIMEOUT = 15.0           # seconds to wait for each chunk of the response
+TOTAL_TIMEOUT = 30.0          # seconds for the whole download
+MAX_BYTES = 256 * 1024        # raw body bytes read before the download is cut off
+MAX_TEXT_CHARS = 4000         # characters of extracted text returned to the model
+CHUNK_SIZE = 16 * 1024
+POOL_SIZE = 16                # connections kept per host
+USER_AGENT = "lmstudio-agents/1.0"
+
+TEXT_TYPES = ("text/", "application/xml", "application/javascript", "application/xhtml+xml")
+CHARSET_PATTERN = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+
+
+def get_session():
+    """Returns the shared session, creating it (with a connection pool) on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
+
+
+def get_cache():
+    """Returns the shared HTTP cache, creating it on first use."""
+    global _cache
+    with _session_lock:
+        if _cache is None:
+            _cache = HttpCache()
+        return _cache
+
+
+def fetch(url, max_bytes=MAX_BYTES, headers=None):
+    """
+    Performs a GET request and reads at most `max_bytes` of the body.
+
+    Args:
+        url (str): The URL to fetch.
+        max_bytes (int): Stop reading the body after this many bytes.
+        headers (dict): Extra request headers.
+
+    Returns:
+        dict: status, reason, headers, content_type, body (bytes), truncated (bool),
+              declared_size (int or None) and elapsed (seconds).
+    """
+    started = time.perf_counter()
+    response = get_session().get(url, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), headers=headers)
+    try:
+        declared = response.headers.get("Content-Length")
+        declared = int(declared) if declared and declared.isdigit() else None
+        chunks = []
+        size = 0
+        truncated = False
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                truncated = size > max_bytes or declared != size
+                break
+            if time.perf_counter() - started > TOTAL_TIMEOUT:
+                truncated = True
+                break
+        return {
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "content_type": response.headers.get("Content-Type", ""),
+            "body": b"".join(chunks)[:max_bytes],
+            "truncated": truncated,
+            "declared_size": declared,
+            "elapsed": time.perf_counter() - started,
+        }
+    finally:
+        response.close()
+
+
+def cached_fetch(url):
+    """
+    Fetches a URL through the HTTP cache.
+
+    Args:
+        url (str): The URL to fetch.
+
+    Returns:
+        dict: The same fields as fetch(), plus cache: "hit" (served from disk), "revalidated"
+              (the server answered 304 Not Modified) or "miss".
+    """
+    cache = get_cache()
+    started = time.perf_counter()
+    entry = cache.lookup(url)
+    if entry is not None and cache.is_fresh(entry):
+        cache.count("hits")
+        return dict(entry, elapsed=time.perf_counter() - started, cache="hit")
+    validators = cache.validators(entry) if entry is not None else None
+    result = fetch(url, headers=validators or None)
+    if result["status"] == 304 and entry is not None:
+        cache.refresh(url, result["headers"])
+        cache.count("revalidated")
+        return dict(entry, elapsed=result["elapsed"], cache="revalidated")
+    cache.count("misses")
+    cache.store(url, result)
+    return dict(result, cache="miss")
 
+
+def cache_stats():
+    """Hit, miss, revalidation and eviction counters of the HTTP cache."""
+    return get_cache().stats()
+
+
+class _TextExtractor(HTMLParser):
+    """Collects the visible text of an HTML document, one line per block element."""
+
+    SKIP = {"script", "style", "noscript", "template", "svg"}
+    BLOCKS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "title", "pre"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self.skipping += 1
+        elif tag in self.BLOCKS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self.skipping:
+            self.skipping -= 1
+        elif tag in self.BLOCKS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+    def text(self):
+        lines = (" ".join(line.split()) for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+def _decode(body, content_type):
+    charset = re.search(r"charset=([\w-]+)", content_type, re.IGNORECASE)
+    if charset is None and "html" in content_type:
+        charset = CHARSET_PATTERN.search(body[:4096])
+    encoding = charset.group(1) if charset else "utf-8"
+    if isinstance(encoding, bytes):
+        encoding = encoding.decode("ascii", "ignore")
+    try:
+        return body.decode(encoding, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+def extract_text(body, content_type, truncated=False):
+    """
+    Turns a (possibly truncated) response body into text for the model.
+
+    Args:
+        body (bytes): The response body prefix.
+        content_type (str): The Content-Type header.
+        truncated (bool): Whether the body was cut off at the byte cap.
+
+    Returns:
+        str: Plain text for HTML, compact JSON for JSON, the decoded text for other text types,
+             or a short note for binary content.
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    if not media_type and body.lstrip()[:1] in (b"<", b"{", b"["):
+        media_type = "text/html" if body.lstrip()[:1] == b"<" else "application/json"
+    if "html" in media_type:
+        extractor = _TextExtractor()
+        extractor.feed(_decode(body, content_type))
+        extractor.close()
+        return extractor.text()
+    if media_type.endswith("json"):
+        text = _decode(body, content_type)
+        if not truncated:
+            try:
+                return json.dumps(json.loads(text), separators=(",", ":"), ensure_ascii=False)
+            except ValueError:
+                pass
+        return text
+    if media_type.startswith(TEXT_TYPES) or not media_type:
+        return _decode(body, content_type)
+    return f"[{media_type} content, {len(body)} bytes, not shown]"
+
+
+def describe_size(result):
+    read = len(result["body"])
+    if result["truncated"]:
+        total = f" of {result['declared_size']}" if result["declared_size"] else ""
+        return f"{read} bytes read{total} (cut off at the {MAX_BYTES // 1024} KB cap)"
+    return f"{read} bytes"
+
+
+@tool(timeout=45)  # above TOTAL_TIMEOUT, so the download deadline normally fires first
 def make_http_request(url: str) -> str:
-    """Make an HTTP GET request to the specified URL and return the response text."""
+    """Make an HTTP GET request to a specified URL and return the response.
+    HTML pages are returned as plain text; long responses are cut off.
+
+    Args:
+        url (str): The URL to make the GET request to
+    """
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.text
+        result = cached_fetch(url)
     except Exception as e:
         return f"Error: {str(e)}"
+    summary = (
+        f"HTTP {result['status']} {result['reason']} | {result['content_type'] or 'unknown type'} | "
+        f"{describe_size(result)} | {result['elapsed'] * 1000:.0f} ms"
+    )
+    if result["cache"] != "miss":
+        summary += f" | cache {result['cache']}"
+    if result["status"] >= 400:
+        return f"Error: {summary}"
+    text = extract_text(result["body"], result["content_type"], result["truncated"])
+    if len(text) > MAX_TEXT_CHARS:
+        text = text[:MAX_TEXT_CHARS] + f"\n... (text truncated, {len(text)} characters extracted)"
+    return f"{summary}\n{text}"
@@ -0,0 +1,226 @@
+"""
+Tracing
+
+Records where the time goes in the agent loop. Work is wrapped in nested spans:
+
+    turn                one user message, from input to final answer
+      llm               one request to the model (timings, token counts, cache hits)
+      tool              one tool call (arguments and result size, memoization outcome)
+
+Each finished span is written as one JSON line to the trace file, with its trace id (one per turn),
+its parent span, its start time, its duration and its attributes. At exit, summary() gives the
+count, p50, p95 and total of every span name plus the token totals.
+
+The current span is kept in a context variable, so spans opened in other threads attach to the
+right parent as long as the work is started with run_in_context(), which the tool pool does.
+When tracing is off, span() returns a shared do-nothing span and costs one attribute check.
+
+Profiler adds cProfile and tracemalloc around the turns for a closer look (--profile in llmchat).
+cProfile only sees the thread that runs the turn; tool calls running on the pool show up as time
+spent waiting for them.
+"""
+
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed piece of work. Attributes can be added with set() until it ends."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "attrs", "_started")
+
+    def __init__(self, name, parent, attrs):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.time()
+        self.attrs = attrs
+        self._started = time.perf_counter()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, name, amount=1):
+        """Adds to a numeric attribute, starting from 0."""
+        self.attrs[name] = self.attrs.get(name, 0) + amount
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, name, amount=1):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+@contextmanager
+def _null_context():
+    yield NULL_SPAN
+
+
+class Tracer:
+    """
+    Creates spans and writes them to a JSONL file.
+
+    Args:
+        path (str): Trace file the spans are appended to; None keeps them in memory only
+            (for the summary).
+        enabled (bool): Whether spans are recorded at all.
+    """
+
+    def __init__(self, path=None, enabled=False):
+        self.enabled = enabled
+        self.path = path
+        self._file = None
+        self._durations = {}
+        self._tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+        self._lock = threading.Lock()
+
+    def configure(self, path=None, enabled=True):
+        """Turns tracing on (writing to `path` if given) or off, and starts a new summary."""
+        self.close()
+        with self._lock:
+            self._durations = {}
+            self._tokens = dict.fromkeys(self._tokens, 0)
+        self.path = path
+        self.enabled = enabled
+        if enabled and path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+
+    def span(self, name, **attrs):
+        """Context manager that times a block as a child of the current span and yields the Span."""
+        if not self.enabled:
+            return _null_context()
+        return self._span(name, attrs)
+
+    @contextmanager
+    def _span(self, name, attrs):
+        span = Span(name, _current_span.get(), attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            self._finish(span, time.perf_counter() - span._started)
+
+    def _finish(self, span, duration):
+        record = {"trace_id": span.trace_id, "span_id": span.span_id, "parent_id": span.parent_id,
+                  "name": span.name, "start": round(span.start, 6), "duration_s": round(duration, 6),
+                  "attrs": span.attrs}
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._durations.setdefault(span.name, []).append(duration)
+            for key in self._tokens:
+                value = span.attrs.get(key)
+                if isinstance(value, int):
+                    self._tokens[key] += value
+            if self._file is not None:
+                self._file.write(line)
+                self._file.flush()
+
+    def summary(self):
+        """Count, p50, p95 and total seconds per span name, plus token totals."""
+        with self._lock:
+            spans = {}
+            for name, durations in self._durations.items():
+                ordered = sorted(durations)
+                spans[name] = {
+                    "count": len(ordered),
+                    "p50_s": round(ordered[len(ordered) // 2], 4),
+                    "p95_s": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+                    "total_s": round(sum(ordered), 4),
+                }
+            return {"spans": spans, "tokens": dict(self._tokens)}
+
+    def describe(self):
+        """Printable summary, one line per span name."""
+        summary = self.summary()
+        lines = [f"{name:<6} x{stats['count']:<5} p50 {stats['p50_s']:.3f}s  p95 {stats['p95_s']:.3f}s  "
+                 f"total {stats['total_s']:.2f}s" for name, stats in summary["spans"].items()]
+        tokens = summary["tokens"]
+        lines.append(f"tokens: {tokens['prompt_tokens']} prompt, {tokens['completion_tokens']} completion")
+        return "\n".join(lines)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def current_span():
+    """The innermost open span, or a do-nothing span when there is none."""
+    return _current_span.get() or NULL_SPAN
+
+
+def run_in_context(executor, function, *args):
+    """Submits a call to an executor so that it runs inside a copy of the caller's context (and span)."""
+    return executor.submit(contextvars.copy_context().run, function, *args)
+
+
+class Profiler:
+    """
+    cProfile plus tracemalloc for the sections wrapped in section().
+
+    Args:
+        output_prefix (str): write() creates <prefix>.prof (cProfile data, for pstats or snakeviz)
+            and <prefix>.txt (top functions and allocation growth).
+        top (int): Entries listed in the text report.
+    """
+
+    def __init__(self, output_prefix, top=25):
+        self.output_prefix = output_prefix
+        self.top = top
+        self.profile = cProfile.Profile()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.baseline = tracemalloc.take_snapshot()
+
+    @contextmanager
+    def section(self):
+        self.profile.enable()
+        try:
+            yield
+        finally:
+            self.profile.disable()
+
+    def write(self):
+        """Writes the reports and returns their paths."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_prefix)), exist_ok=True)
+        prof_path, text_path = self.output_prefix + ".prof", self.output_prefix + ".txt"
+        self.profile.dump_stats(prof_path)
+        text = io.StringIO()
+        text.write(f"Top {self.top} functions by cumulative time\n")
+        pstats.Stats(self.profile, stream=text).sort_stats("cumulative").print_stats(self.top)
+        current, peak = tracemalloc.get_traced_memory()
+        text.write(f"\nTraced memory: {current / 1024:.0f} KiB now, {peak / 1024:.0f} KiB peak\n")
+        text.write(f"Top {self.top} allocation sites by growth since start\n")
+        for stat in tracemalloc.take_snapshot().compare_to(self.baseline, "lineno")[:self.top]:
+            text.write(f"  {stat}\n")
+        with open(text_path, "w", encoding="utf-8") as file:
+            file.write(text.getvalue())
+        return prof_path, text_path
+
+
+tracer = Tracer()